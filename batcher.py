@@ -0,0 +1,100 @@
+"""Per-switch batching of the flows sent to flow_manager."""
+from threading import Lock
+from time import monotonic
+
+
+class FlowBatcher:
+    """Coalesce the flows of each switch into bulk flow_manager requests.
+
+    Flows are queued per dpid and handed back in batches, either as soon as a
+    switch queue reaches ``max_size`` flows or once its oldest flow has waited
+    ``max_delay`` seconds. A flow whose match and output ports were already
+    queued for the same switch less than ``dedup_window`` seconds ago is
+    dropped.
+    """
+
+    def __init__(self, max_size, max_delay, dedup_window):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.dedup_window = dedup_window
+        self._queues = {}
+        self._deadlines = {}
+        self._seen = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def flow_key(flow):
+        """Return the key used to detect duplicated flows.
+
+        Flows already encoded to JSON, which have no varying fields besides
+        their match and output port, are their own key.
+        """
+        if isinstance(flow, str):
+            return flow
+        match = flow.get('match', {})
+        ports = tuple(action.get('port') for action in flow.get('actions', ()))
+        return (match.get('dl_src'), match.get('dl_dst'), match.get('dl_type'),
+                ports)
+
+    def add(self, dpid, flow, now=None):
+        """Queue a flow to be installed in the switch ``dpid``.
+
+        Returns:
+            list: The flows of the switch if its batch is full, so that the
+            caller can send them right away. None otherwise.
+
+        """
+        now = monotonic() if now is None else now
+        key = (dpid, self.flow_key(flow))
+        with self._lock:
+            last_seen = self._seen.get(key)
+            if last_seen is not None and now - last_seen < self.dedup_window:
+                return None
+            self._seen[key] = now
+
+            queue = self._queues.setdefault(dpid, [])
+            if not queue:
+                self._deadlines[dpid] = now + self.max_delay
+            queue.append(flow)
+
+            if len(queue) >= self.max_size:
+                return self._pop(dpid)
+        return None
+
+    def requeue(self, dpid, flows, now=None):
+        """Put back flows that could not be sent, ahead of the queued ones.
+
+        The flows are sent with the next expired batch of the switch.
+        """
+        now = monotonic() if now is None else now
+        with self._lock:
+            queue = self._queues.setdefault(dpid, [])
+            if not queue:
+                self._deadlines[dpid] = now + self.max_delay
+            queue[:0] = flows
+
+    def pop_expired(self, now=None):
+        """Return the batches that waited longer than ``max_delay``.
+
+        Returns:
+            list: ``(dpid, flows)`` tuples, one for each expired switch queue.
+
+        """
+        now = monotonic() if now is None else now
+        with self._lock:
+            batches = [(dpid, self._pop(dpid))
+                       for dpid, deadline in list(self._deadlines.items())
+                       if deadline <= now]
+            self._seen = {key: seen for key, seen in self._seen.items()
+                          if now - seen < self.dedup_window}
+        return batches
+
+    def pop_all(self):
+        """Return every pending batch, regardless of its age."""
+        with self._lock:
+            return [(dpid, self._pop(dpid)) for dpid in list(self._queues)]
+
+    def _pop(self, dpid):
+        """Remove and return the queue of a switch. Caller holds the lock."""
+        self._deadlines.pop(dpid, None)
+        return self._queues.pop(dpid, [])
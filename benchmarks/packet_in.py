@@ -0,0 +1,320 @@
+"""Benchmark of the PacketIn handling of of_l2ls with synthetic PacketIns.
+
+Each scenario drives ``Main.handle_packet_in`` with a stream of PacketIns
+from stub switches, while flows are posted to a local HTTP stand-in of
+flow_manager. For each scenario, it reports the PacketIns handled per second,
+the latency percentiles of each handling stage and the memory blocks left
+allocated per PacketIn.
+
+Run it with the NApps directory in the path, like the unit tests::
+
+    PYTHONPATH=/var/lib/kytos python benchmarks/packet_in.py
+
+``--save`` stores the results as the baseline and ``--check`` compares them
+against it, exiting with 1 if any scenario got slower than the tolerance.
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Thread
+from time import perf_counter
+
+from kytos.core import KytosEvent
+from pyof.foundation.basic_types import BinaryData
+from pyof.v0x01.asynchronous.packet_in import PacketIn as PacketIn10
+from pyof.v0x01.asynchronous.packet_in import PacketInReason
+from pyof.v0x04.asynchronous.packet_in import PacketIn as PacketIn13
+from pyof.v0x04.common.flow_match import Match, OxmOfbMatchField, OxmTLV
+
+from napps.kytos.of_l2ls import settings
+from napps.kytos.of_l2ls.metrics import Metrics
+
+BASELINE = Path(__file__).with_name('baseline.json')
+BROADCAST = 0xffffffffffff
+NO_BUFFER = 0xffffffff
+PORTS = 48
+
+
+class FlowManagerStandIn(BaseHTTPRequestHandler):
+    """flow_manager stand-in accepting every request."""
+
+    flows = 0
+
+    def _reply(self, body=b'{}'):
+        """Read the request and reply with ``body``."""
+        length = int(self.headers.get('Content-Length', 0))
+        content = json.loads(self.rfile.read(length) or b'{}')
+        FlowManagerStandIn.flows += len(content.get('flows', ()))
+        self.send_response(202)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_DELETE = _reply
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        """Do not log the requests."""
+
+
+class StubInterface:
+    """Interface that is up and forwards frames."""
+
+    def __init__(self, port_number):
+        self.port_number = port_number
+        self.config = 0
+
+    @staticmethod
+    def is_active():
+        """Return True, the interface is up."""
+        return True
+
+
+class StubSwitch:
+    """Switch with ``ports`` interfaces and a connection to it."""
+
+    def __init__(self, dpid, version, ports=PORTS):
+        self.id = self.dpid = dpid  # pylint: disable=invalid-name
+        self.ofp_version = f'0x0{version}'
+        self.ports = ports
+        self.interfaces = {port: StubInterface(port)
+                           for port in range(1, ports + 1)}
+        self.connection = StubConnection(self, version)
+
+    @staticmethod
+    def is_enabled():
+        """Return True, the switch is enabled."""
+        return True
+
+
+class StubConnection:
+    """Connection of a switch."""
+
+    def __init__(self, switch, version):
+        self.switch = switch
+        self.protocol = type('Protocol', (), {'version': version})()
+
+
+class StubBuffer:
+    """msg_out buffer packing the messages like kytos core does."""
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+
+    def put(self, event):
+        """Pack the message of an event."""
+        packed = event.content['message'].pack()
+        self.messages += 1
+        self.bytes += len(packed)
+
+
+class StubController:
+    """Controller with the attributes used by the NApp."""
+
+    def __init__(self, switches):
+        self.switches = {switch.id: switch for switch in switches}
+        self.buffers = type('Buffers', (), {'msg_out': StubBuffer()})()
+
+    def get_switch_by_dpid(self, dpid):
+        """Return a switch by its dpid."""
+        return self.switches.get(dpid)
+
+
+class SampleMetrics(Metrics):
+    """Metrics keeping every observed latency to compute percentiles."""
+
+    def __init__(self):
+        super().__init__(settings.METRICS_BUCKETS)
+        self.samples = {}
+
+    def observe(self, stage, seconds):
+        """Keep the time spent in a stage."""
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def sample_count(self):
+        """Return how many latencies were observed."""
+        return sum(len(samples) for samples in self.samples.values())
+
+    def percentiles(self):
+        """Return the p50, p90 and p99 of each stage, in microseconds."""
+        result = {}
+        for stage, samples in sorted(self.samples.items()):
+            samples.sort()
+            result[stage] = {
+                f'p{percent}': round(samples[min(len(samples) - 1,
+                                                 len(samples) * percent //
+                                                 100)] * 1e6, 2)
+                for percent in (50, 90, 99)}
+        return result
+
+
+def get_frame(destination, source, ether_type=0x800):
+    """Return a 64 bytes Ethernet frame."""
+    return (destination.to_bytes(6, 'big') + source.to_bytes(6, 'big') +
+            ether_type.to_bytes(2, 'big') + bytes(50))
+
+
+def get_packet_in(switch, in_port, frame):
+    """Return a PacketIn event of a switch, as of_core would create it."""
+    if switch.ofp_version == '0x01':
+        message = PacketIn10(buffer_id=NO_BUFFER, in_port=in_port,
+                             reason=PacketInReason.OFPR_NO_MATCH,
+                             data=BinaryData(frame))
+    else:
+        field = OxmTLV(oxm_field=OxmOfbMatchField.OFPXMT_OFB_IN_PORT,
+                       oxm_value=in_port.to_bytes(4, 'big'))
+        message = PacketIn13(buffer_id=NO_BUFFER,
+                             reason=PacketInReason.OFPR_NO_MATCH,
+                             match=Match(oxm_match_fields=[field]),
+                             data=BinaryData(frame))
+    return KytosEvent(name=(f'kytos/of_core.v{switch.ofp_version}.messages.'
+                            f'in.ofpt_packet_in'),
+                      content={'source': switch.connection,
+                               'message': message})
+
+
+def host_port(host):
+    """Return the port where a host is connected."""
+    return host % PORTS + 1
+
+
+def broadcast_storm(switches, count, rng):
+    """Broadcasts from a few sources, mostly refused by storm control."""
+    for _ in range(count):
+        source = rng.randrange(1, 9)
+        yield rng.choice(switches), host_port(source), get_frame(BROADCAST,
+                                                                 source)
+
+
+def host_churn(switches, count, rng):
+    """Unicast between hosts that keep moving to other ports."""
+    for _ in range(count):
+        source, destination = rng.sample(range(1, 1001), 2)
+        yield (rng.choice(switches), rng.randrange(1, PORTS + 1),
+               get_frame(destination, source))
+
+
+def many_to_many(switches, count, rng):
+    """Unicast between every pair of hosts, which stay on their ports."""
+    for _ in range(count):
+        source, destination = rng.sample(range(1, 201), 2)
+        yield (rng.choice(switches), host_port(source),
+               get_frame(destination, source))
+
+
+SCENARIOS = {
+    'broadcast_storm': (broadcast_storm, (1, 4)),
+    'host_churn': (host_churn, (4,)),
+    'many_to_many': (many_to_many, (4,)),
+    'mixed_versions': (many_to_many, (1, 4)),
+}
+
+
+def run_scenario(name, count, seed):
+    """Run a scenario, returning its results."""
+    # pylint: disable=import-outside-toplevel
+    from napps.kytos.of_l2ls.main import Main
+
+    generate, versions = SCENARIOS[name]
+    switches = [StubSwitch(f'00:00:00:00:00:00:00:{index:02x}',
+                           versions[index % len(versions)])
+                for index in range(1, 9)]
+    napp = Main(StubController(switches))
+    napp.metrics = SampleMetrics()
+    events = [get_packet_in(*packet_in) for packet_in
+              in generate(switches, count, random.Random(seed))]
+    FlowManagerStandIn.flows = 0
+
+    gc.collect()
+    gc.disable()
+    blocks = sys.getallocatedblocks()
+    start = perf_counter()
+    for index, event in enumerate(events):
+        napp.handle_packet_in(event)
+        if index % 256 == 255:
+            napp.execute()
+    elapsed = perf_counter() - start
+    # Each latency sample kept by SampleMetrics is a float block
+    blocks = sys.getallocatedblocks() - blocks - napp.metrics.sample_count()
+    gc.enable()
+    napp.shutdown()
+
+    return {'pps': round(count / elapsed),
+            'blocks_per_packet': round(blocks / count, 2),
+            'packet_outs': napp.controller.buffers.msg_out.messages,
+            'flows': FlowManagerStandIn.flows,
+            'latency_us': napp.metrics.percentiles()}
+
+
+def report(name, result):
+    """Print the results of a scenario."""
+    print(f'{name}: {result["pps"]} PacketIns/s, '
+          f'{result["blocks_per_packet"]} blocks/PacketIn, '
+          f'{result["packet_outs"]} PacketOuts, {result["flows"]} flows')
+    for stage, percentiles in result['latency_us'].items():
+        print(f'  {stage:<13}' + '  '.join(f'{key} {value:>10.2f}us' for
+                                           key, value in percentiles.items()))
+
+
+def check(results, baseline, tolerance):
+    """Return the scenarios slower than the baseline by over ``tolerance``."""
+    return [name for name, result in results.items()
+            if name in baseline and
+            result['pps'] < baseline[name]['pps'] * (1 - tolerance)]
+
+
+def main():
+    """Run the scenarios and compare them with the baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help=f'one of {", ".join(sorted(SCENARIOS))}, '
+                             f'all by default')
+    parser.add_argument('--count', type=int, default=20000,
+                        help='PacketIns per scenario')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--save', action='store_true',
+                        help='store the results as the baseline')
+    parser.add_argument('--check', action='store_true',
+                        help='exit with 1 on regressions over the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='slowdown allowed by --check, from 0 to 1')
+    args = parser.parse_args()
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f'unknown scenario {name}')
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FlowManagerStandIn)
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/api/kytos/flow_manager/v2'
+    settings.FLOW_MANAGER_URL = url
+    settings.PACKET_IN_WORKERS = 0
+    settings.TABLE_MISS_STARTUP_WINDOW = 0
+    settings.MAC_SNAPSHOT_PATH = None
+    if args.check and not args.save and not args.baseline.exists():
+        parser.error(f'no baseline at {args.baseline}, store one with --save')
+
+    results = {}
+    for name in args.scenarios or sorted(SCENARIOS):
+        results[name] = run_scenario(name, args.count, args.seed)
+        report(name, results[name])
+    server.shutdown()
+
+    if args.save:
+        args.baseline.write_text(json.dumps(results, indent=2) + '\n')
+    if args.check:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = check(results, baseline, args.tolerance)
+        for name in regressions:
+            print(f'REGRESSION {name}: {results[name]["pps"]} PacketIns/s, '
+                  f'baseline {baseline[name]["pps"]}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
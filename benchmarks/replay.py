@@ -0,0 +1,358 @@
+"""Offline replay of a pcap capture through the learning logic of of_l2ls.
+
+The Ethernet frames of the capture are handled by ``Main.handle_packet_in``
+as PacketIns of a stub switch, as if it had been connected to the NApp
+during the capture. The switch forwards the frames matching the flows
+installed by the NApp itself, so only the others become PacketIns. Flows and
+MAC addresses expire and storm control refills its tokens on the capture
+clock, so the summary shows the PacketIn rates, flood ratio, flows and MAC
+table size a switch with that traffic would cause.
+
+Captures have no input ports, so each source MAC address is attached to a
+port picked by its value. Frames are read one at a time, so memory does not
+grow with the size of the capture. Run it with the NApps directory in the
+path, like the unit tests::
+
+    PYTHONPATH=/var/lib/kytos python benchmarks/replay.py capture.pcap
+"""
+import argparse
+import json
+import struct
+import sys
+from collections import Counter
+from unittest.mock import patch
+
+from packet_in import StubController, StubSwitch, get_packet_in
+
+from napps.kytos.of_l2ls import settings
+from napps.kytos.of_l2ls.flow_templates import UNTAGGED_VLANS
+from napps.kytos.of_l2ls.mac_table import mac_to_int
+from napps.kytos.of_l2ls.utils import parse_ethernet_header
+
+LINKTYPE_ETHERNET = 1
+# Magic number of pcap files by byte order and their timestamp resolution
+PCAP_MAGIC = {b'\xd4\xc3\xb2\xa1': ('<', 1e-6),
+              b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+              b'\x4d\x3c\xb2\xa1': ('<', 1e-9),
+              b'\xa1\xb2\x3c\x4d': ('>', 1e-9)}
+# Modules whose monotonic() is replaced by the capture clock
+CLOCK_MODULES = ('batcher', 'cache', 'mac_table', 'main', 'storm_control')
+DPID = '00:00:00:00:00:00:00:01'
+
+
+def read_pcap(capture):
+    """Return an iterator of the ``(timestamp, frame)`` records of a pcap.
+
+    Raises:
+        ValueError: If ``capture`` is not a pcap of Ethernet frames.
+
+    """
+    header = capture.read(24)
+    if len(header) < 24 or header[:4] not in PCAP_MAGIC:
+        raise ValueError('Not a pcap file. pcapng files must be converted '
+                         'first, e.g. with editcap -F pcap.')
+    byte_order, resolution = PCAP_MAGIC[header[:4]]
+    linktype = struct.unpack(f'{byte_order}I', header[20:24])[0] & 0xfffffff
+    if linktype != LINKTYPE_ETHERNET:
+        raise ValueError(f'Link type {linktype} is not Ethernet.')
+    return _read_records(capture, struct.Struct(f'{byte_order}IIII'),
+                         resolution)
+
+
+def _read_records(capture, record, resolution):
+    """Yield the records of a pcap, ignoring a truncated last one."""
+    while True:
+        header = capture.read(record.size)
+        if len(header) < record.size:
+            return
+        seconds, fraction, length, _ = record.unpack(header)
+        frame = capture.read(length)
+        if len(frame) < length:
+            return
+        yield seconds + fraction * resolution, frame
+
+
+class CaptureClock:
+    """monotonic() replacement returning the capture time."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SwitchFlowTable:
+    """Flows installed by the NApp in the switch.
+
+    Flows are indexed by the ``(dl_src, dl_dst, dl_type, dl_vlan)`` of their
+    match, with the fields they do not match as None, which covers the flows
+    the NApp installs. Flows without a MAC address, like the table-miss flow,
+    are not kept. ``untagged_vlan`` is the dl_vlan matching untagged frames
+    only in the OpenFlow version of the switch, if there is one.
+    """
+
+    def __init__(self, clock, untagged_vlan=None):
+        self.clock = clock
+        self.untagged_vlan = untagged_vlan
+        self.flows = {}
+        self.max_flows = 0
+        self.stats = Counter(flows_installed=0, flows_deleted=0,
+                             flows_expired=0)
+
+    @staticmethod
+    def _key(match):
+        """Return the index of a match, or None for flows without MACs."""
+        if 'dl_src' not in match and 'dl_dst' not in match:
+            return None
+        source, destination = (mac_to_int(match[field]) if field in match
+                               else None for field in ('dl_src', 'dl_dst'))
+        return (source, destination, match.get('dl_type'),
+                match.get('dl_vlan'))
+
+    def install(self, flows):
+        """Install flows, replacing the ones with the same match."""
+        for flow in flows:
+            if isinstance(flow, str):
+                flow = json.loads(flow)
+            key = self._key(flow['match'])
+            if key is None:
+                continue
+            now = self.clock()
+            self.flows[key] = [flow.get('priority', 0), bool(flow['actions']),
+                               now, now, flow.get('idle_timeout', 0),
+                               flow.get('hard_timeout', 0)]
+            self.stats['flows_installed'] += 1
+        self.max_flows = max(self.max_flows, len(self.flows))
+
+    def delete(self, flows):
+        """Delete the flows with the given matches."""
+        for flow in flows:
+            if self.flows.pop(self._key(flow['match']), None) is not None:
+                self.stats['flows_deleted'] += 1
+
+    @staticmethod
+    def _expired(flow, now):
+        """Return whether a flow timed out."""
+        _, _, installed, used, idle_timeout, hard_timeout = flow
+        return (idle_timeout and now - used >= idle_timeout or
+                hard_timeout and now - installed >= hard_timeout)
+
+    def expire(self):
+        """Remove the flows that timed out."""
+        now = self.clock()
+        for key, flow in list(self.flows.items()):
+            if self._expired(flow, now):
+                del self.flows[key]
+                self.stats['flows_expired'] += 1
+
+    def forward(self, source, destination, ether_type, vlan):
+        """Match a frame against the flows.
+
+        ``vlan`` is None for untagged frames. Every frame, tagged or not,
+        matches the flows without a VLAN.
+
+        Returns:
+            bool: None on a table miss, otherwise whether the matching flow
+            outputs the frame.
+
+        """
+        now = self.clock()
+        best = None
+        keys = [(source, destination, ether_type, None),
+                (None, destination, None, None), (source, None, None, None)]
+        if vlan is None:
+            vlan = self.untagged_vlan
+        if vlan is not None:
+            keys += [(source, destination, ether_type, vlan),
+                     (None, destination, None, vlan)]
+        for key in keys:
+            flow = self.flows.get(key)
+            if flow is None:
+                continue
+            if self._expired(flow, now):
+                del self.flows[key]
+                self.stats['flows_expired'] += 1
+            elif best is None or flow[0] > best[0]:
+                best = flow
+        if best is None:
+            return None
+        best[3] = now
+        return best[1]
+
+
+class InlineExecutor:
+    """Executor running each call right away, so flows follow the capture."""
+
+    @staticmethod
+    def submit(function, *args):
+        """Call ``function``."""
+        function(*args)
+
+    def shutdown(self):
+        """Do nothing, there are no threads."""
+
+
+class ReplayFlowManager:
+    """flow_manager client installing the flows in a SwitchFlowTable.
+
+    Flows are dicts or JSON strings, like with the real clients.
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def post_flows(self, dpid, flows,  # pylint: disable=unused-argument
+                   callback=None):
+        """Install flows."""
+        self.table.install(flows)
+        if callback is not None:
+            callback(True)
+        return True
+
+    def delete_flows(self, dpid, flows):  # pylint: disable=unused-argument
+        """Delete flows."""
+        self.table.delete(flows)
+        return True
+
+    @staticmethod
+    def get_flows():
+        """Return the flows of no switch."""
+        return {}
+
+    def close(self):
+        """Do nothing, there is no connection."""
+
+
+def replay(records, ports, version):
+    """Replay the ``(timestamp, frame)`` records of a capture.
+
+    Returns:
+        dict: Summary of the forwarding decisions and resources used.
+
+    """
+    # pylint: disable=import-outside-toplevel
+    from napps.kytos.of_l2ls.main import Main
+
+    switch = StubSwitch(DPID, version, ports)
+    clock = CaptureClock()
+    table = SwitchFlowTable(clock, UNTAGGED_VLANS.get(version))
+    stats = Counter(frames=0, bytes=0, runts=0, forwarded_by_flows=0,
+                    dropped_by_flows=0, peak_packet_ins_per_second=0,
+                    max_mac_entries=0)
+    patches = [patch(f'napps.kytos.of_l2ls.{module}.monotonic', clock)
+               for module in CLOCK_MODULES]
+    for clock_patch in patches:
+        clock_patch.start()
+    try:
+        napp = Main(StubController([switch]))
+        napp.flow_manager.close()
+        napp.flow_manager = ReplayFlowManager(table)
+        napp.flow_executor.shutdown()
+        napp.flow_executor = InlineExecutor()
+        try:
+            _replay(napp, switch, records, clock, table, stats)
+        finally:
+            napp.shutdown()
+    finally:
+        for clock_patch in patches:
+            clock_patch.stop()
+
+    counters = napp.metrics.as_dict()['counters'].get(DPID, {})
+    stats.update(table.stats)
+    stats.update({name: counters.get(name, 0)
+                  for name in ('packet_in', 'ignored', 'storm_dropped',
+                               'unicast', 'flood', 'no_fwd', 'host_moved')})
+    duration = clock.now
+    decisions = stats['flood'] + stats['unicast']
+    return dict(
+        stats, duration=round(duration, 3),
+        packet_ins_per_second=(round(stats['packet_in'] / duration, 1)
+                               if duration else None),
+        flood_ratio=(round(stats['flood'] / decisions, 4)
+                     if decisions else None),
+        max_flows=table.max_flows, flows=len(table.flows),
+        mac_entries=_count_mac_entries(napp),
+        packet_outs=napp.controller.buffers.msg_out.messages)
+
+
+def _replay(napp, switch, records, clock, table, stats):
+    """Handle the frames of a capture, counting them in ``stats``."""
+    start = second = next_execute = None
+    packet_ins = 0
+    for timestamp, frame in records:
+        if start is None:
+            start = second = next_execute = timestamp
+        clock.now = timestamp - start
+        if timestamp >= next_execute:
+            napp.execute()
+            next_execute = timestamp + settings.FLOW_BATCH_INTERVAL
+        if timestamp >= second + 1:
+            _count_second(napp, table, stats, packet_ins)
+            second, packet_ins = timestamp, 0
+
+        stats['frames'] += 1
+        stats['bytes'] += len(frame)
+        header = parse_ethernet_header(frame)
+        if header is None:
+            stats['runts'] += 1
+            continue
+        forwarded = table.forward(header.source, header.destination,
+                                  header.ether_type, header.vlan)
+        if forwarded is not None:
+            stats['forwarded_by_flows' if forwarded
+                  else 'dropped_by_flows'] += 1
+            continue
+        packet_ins += 1
+        napp.handle_packet_in(get_packet_in(switch,
+                                            header.source % switch.ports + 1,
+                                            frame))
+    _count_second(napp, table, stats, packet_ins)
+
+
+def _count_second(napp, table, stats, packet_ins):
+    """Update the peaks at the end of each second of the capture."""
+    table.expire()
+    stats['peak_packet_ins_per_second'] = max(
+        stats['peak_packet_ins_per_second'], packet_ins)
+    stats['max_mac_entries'] = max(stats['max_mac_entries'],
+                                   _count_mac_entries(napp))
+
+
+def _count_mac_entries(napp):
+    """Return the MAC addresses learned in every VLAN of the switch."""
+    return sum(len(mac_table) for (dpid, _), mac_table
+               in napp.mac_tables.items() if dpid == DPID)
+
+
+def main():
+    """Replay a capture and print the summary."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('capture', type=argparse.FileType('rb'),
+                        help='pcap file of Ethernet frames')
+    parser.add_argument('--ports', type=int, default=48,
+                        help='ports of the switch')
+    parser.add_argument('--version', type=int, choices=(1, 4), default=4,
+                        help='OpenFlow version of the switch, 1 or 4')
+    parser.add_argument('--json', action='store_true',
+                        help='print the summary as JSON')
+    args = parser.parse_args()
+
+    settings.PACKET_IN_WORKERS = 0
+    settings.TABLE_MISS_STARTUP_WINDOW = 0
+    settings.MAC_SNAPSHOT_PATH = None
+    try:
+        records = read_pcap(args.capture)
+    except ValueError as error:
+        sys.exit(f'{args.capture.name}: {error}')
+    summary = replay(records, args.ports, args.version)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        for name, value in summary.items():
+            print(f'{name:<28} {value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""Bookkeeping of the flows installed by this NApp."""
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+
+class FlowCache:
+    """Remember which flows were recently installed in each switch.
+
+    Flows are identified by the ``(dl_src, dl_dst, dl_type, dl_vlan)`` key of
+    their match, so a switch holds at most one flow per key and the cache
+    keeps the output port of the last one installed. Entries expire ``ttl``
+    seconds after being added and the least recently added ones are evicted
+    when there are more than ``max_size`` entries. Entries are also indexed
+    by switch and output port, so that the flows of a switch or of a port can
+    be dropped without scanning the whole cache.
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._ports = {}
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, dpid, key, out_port, now=None):
+        """Add a flow to the cache, unless it is already there.
+
+        A flow with the same key and another output port replaces the one in
+        the cache, as it replaces it in the switch.
+
+        Returns:
+            bool: False if the same flow was added less than ``ttl`` seconds
+            ago, so it does not need to be installed again. True otherwise.
+
+        """
+        now = monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get((dpid, key))
+            if entry is not None:
+                if entry[0] == out_port and now - entry[1] < self.ttl:
+                    return False
+                self._unindex(dpid, key, entry[0])
+
+            self._entries[(dpid, key)] = (out_port, now)
+            self._entries.move_to_end((dpid, key))
+            self._ports.setdefault(dpid, {}).setdefault(out_port,
+                                                        set()).add(key)
+            while len(self._entries) > self.max_size:
+                (old_dpid, old_key), (old_port, _) = self._entries.popitem(
+                    last=False)
+                self._unindex(old_dpid, old_key, old_port)
+        return True
+
+    def discard(self, dpid, key, out_port):
+        """Drop a flow, so that it is installed again when needed.
+
+        Nothing is dropped if the flow of ``key`` outputs to another port.
+        """
+        with self._lock:
+            entry = self._entries.get((dpid, key))
+            if entry is not None and entry[0] == out_port:
+                del self._entries[(dpid, key)]
+                self._unindex(dpid, key, out_port)
+
+    def invalidate_switch(self, dpid):
+        """Drop every flow of a switch."""
+        with self._lock:
+            for keys in self._ports.pop(dpid, {}).values():
+                for key in keys:
+                    del self._entries[(dpid, key)]
+
+    def invalidate_port(self, dpid, port):
+        """Drop the flows of a switch that output to ``port``.
+
+        Returns:
+            set: The ``(dpid, key, out_port)`` entries of the dropped flows.
+
+        """
+        with self._lock:
+            ports = self._ports.get(dpid, {})
+            keys = ports.pop(port, set())
+            for key in keys:
+                del self._entries[(dpid, key)]
+            if not ports:
+                self._ports.pop(dpid, None)
+        return {(dpid, key, port) for key in keys}
+
+    def invalidate_destination(self, dpid, port, dl_dst, dl_vlan):
+        """Drop the flows of a switch that output ``dl_dst`` to ``port``.
+
+        Only the flows of the VLAN ``dl_vlan`` are dropped.
+
+        Returns:
+            list: The ``(dpid, key, out_port)`` entries of the dropped flows.
+
+        """
+        with self._lock:
+            keys = [key for key in self._ports.get(dpid, {}).get(port, ())
+                    if key[1] == dl_dst and key[3] == dl_vlan]
+            for key in keys:
+                del self._entries[(dpid, key)]
+                self._unindex(dpid, key, port)
+        return [(dpid, key, port) for key in keys]
+
+    def _unindex(self, dpid, key, out_port):
+        """Remove a flow from the port index. Caller holds the lock."""
+        ports = self._ports[dpid]
+        ports[out_port].discard(key)
+        if not ports[out_port]:
+            del ports[out_port]
+            if not ports:
+                del self._ports[dpid]
+
+
+class FlowBudget:
+    """Keep the number of flows installed in each switch within a budget.
+
+    Flows are tracked per switch in the order they were last seen. Once a
+    switch has more than ``high`` times ``size`` flows, the least recently
+    seen ones are evicted until ``low`` times ``size`` remain. Evicted flows
+    are kept until :meth:`pop_evicted` is called, so that they can be deleted
+    from the switch. A ``size`` of 0 disables the budget.
+
+    Flows that time out in the switch are tracked until :meth:`reconcile` is
+    called with the flows really installed, so the budget may count more
+    flows than the switch has, but never fewer.
+    """
+
+    def __init__(self, size, high, low):
+        self.size = size
+        self.high = int(size * high)
+        self.low = int(size * low)
+        self._flows = {}
+        self._evicted = {}
+        self._lock = Lock()
+
+    def count(self, dpid):
+        """Return the number of flows tracked in a switch."""
+        return len(self._flows.get(dpid, ()))
+
+    def add(self, dpid, key, value, now=None):
+        """Track a flow installed in a switch.
+
+        Returns:
+            list: The values of the flows evicted to make room for it.
+
+        """
+        if not self.size:
+            return []
+        now = monotonic() if now is None else now
+        with self._lock:
+            flows = self._flows.setdefault(dpid, OrderedDict())
+            flows[key] = (value, now)
+            flows.move_to_end(key)
+            if len(flows) <= self.high:
+                return []
+
+            evicted = [flows.popitem(last=False)[1][0]
+                       for _ in range(len(flows) - self.low)]
+            self._evicted.setdefault(dpid, []).extend(evicted)
+        return evicted
+
+    def touch(self, dpid, key):
+        """Mark a tracked flow as recently seen."""
+        with self._lock:
+            flows = self._flows.get(dpid)
+            if flows and key in flows:
+                flows.move_to_end(key)
+
+    def discard(self, dpid, key):
+        """Stop tracking a flow of a switch."""
+        with self._lock:
+            flows = self._flows.get(dpid)
+            if flows:
+                flows.pop(key, None)
+
+    def reconcile(self, dpid, keys, before):
+        """Forget the tracked flows of a switch that it no longer has.
+
+        ``keys`` are the keys of the flows installed in the switch. Flows
+        added since ``before`` may not be installed yet, so they are kept.
+
+        Returns:
+            list: The values of the forgotten flows.
+
+        """
+        with self._lock:
+            flows = self._flows.get(dpid)
+            if not flows:
+                return []
+            gone = [key for key, (_, added) in flows.items()
+                    if added < before and key not in keys]
+            return [flows.pop(key)[0] for key in gone]
+
+    def remove_switch(self, dpid):
+        """Stop tracking the flows of a switch."""
+        with self._lock:
+            self._flows.pop(dpid, None)
+            self._evicted.pop(dpid, None)
+
+    def pop_evicted(self):
+        """Return and forget the flows evicted from each switch.
+
+        Returns:
+            list: ``(dpid, values)`` tuples.
+
+        """
+        with self._lock:
+            evicted, self._evicted = self._evicted, {}
+        return list(evicted.items())
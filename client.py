@@ -0,0 +1,270 @@
+"""Clients used to talk to the flow_manager NApp."""
+import asyncio
+from collections import namedtuple
+from concurrent.futures import wait
+from functools import partial
+from threading import BoundedSemaphore, Lock, Thread
+
+import requests
+from kytos.core import log
+from requests.adapters import HTTPAdapter
+
+from napps.kytos.of_l2ls.flow_templates import encode_flows
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+#: Size of the connection pool and number of requests in flight and waiting
+#: to be sent, ``max_pending`` is only used by the aiohttp client
+ClientLimits = namedtuple('ClientLimits',
+                          'pool_size max_inflight max_pending')
+
+
+def get_client(engine, url, timeout, limits):
+    """Return the flow_manager client of ``engine``, 'requests' or 'aiohttp'.
+
+    The requests client is returned if aiohttp is not installed.
+    """
+    if engine == 'aiohttp':
+        if aiohttp is not None:
+            return AsyncFlowManagerClient(url, timeout, limits)
+        log.error('aiohttp is not installed, using requests to talk to '
+                  'flow_manager.')
+    return FlowManagerClient(url, timeout, limits)
+
+
+class FlowManagerClient:
+    """Keep-alive HTTP client to flow_manager with bounded concurrency.
+
+    All the requests share one pooled session, so the TCP connections to
+    flow_manager are reused. At most ``max_inflight`` requests are in flight at
+    the same time; further requests are refused right away instead of blocking
+    the calling thread.
+    """
+
+    def __init__(self, url, timeout, limits):
+        self.url = url
+        self.timeout = timeout
+        self._slots = BoundedSemaphore(limits.max_inflight)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1,
+                              pool_maxsize=limits.pool_size)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+    def post_flows(self, dpid, flows, callback=None):
+        """Install flows, dicts or JSON strings, in the switch ``dpid``.
+
+        Unless the request is refused, ``callback`` is called with whether it
+        succeeded once it is done.
+
+        Returns:
+            bool: False if the request was refused because too many requests
+            are in flight, True otherwise.
+
+        """
+        return self._request('post', f'flows/{dpid}', callback,
+                             data=encode_flows(flows), headers=JSON_HEADERS)
+
+    def delete_flows(self, dpid, flows):
+        """Delete the flows matching ``flows`` from the switch ``dpid``.
+
+        Returns:
+            bool: False if the request was refused because too many requests
+            are in flight, True otherwise.
+
+        """
+        return self._request('delete', f'flows/{dpid}', None,
+                             json={'flows': flows})
+
+    def get_flows(self):
+        """Return the flows installed by flow_manager in each switch.
+
+        Unlike the other requests, this one waits for a free slot instead of
+        being refused.
+
+        Returns:
+            dict: ``{dpid: {'flows': [...]}}``, or None if the request failed.
+
+        """
+        with self._slots:
+            response = self._send('get', 'flows')
+        if response is None:
+            return None
+        try:
+            return response.json()
+        except ValueError as error:
+            log.error(f'Invalid flows returned by flow_manager: {error}')
+            return None
+
+    def _request(self, method, path, callback, **kwargs):
+        """Send a request to flow_manager if there is a free slot."""
+        if not self._slots.acquire(blocking=False):
+            log.warning(f'Too many requests to flow_manager, {method.upper()} '
+                        f'{path} was refused.')
+            return False
+
+        try:
+            response = self._send(method, path, **kwargs)
+        finally:
+            self._slots.release()
+        if callback is not None:
+            callback(response is not None)
+        return True
+
+    def _send(self, method, path, **kwargs):
+        """Send a request, returning the response or None if it failed."""
+        endpoint = f'{self.url}/{path}'
+        try:
+            response = self._session.request(method, endpoint,
+                                             timeout=self.timeout, **kwargs)
+        except requests.RequestException as error:
+            log.error(f'Request {method.upper()} {endpoint} failed: {error}')
+            return None
+        if response.status_code // 100 != 2:
+            log.error(f'Request {method.upper()} {endpoint} failed with '
+                      f'status {response.status_code}: {response.text}')
+            return None
+        return response
+
+    def close(self):
+        """Close the pooled connections."""
+        self._session.close()
+
+
+class AsyncFlowManagerClient:
+    """HTTP client to flow_manager running on its own asyncio event loop.
+
+    Requests are sent by an aiohttp session on an event loop running in a
+    single thread, so the caller never waits for flow_manager and requests
+    waiting for a response hold no thread. At most ``max_inflight`` requests
+    are in flight at the same time and the others wait in the event loop. Once
+    ``max_pending`` requests are waiting, further requests are refused right
+    away.
+    """
+
+    def __init__(self, url, timeout, limits):
+        self.url = url
+        self.max_pending = limits.max_pending
+        self._pending = set()
+        self._lock = Lock()
+        self._slots = None
+        self._session = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = Thread(target=self._loop.run_forever,
+                              name='of_l2ls_flow_manager', daemon=True)
+        self._thread.start()
+        self._run(self._start(timeout, limits)).result()
+
+    async def _start(self, timeout, limits):
+        """Create the session and the slots inside the event loop."""
+        if isinstance(timeout, tuple):
+            timeout = aiohttp.ClientTimeout(sock_connect=timeout[0],
+                                            sock_read=timeout[1])
+        else:
+            timeout = aiohttp.ClientTimeout(total=timeout)
+        self._slots = asyncio.Semaphore(limits.max_inflight)
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=limits.pool_size),
+            timeout=timeout)
+
+    def _run(self, coroutine):
+        """Schedule a coroutine in the event loop, returning its future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def post_flows(self, dpid, flows, callback=None):
+        """Install flows in the switch ``dpid``, without waiting for it.
+
+        Flows are dicts or JSON strings. Unless the request is refused,
+        ``callback`` is called from the event loop with whether it succeeded
+        once it is done.
+
+        Returns:
+            bool: False if the request was refused because too many requests
+            are pending, True otherwise.
+
+        """
+        return self._request('post', f'flows/{dpid}', callback,
+                             data=encode_flows(flows), headers=JSON_HEADERS)
+
+    def delete_flows(self, dpid, flows):
+        """Delete the flows matching ``flows``, without waiting for it.
+
+        Returns:
+            bool: False if the request was refused because too many requests
+            are pending, True otherwise.
+
+        """
+        return self._request('delete', f'flows/{dpid}', None,
+                             json={'flows': flows})
+
+    def get_flows(self):
+        """Return the flows installed by flow_manager in each switch.
+
+        Unlike the other requests, this one waits for the response.
+
+        Returns:
+            dict: ``{dpid: {'flows': [...]}}``, or None if the request failed.
+
+        """
+        return self._run(self._send('get', 'flows', read_json=True)).result()
+
+    def _request(self, method, path, callback, **kwargs):
+        """Schedule a request to flow_manager if not too many are pending."""
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                log.warning(f'Too many requests to flow_manager, '
+                            f'{method.upper()} {path} was refused.')
+                return False
+            future = self._run(self._send(method, path, **kwargs))
+            self._pending.add(future)
+        future.add_done_callback(partial(self._done, callback))
+        return True
+
+    def _done(self, callback, future):
+        """Forget a request once it is done and report whether it succeeded."""
+        with self._lock:
+            self._pending.discard(future)
+        if callback is not None:
+            callback(not future.cancelled() and future.exception() is None and
+                     future.result() is not None)
+
+    async def _send(self, method, path, read_json=False, **kwargs):
+        """Send a request, returning the JSON response if ``read_json``.
+
+        Returns None if the request failed and True if it succeeded without
+        ``read_json``.
+        """
+        endpoint = f'{self.url}/{path}'
+        async with self._slots:
+            try:
+                async with self._session.request(method, endpoint,
+                                                 **kwargs) as response:
+                    if response.status // 100 != 2:
+                        text = await response.text()
+                        log.error(f'Request {method.upper()} {endpoint} '
+                                  f'failed with status {response.status}: '
+                                  f'{text}')
+                        return None
+                    if read_json:
+                        return await response.json()
+                    return True
+            except (aiohttp.ClientError, asyncio.TimeoutError,
+                    ValueError) as error:
+                log.error(f'Request {method.upper()} {endpoint} failed: '
+                          f'{error}')
+        return None
+
+    def close(self):
+        """Wait for the pending requests and close the connections."""
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending)
+        self._run(self._session.close()).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
@@ -0,0 +1,57 @@
+"""Sharding of the PacketIns handled by this NApp across worker threads."""
+from queue import Full, Queue
+from threading import Thread
+
+from kytos.core import log
+
+
+class PacketInDispatcher:
+    """Handle events in a fixed pool of worker threads, sharded by switch.
+
+    Each worker has its own queue of up to ``queue_size`` events, so events
+    of the same switch are always handled by the same worker, in the order
+    they arrived. Events that find their queue full are dropped.
+    """
+
+    def __init__(self, handle, workers, queue_size):
+        self._handle = handle
+        self._queues = [Queue(maxsize=queue_size) for _ in range(workers)]
+        self._threads = [Thread(target=self._work, args=(queue,),
+                                name=f'of_l2ls_packet_in_{index}',
+                                daemon=True)
+                         for index, queue in enumerate(self._queues)]
+        for thread in self._threads:
+            thread.start()
+
+    def dispatch(self, dpid, event):
+        """Queue an event of the switch ``dpid`` to its worker.
+
+        Returns:
+            bool: False if the queue of the worker is full, True otherwise.
+
+        """
+        queue = self._queues[hash(dpid) % len(self._queues)]
+        try:
+            queue.put_nowait(event)
+        except Full:
+            return False
+        return True
+
+    def stop(self):
+        """Stop the workers once they handle the events already queued."""
+        for queue in self._queues:
+            queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _work(self, queue):
+        """Handle the events of a queue until :meth:`stop` is called."""
+        while True:
+            event = queue.get()
+            if event is None:
+                return
+            try:
+                self._handle(event)
+            # pylint: disable=broad-except
+            except Exception as error:
+                log.error(f'Error handling {event.name}: {error}')
@@ -0,0 +1,115 @@
+"""Flooding over a spanning tree of the links between switches."""
+from collections import deque
+from threading import Lock
+
+
+class FloodTree:
+    """Ports to flood in each switch, over a spanning tree of the links.
+
+    Links are ``(dpid_a, port_a, dpid_b, port_b)`` tuples. The ports of the
+    links outside the spanning tree are blocked: floods are not sent to them
+    and frames arriving on them are not flooded, so broadcasts neither loop
+    nor get multiplied in meshed fabrics. The flood ports of each switch and
+    input port are cached until the blocked ports of the switch change or
+    :meth:`invalidate` is called.
+    """
+
+    def __init__(self):
+        self._blocked = {}
+        self._link_ports = {}
+        self._cache = {}
+        self._versions = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def _spanning_tree(links):
+        """Return the links of a spanning tree of each connected component.
+
+        Each tree is built breadth-first from the lowest dpid, so the same
+        links always give the same tree.
+        """
+        adjacency = {}
+        for link in links:
+            adjacency.setdefault(link[0], []).append((link[2], link))
+            adjacency.setdefault(link[2], []).append((link[0], link))
+
+        tree = set()
+        visited = set()
+        for root in sorted(adjacency):
+            if root in visited:
+                continue
+            visited.add(root)
+            queue = deque([root])
+            while queue:
+                for neighbour, link in sorted(adjacency[queue.popleft()]):
+                    if neighbour not in visited:
+                        visited.add(neighbour)
+                        tree.add(link)
+                        queue.append(neighbour)
+        return tree
+
+    def update(self, links):
+        """Compute the spanning tree of the active ``links``.
+
+        Only the cached flood ports of the switches whose blocked ports
+        changed are dropped.
+        """
+        tree = self._spanning_tree(links)
+        blocked = {}
+        for dpid_a, port_a, dpid_b, port_b in links:
+            if (dpid_a, port_a, dpid_b, port_b) not in tree:
+                blocked.setdefault(dpid_a, set()).add(port_a)
+                blocked.setdefault(dpid_b, set()).add(port_b)
+        blocked = {dpid: frozenset(ports) for dpid, ports in blocked.items()}
+        link_ports = {}
+        for dpid_a, port_a, dpid_b, port_b in links:
+            link_ports.setdefault(dpid_a, set()).add(port_a)
+            link_ports.setdefault(dpid_b, set()).add(port_b)
+
+        with self._lock:
+            for dpid in set(blocked) | set(self._blocked):
+                if blocked.get(dpid) != self._blocked.get(dpid):
+                    self._invalidate(dpid)
+            self._blocked = blocked
+            self._link_ports = link_ports
+
+    def link_ports(self, dpid):
+        """Return the ports of a switch linked to other switches."""
+        return self._link_ports.get(dpid, ())
+
+    def invalidate(self, dpid):
+        """Drop the cached flood ports of a switch."""
+        with self._lock:
+            self._invalidate(dpid)
+
+    def _invalidate(self, dpid):
+        """Drop the cached flood ports of a switch. Caller holds the lock."""
+        self._cache.pop(dpid, None)
+        self._versions[dpid] = self._versions.get(dpid, 0) + 1
+
+    def ports(self, dpid, in_port, get_ports):
+        """Return the ports to flood a frame arriving on ``in_port`` to.
+
+        ``get_ports()`` returns the ports of the switch that can be flooded.
+        It is only called when the flood ports are not cached.
+
+        Returns:
+            tuple: The flood ports, empty if ``in_port`` is blocked.
+
+        """
+        ports = self._cache.get(dpid, {}).get(in_port)
+        if ports is not None:
+            return ports
+
+        version = self._versions.get(dpid, 0)
+        blocked = self._blocked.get(dpid, frozenset())
+        if in_port in blocked:
+            ports = ()
+        else:
+            ports = tuple(sorted(port for port in get_ports()
+                                 if port != in_port and port not in blocked))
+        with self._lock:
+            # Do not cache ports computed before an invalidation
+            if self._versions.get(dpid, 0) == version:
+                self._cache.setdefault(dpid, {})[in_port] = ports
+        return ports
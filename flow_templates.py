@@ -0,0 +1,81 @@
+"""JSON encoding of the flows sent to flow_manager."""
+import json
+
+from napps.kytos.of_l2ls.mac_table import int_to_mac
+
+# Placeholders of the values filled in the templates, as strings so that they
+# survive json.dumps. '%' is not used anywhere else in the JSON of a flow.
+SOURCE = '%(dl_src)s'
+DESTINATION = '%(dl_dst)s'
+VLAN = '%(dl_vlan)d'
+PORT = '%(port)d'
+
+#: dl_vlan of the flows matching untagged frames only, by OpenFlow version.
+#: OpenFlow 1.0 matches them with OFP_VLAN_NONE. of_core sets OFPVID_PRESENT in
+#: every dl_vlan of OpenFlow 1.3 flows, so OFPVID_NONE cannot be matched there
+#: and VLANs are not learned on those switches.
+UNTAGGED_VLANS = {0x01: 0xffff}
+
+
+def encode_flows(flows):
+    """Return the JSON body of a flow_manager request installing ``flows``.
+
+    Flows are dicts or strings with their JSON, as encoded by
+    :class:`FlowTemplates`.
+    """
+    return ('{"flows": [' +
+            ', '.join(flow if isinstance(flow, str) else json.dumps(flow)
+                      for flow in flows) +
+            ']}').encode()
+
+
+class FlowTemplates:
+    """Pre-encoded JSON of the flows forwarding frames to a learned host.
+
+    The JSON of these flows only differs by their MAC addresses, VLAN and
+    output port once the EtherType is fixed, so it is encoded once for each
+    ``dl_type``, tagged or not, as a template and flows are encoded by filling
+    the template in. Flows with None as ``dl_type`` match the destination only
+    and flows of untagged frames do not match a VLAN.
+    """
+
+    def __init__(self, priority, table_id, idle_timeout, hard_timeout):
+        self.priority = priority
+        self.table_id = table_id
+        self.idle_timeout = idle_timeout
+        self.hard_timeout = hard_timeout
+        self._templates = {}
+
+    def _build(self, dl_type, tagged):
+        """Return the template of the flows with these fields."""
+        if dl_type is None:
+            match = {'dl_dst': DESTINATION}
+        else:
+            match = {'dl_src': SOURCE, 'dl_dst': DESTINATION,
+                     'dl_type': dl_type}
+        if tagged:
+            match['dl_vlan'] = VLAN
+        flow = {'priority': self.priority, 'table_id': self.table_id,
+                'idle_timeout': self.idle_timeout,
+                'hard_timeout': self.hard_timeout, 'match': match,
+                'actions': [{'action_type': 'output', 'port': PORT}]}
+        return (json.dumps(flow).replace(f'"{VLAN}"', VLAN)
+                .replace(f'"{PORT}"', PORT))
+
+    def encode(self, header, port, dst_only=False):
+        """Return the JSON of a flow sending frames like ``header`` to port.
+
+        The source and the EtherType of ``header`` are left out of the match
+        if ``dst_only`` is set.
+        """
+        dl_type = None if dst_only else header.ether_type
+        key = (dl_type, header.vlan is not None)
+        template = self._templates.get(key)
+        if template is None:
+            template = self._templates.setdefault(
+                key, self._build(*key))
+        values = {'dl_dst': int_to_mac(header.destination),
+                  'dl_vlan': header.vlan, 'port': port}
+        if dl_type is not None:
+            values['dl_src'] = int_to_mac(header.source)
+        return template % values
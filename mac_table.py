@@ -0,0 +1,199 @@
+"""MAC learning table kept by this NApp for each switch."""
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+
+def mac_to_int(mac):
+    """Convert a MAC address like '00:00:00:00:00:01' to an integer."""
+    return int(mac.replace(':', ''), 16)
+
+
+def int_to_mac(value):
+    """Convert an integer to a MAC address like '00:00:00:00:00:01'."""
+    mac = f'{value:012x}'
+    return ':'.join(mac[i:i + 2] for i in range(0, 12, 2))
+
+
+class MACTable:
+    """Map the MAC addresses learned in a switch to the port they are on.
+
+    MAC addresses are stored as 48-bit integers, in the order they were last
+    seen. An entry not seen for ``max_age`` seconds is no longer used and, when
+    more than ``max_entries`` are learned, the least recently seen entry is
+    evicted. Entries are also indexed by port. Every operation is O(1), apart
+    from :meth:`expire` and :meth:`remove_port`, which are proportional to the
+    number of removed entries.
+
+    With ``track_removals``, the entries removed before aging out, by eviction
+    or on request, are kept until :meth:`pop_removed`, so that copies of the
+    table can forget them too.
+    """
+
+    def __init__(self, max_age, max_entries, track_removals=False):
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._track_removals = track_removals
+        self._removed = set()
+        self._removed_all = False
+        self._entries = OrderedDict()
+        self._ports = {}
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def learn(self, mac, port, now=None):
+        """Record that ``mac`` was seen on ``port``.
+
+        Returns:
+            The port where ``mac`` was seen before, if it moved from another
+            port. None otherwise.
+
+        """
+        now = monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(mac)
+            self._entries[mac] = (port, now)
+            self._entries.move_to_end(mac)
+            if entry is not None and entry[0] == port:
+                return None
+
+            self._ports.setdefault(port, set()).add(mac)
+            if entry is not None:
+                self._unindex(mac, entry[0])
+                return entry[0]
+            if len(self._entries) > self.max_entries:
+                evicted, (evicted_port, _) = self._entries.popitem(last=False)
+                self._unindex(evicted, evicted_port)
+                self._add_removed((evicted,))
+        return None
+
+    def lookup(self, mac, now=None):
+        """Return the port where ``mac`` was seen, or None if unknown."""
+        now = monotonic() if now is None else now
+        entry = self._entries.get(mac)
+        if entry is None or now - entry[1] >= self.max_age:
+            return None
+        return entry[0]
+
+    def remove(self, mac):
+        """Forget a MAC address."""
+        with self._lock:
+            entry = self._entries.pop(mac, None)
+            if entry is not None:
+                self._unindex(mac, entry[0])
+                self._add_removed((mac,))
+
+    def remove_port(self, port):
+        """Forget the MAC addresses learned on a port.
+
+        Returns:
+            set: The removed MAC addresses.
+
+        """
+        with self._lock:
+            macs = self._ports.pop(port, set())
+            for mac in macs:
+                del self._entries[mac]
+            self._add_removed(macs)
+        return macs
+
+    def ports(self):
+        """Return the ports where MAC addresses were learned."""
+        with self._lock:
+            return list(self._ports)
+
+    def clear(self):
+        """Forget every MAC address."""
+        with self._lock:
+            self._add_removed(self._entries)
+            self._entries.clear()
+            self._ports.clear()
+
+    def pop_removed(self):
+        """Return and forget the MAC addresses removed before aging out.
+
+        Returns:
+            set: The MAC addresses removed since the previous call, or None
+            if there were more than ``max_entries`` of them.
+
+        """
+        with self._lock:
+            removed = None if self._removed_all else self._removed
+            self._removed = set()
+            self._removed_all = False
+        return removed
+
+    def entries(self, now=None):
+        """Yield the entries not aged out, least recently seen first.
+
+        The entries are copied first, so the table can change meanwhile.
+
+        Yields:
+            tuple: ``(mac, port, age)``, with the age in seconds.
+
+        """
+        now = monotonic() if now is None else now
+        with self._lock:
+            items = list(self._entries.items())
+        for mac, (port, seen) in items:
+            if now - seen < self.max_age:
+                yield mac, port, now - seen
+
+    def seen_since(self, since):
+        """Return the entries seen after the monotonic time ``since``.
+
+        Only those entries are visited, starting from the most recently seen.
+
+        Returns:
+            list: ``(mac, port, seen)`` tuples, least recently seen first.
+
+        """
+        entries = []
+        with self._lock:
+            for mac, (port, seen) in reversed(self._entries.items()):
+                if seen <= since:
+                    break
+                entries.append((mac, port, seen))
+        entries.reverse()
+        return entries
+
+    def expire(self, now=None):
+        """Remove the entries not seen for ``max_age`` seconds.
+
+        Returns:
+            int: The number of removed entries.
+
+        """
+        now = monotonic() if now is None else now
+        removed = 0
+        with self._lock:
+            while self._entries:
+                mac, (port, seen) = next(iter(self._entries.items()))
+                if now - seen < self.max_age:
+                    break
+                del self._entries[mac]
+                self._unindex(mac, port)
+                removed += 1
+        return removed
+
+    def _add_removed(self, macs):
+        """Keep the removed MAC addresses, if tracked. Caller holds the lock.
+
+        Past ``max_entries`` of them, only the fact that there were too many
+        is kept.
+        """
+        if not self._track_removals or self._removed_all:
+            return
+        self._removed.update(macs)
+        if len(self._removed) > self.max_entries:
+            self._removed = set()
+            self._removed_all = True
+
+    def _unindex(self, mac, port):
+        """Remove a MAC address from a port index. Caller holds the lock."""
+        macs = self._ports[port]
+        macs.discard(mac)
+        if not macs:
+            del self._ports[port]
@@ -1,20 +1,38 @@
 """NApp that solve the L2 Learning Switch algorithm."""
-import requests
-from kytos.core import KytosEvent, KytosNApp, log
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from string import hexdigits
+from threading import BoundedSemaphore, Lock
+from time import monotonic
+
+from flask import Response, jsonify, request
+from kytos.core import KytosEvent, KytosNApp, log, rest
 from kytos.core.helpers import listen_to
-from pyof.foundation.network_types import Ethernet
 # OpenFlow structures that differ will be imported versionwise.
 from pyof.v0x01.asynchronous.packet_in import PacketInReason
-from pyof.v0x01.common.action import ActionOutput as Output10
-from pyof.v0x01.common.phy_port import Port as Port10
-from pyof.v0x01.common.phy_port import PortConfig as PortConfig10
-from pyof.v0x01.controller2switch.packet_out import PacketOut as PacketOut10
-from pyof.v0x04.common.action import ActionOutput as Output13
 from pyof.v0x04.common.port import PortConfig as PortConfig13
 from pyof.v0x04.common.port import PortNo as Port13
-from pyof.v0x04.controller2switch.packet_out import PacketOut as PacketOut13
+from werkzeug.exceptions import BadRequest
 
 from napps.kytos.of_l2ls import settings
+from napps.kytos.of_l2ls.batcher import FlowBatcher
+from napps.kytos.of_l2ls.cache import FlowBudget, FlowCache
+from napps.kytos.of_l2ls.client import ClientLimits, get_client
+from napps.kytos.of_l2ls.dispatcher import PacketInDispatcher
+from napps.kytos.of_l2ls.flood import FloodTree
+from napps.kytos.of_l2ls.flow_templates import UNTAGGED_VLANS, FlowTemplates
+from napps.kytos.of_l2ls.mac_table import MACTable, int_to_mac, mac_to_int
+from napps.kytos.of_l2ls.metrics import Metrics
+from napps.kytos.of_l2ls.packet_out import ENCODERS, PacketOutTemplates
+from napps.kytos.of_l2ls.port_state import PortState
+from napps.kytos.of_l2ls.snapshot import MACSnapshot
+from napps.kytos.of_l2ls.storm_control import StormControl
+from napps.kytos.of_l2ls.utils import (EthernetHeader, FrameFilter,
+                                       parse_ethernet_header)
+
+HEX_DIGITS = frozenset(hexdigits)
 
 
 class Main(KytosNApp):
@@ -26,6 +44,68 @@ class Main(KytosNApp):
         The setup method is automatically called by the run method.
         Users shouldn't call this method directly.
         """
+        self.metrics = Metrics(settings.METRICS_BUCKETS,
+                               settings.METRICS_ENABLED)
+        self.flow_batcher = FlowBatcher(settings.FLOW_BATCH_SIZE,
+                                        settings.FLOW_BATCH_INTERVAL,
+                                        settings.FLOW_DEDUP_WINDOW)
+        self.flow_cache = FlowCache(settings.FLOW_CACHE_TTL,
+                                    settings.FLOW_CACHE_SIZE)
+        self.flow_templates = FlowTemplates(settings.FLOW_PRIORITY,
+                                            settings.TABLE_ID,
+                                            settings.FLOW_IDLE_TIMEOUT,
+                                            settings.FLOW_HARD_TIMEOUT)
+        self.flow_budget = FlowBudget(settings.FLOW_BUDGET,
+                                      settings.FLOW_BUDGET_HIGH,
+                                      settings.FLOW_BUDGET_LOW)
+        self.mac_tables = {}
+        self._vlan_tables = {}
+        self._vlan_tables_lock = Lock()
+        self.mac_snapshot = None
+        if settings.MAC_SNAPSHOT_PATH:
+            self.mac_snapshot = MACSnapshot(settings.MAC_SNAPSHOT_PATH,
+                                            settings.MAC_SNAPSHOT_MAX_SIZE)
+            self._restore_mac_tables()
+        self._next_snapshot = monotonic() + settings.MAC_SNAPSHOT_INTERVAL
+        self.packet_out_encoders = {}
+        self.packet_out_templates = PacketOutTemplates(
+            settings.PACKET_OUT_USE_BUFFERS)
+        self.flood_tree = FloodTree()
+        self.port_state = PortState(self._is_port_blocked)
+        self.frame_filter = FrameFilter(settings.LLDP_MACS,
+                                        settings.IGNORED_MAC_PREFIXES,
+                                        settings.IGNORED_ETH_TYPES)
+        self.storm_control = StormControl(settings.STORM_SWITCH_RATE,
+                                          settings.STORM_SWITCH_BURST,
+                                          settings.STORM_SOURCE_RATE,
+                                          settings.STORM_SOURCE_BURST,
+                                          settings.STORM_MAX_SOURCES)
+        self.flow_manager = get_client(
+            settings.FLOW_MANAGER_ENGINE, settings.FLOW_MANAGER_URL,
+            settings.FLOW_MANAGER_TIMEOUT,
+            ClientLimits(settings.FLOW_MANAGER_POOL_SIZE,
+                         settings.FLOW_MANAGER_MAX_INFLIGHT,
+                         settings.FLOW_MANAGER_MAX_PENDING))
+        self.packet_in_dispatcher = None
+        if settings.PACKET_IN_WORKERS:
+            self.packet_in_dispatcher = PacketInDispatcher(
+                self.handle_packet_in, settings.PACKET_IN_WORKERS,
+                settings.PACKET_IN_QUEUE_SIZE)
+        self.flow_executor = ThreadPoolExecutor(
+            max_workers=settings.FLOW_MANAGER_MAX_INFLIGHT,
+            thread_name_prefix='of_l2ls_flows')
+        self._flow_slots = BoundedSemaphore(
+            settings.FLOW_MANAGER_MAX_INFLIGHT)
+        self.table_miss_executor = ThreadPoolExecutor(
+            max_workers=settings.TABLE_MISS_WORKERS,
+            thread_name_prefix='of_l2ls_table_miss')
+        self._table_miss_deadline = (monotonic() +
+                                     settings.TABLE_MISS_STARTUP_WINDOW)
+        self._table_miss_lock = Lock()
+        self._pending_table_miss = {
+            switch.id for switch in list(self.controller.switches.values())
+            if switch.is_enabled() and self._get_version(switch) == 0x04}
+        self.execute_as_loop(settings.FLOW_BATCH_INTERVAL)
 
     def execute(self):
         """Run once on app 'start' or in a loop.
@@ -33,90 +113,591 @@ class Main(KytosNApp):
         The execute method is called by the run method of KytosNApp class.
         Users shouldn't call this method directly.
         """
+        for dpid, flows in self.flow_batcher.pop_expired():
+            self._submit_flows(dpid, flows)
+        for dpid, evicted in self.flow_budget.pop_evicted():
+            self._delete_flows(dpid, [self._create_match(*key)
+                                      for key, _ in evicted])
+        for mac_table in list(self.mac_tables.values()):
+            mac_table.expire()
+        if self._pending_table_miss:
+            self._reconcile_table_miss_flows()
+        if (self.mac_snapshot is not None and
+                monotonic() >= self._next_snapshot):
+            self.mac_snapshot.save(self.mac_tables)
+            self._next_snapshot = monotonic() + settings.MAC_SNAPSHOT_INTERVAL
+
+    def _get_mac_table(self, dpid, vlan=None):
+        """Return the MAC table of a VLAN of a switch, creating it if needed.
+
+        Untagged MAC addresses are learned in the table of VLAN None. A switch
+        has at most ``settings.MAC_TABLE_MAX_VLANS`` tables of VLANs. Once it
+        has that many, the empty ones are dropped to make room and None is
+        returned if there are none.
+        """
+        key = (dpid, vlan)
+        try:
+            return self.mac_tables[key]
+        except KeyError:
+            pass
+        if vlan is not None:
+            with self._vlan_tables_lock:
+                vlans = self._vlan_tables.setdefault(dpid, set())
+                if len(vlans) >= settings.MAC_TABLE_MAX_VLANS:
+                    self._drop_empty_vlan_tables(dpid, vlans)
+                    if len(vlans) >= settings.MAC_TABLE_MAX_VLANS:
+                        return None
+                vlans.add(vlan)
+        return self.mac_tables.setdefault(
+            key, MACTable(settings.MAC_TABLE_MAX_AGE,
+                          settings.MAC_TABLE_MAX_ENTRIES,
+                          track_removals=self.mac_snapshot is not None))
+
+    def _drop_empty_vlan_tables(self, dpid, vlans):
+        """Forget the empty VLAN tables of a switch. Caller holds the lock."""
+        for vlan in list(vlans):
+            mac_table = self.mac_tables.get((dpid, vlan))
+            if not mac_table:
+                self.mac_tables.pop((dpid, vlan), None)
+                vlans.discard(vlan)
+
+    def _get_switch_mac_tables(self, dpid):
+        """Return the ``(vlan, mac_table)`` of each VLAN of a switch."""
+        return [(vlan, mac_table) for (table_dpid, vlan), mac_table
+                in list(self.mac_tables.items()) if table_dpid == dpid]
+
+    def _restore_mac_tables(self):
+        """Learn the MAC addresses saved before the last shutdown."""
+        restored = 0
+        for key, entries in self.mac_snapshot.load(
+                settings.MAC_TABLE_MAX_AGE).items():
+            mac_table = self._get_mac_table(*key)
+            if mac_table is None:
+                continue
+            for mac, port, seen in entries:
+                mac_table.learn(mac, port, seen)
+            restored += len(entries)
+        log.info(f'Restored {restored} MAC addresses of '
+                 f'{len(self.mac_tables)} MAC tables.')
+        self.mac_snapshot.compact(self.mac_tables)
+
+    @staticmethod
+    def _get_version(switch):
+        """Return the OpenFlow version of a switch, or None if unknown."""
+        try:
+            return switch.connection.protocol.version
+        except AttributeError:
+            log.debug(f'The OpenFlow version was not found for switch '
+                      f'{switch.id}.')
+            return None
+
+    def _get_encoder(self, switch):
+        """Return the PacketOut encoder of a switch, or None if unsupported.
+
+        It is chosen by the OpenFlow version of the switch when it connects,
+        or else on its first PacketIn, and kept until it is disabled.
+        """
+        encoder = self.packet_out_encoders.get(switch.id)
+        if encoder is None:
+            encoder = ENCODERS.get(self._get_version(switch))
+            if encoder is not None:
+                self.packet_out_encoders[switch.id] = encoder
+        return encoder
+
+    @listen_to('kytos/of_core.handshake.completed')
+    def handle_handshake_completed(self, event):
+        """Choose the PacketOut encoder of a switch that connected."""
+        switch = event.content['switch']
+        self.packet_out_encoders.pop(switch.id, None)
+        self._get_encoder(switch)
+
+    @staticmethod
+    def _create_table_miss_flow():
+        """Create the TableMiss Flow, sending packets to the controller."""
+        flow = {}
+        flow['priority'] = 0
+        flow['table_id'] = settings.TABLE_ID
+        flow['actions'] = [{'action_type': 'output',
+                            'port': Port13.OFPP_CONTROLLER}]
+
+        return flow
+
+    @staticmethod
+    def _has_table_miss_flow(flows):
+        """Return True if ``flows``, as listed by flow_manager, have one."""
+        for flow in flows:
+            if (flow.get('priority') == 0 and not flow.get('match') and
+                    flow.get('table_id', 0) == settings.TABLE_ID and
+                    flow.get('actions') == [{'action_type': 'output',
+                                             'port': Port13.OFPP_CONTROLLER}]):
+                return True
+        return False
 
     @listen_to('kytos/topology.switch.enabled')
     def install_table_miss_flow(self, event):
         """Install the TableMiss Flow in OF1.3 switches.
 
-        This is needed because those drop packets by default.
+        This is needed because those drop packets by default. Switches enabled
+        during the startup window are only collected, to be reconciled
+        together once it is over.
         """
         dpid = event.content['dpid']
         switch = self.controller.get_switch_by_dpid(dpid)
 
-        try:
-            version = switch.connection.protocol.version
-        except AttributeError:
-            version = None
-            log.debug(f'The OpenFlow version was not found for switch {dpid}.')
+        if self._get_version(switch) != 0x04:
+            return
 
-        if version != 0x04:
+        if monotonic() < self._table_miss_deadline:
+            with self._table_miss_lock:
+                self._pending_table_miss.add(switch.id)
             return
 
-        flow = {}
-        flow['priority'] = 0
-        flow['table_id'] = settings.TABLE_ID
-        flow['actions'] = [{'action_type': 'output',
-                            'port': Port13.OFPP_CONTROLLER}]
+        self._send_flows(switch.id, [self._create_table_miss_flow()])
 
-        destination = switch.id
-        endpoint = f'{settings.FLOW_MANAGER_URL}/flows/{destination}'
-        data = {'flows': [flow]}
+    def _reconcile_table_miss_flows(self):
+        """Install the TableMiss Flows missing in the collected switches.
 
-        requests.post(endpoint, json=data)
+        Nothing is done until the startup window is over. The flows already
+        installed are then fetched from flow_manager once and the missing
+        TableMiss Flows are sent in parallel, with up to
+        ``settings.TABLE_MISS_WORKERS`` requests at the same time.
+        """
+        if monotonic() < self._table_miss_deadline:
+            return
+        with self._table_miss_lock:
+            dpids, self._pending_table_miss = self._pending_table_miss, set()
+
+        installed = self.flow_manager.get_flows()
+        if installed is None:
+            log.warning('Could not get the installed flows, installing the '
+                        'TableMiss Flow in every switch.')
+            installed = {}
+
+        missing = [dpid for dpid in dpids
+                   if not self._has_table_miss_flow(
+                       installed.get(dpid, {}).get('flows', []))]
+        log.info(f'Installing the TableMiss Flow in {len(missing)} of '
+                 f'{len(dpids)} switches.')
+        for dpid in missing:
+            self.table_miss_executor.submit(
+                self._send_flows, dpid, [self._create_table_miss_flow()])
+
+    @listen_to('kytos/of_core.flow_stats.received')
+    def handle_flow_stats(self, event):
+        """Stop counting the flows that timed out in a switch.
+
+        Switches remove idle flows without notice, so the flows in the stats
+        reported by of_core are the ones still counting against the budget.
+        """
+        switch = event.content['switch']
+        keys = {self._get_flow_key(flow.as_dict())
+                for flow in list(switch.flows)}
+        gone = self.flow_budget.reconcile(
+            switch.id, keys,
+            monotonic() - settings.FLOW_BUDGET_RECONCILE_GRACE)
+        for key, port in gone:
+            self.flow_cache.discard(switch.id, key, port)
 
     @staticmethod
-    def _create_flow(packet, port):
-        """Create a Flow message."""
-        flow = {}
+    def _get_flow_key(flow):
+        """Return the key of a flow learned by this NApp, or None."""
+        match = flow.get('match', {})
+        if (flow.get('priority') != settings.FLOW_PRIORITY or
+                flow.get('table_id', 0) != settings.TABLE_ID or
+                'dl_dst' not in match):
+            return None
+        source = match.get('dl_src')
+        return (source and mac_to_int(source), mac_to_int(match['dl_dst']),
+                match.get('dl_type'), match.get('dl_vlan'))
+
+    @listen_to('kytos/topology.switch.disabled')
+    def handle_switch_disabled(self, event):
+        """Forget the MAC tables and the flows of a disabled switch."""
+        dpid = event.content['dpid']
+        with self._vlan_tables_lock:
+            for vlan, _ in self._get_switch_mac_tables(dpid):
+                self.mac_tables.pop((dpid, vlan), None)
+            self._vlan_tables.pop(dpid, None)
+        self.flow_cache.invalidate_switch(dpid)
+        self.flow_budget.remove_switch(dpid)
+        self.port_state.remove_switch(dpid)
+        self.packet_out_encoders.pop(dpid, None)
+
+    @listen_to('kytos/of_core.switch.interface.down',
+               'kytos/of_core.switch.interface.link_down',
+               'kytos/of_core.switch.interface.deleted')
+    def handle_interface_down(self, event):
+        """Purge the MAC addresses and flows of an interface that went down."""
+        interface = event.content['interface']
+        self.port_state.update(interface.switch.id, interface.port_number,
+                               True)
+        self._purge_interface(interface)
+
+    @listen_to('kytos/topology.link_down')
+    def handle_link_down(self, event):
+        """Purge the MAC addresses and flows of both ends of a link."""
+        link = event.content['link']
+        self._purge_interface(link.endpoint_a)
+        self._purge_interface(link.endpoint_b)
+
+    @listen_to('kytos/of_core.switch.interface.(created|modified|up|link_up)')
+    def handle_interface_up(self, event):
+        """Flood to an interface that was created, modified or went up."""
+        interface = event.content['interface']
+        self.port_state.update(interface.switch.id, interface.port_number,
+                               self._is_port_blocked(interface))
+        self.flood_tree.invalidate(interface.switch.id)
+
+    @listen_to('kytos/topology.topology_loaded', 'kytos/topology.updated')
+    def update_flood_tree(self, event):
+        """Compute the spanning tree used to flood from the active links."""
+        links = [(link.endpoint_a.switch.id, link.endpoint_a.port_number,
+                  link.endpoint_b.switch.id, link.endpoint_b.port_number)
+                 for link in list(event.content['topology'].links.values())
+                 if link.is_active()]
+        self.flood_tree.update(links)
+
+    def _purge_interface(self, interface):
+        """Forget the MAC addresses learned on an interface.
+
+        The flows that output to the interface are deleted from the switch, so
+        that they are installed again once the hosts are learned elsewhere.
+        """
+        dpid = interface.switch.id
+        port = interface.port_number
+        for _, mac_table in self._get_switch_mac_tables(dpid):
+            mac_table.remove_port(port)
+        self.flood_tree.invalidate(dpid)
+
+        keys = self.flow_cache.invalidate_port(dpid, port)
+        if not keys:
+            return
+        for key in keys:
+            self.flow_budget.discard(dpid, key[1])
+        self._delete_flows(dpid, [self._create_match(*key[1])
+                                  for key in keys])
+
+    def _move_flows(self, dpid, header, old_port, new_port):
+        """Replace the flows to the source of a frame that moved to a port.
+
+        The replacement flows have the same match and priority, so
+        flow_manager overwrites the stale ones in the switch.
+
+        Returns:
+            list: Flows of batches that got full and must be sent now.
+
+        """
+        full = []
+        for _, key, _ in self.flow_cache.invalidate_destination(
+                dpid, old_port, header.source,
+                self._get_flow_vlan(dpid, header.vlan)):
+            flow_header = EthernetHeader(destination=key[1], source=key[0],
+                                         ether_type=key[2], vlan=header.vlan)
+            full.extend(self._queue_flow(dpid, flow_header, new_port))
+        return full
+
+    def _submit_flows(self, dpid, flows):
+        """Hand a batch of flows to the flow executor to be sent.
+
+        At most ``settings.FLOW_MANAGER_MAX_INFLIGHT`` batches are handed
+        over at the same time. Further batches are handled like the ones
+        flow_manager refuses, instead of waiting in the executor queue.
+        """
+        if not self._flow_slots.acquire(blocking=False):
+            self._handle_unsent_flows(dpid, flows)
+            return
+        try:
+            self.flow_executor.submit(self._send_flows_in_slot, dpid, flows)
+        except RuntimeError:
+            self._flow_slots.release()
+            raise
+
+    def _send_flows_in_slot(self, dpid, flows):
+        """Send a batch of flows and free the slot it was submitted with."""
+        try:
+            self._send_flows(dpid, flows)
+        finally:
+            self._flow_slots.release()
+
+    def _send_flows(self, dpid, flows):
+        """Send a batch of flows to be installed by flow_manager.
+
+        If flow_manager is overloaded or fails to install them, the flows are
+        either dropped or queued again, according to
+        ``settings.FLOW_MANAGER_OVERLOAD``.
+        """
+        start = monotonic()
+        posted = self.flow_manager.post_flows(
+            dpid, flows, partial(self._flows_posted, dpid, flows))
+        self.metrics.observe('flow_manager', monotonic() - start)
+        if not posted:
+            self._handle_unsent_flows(dpid, flows)
+
+    def _flows_posted(self, dpid, flows, succeeded):
+        """Count the flows flow_manager installed or failed to install."""
+        if succeeded:
+            self.metrics.count(dpid, 'flows_sent', len(flows))
+            return
+        self.metrics.count(dpid, 'flows_failed', len(flows))
+        self._handle_unsent_flows(dpid, flows)
+
+    def _handle_unsent_flows(self, dpid, flows):
+        """Queue again or drop flows, per ``FLOW_MANAGER_OVERLOAD``.
+
+        Dropped flows are forgotten by the flow cache and the flow budget, so
+        that they are installed again when needed.
+        """
+        if settings.FLOW_MANAGER_OVERLOAD == 'defer':
+            self.flow_batcher.requeue(dpid, flows)
+            return
+        log.warning(f'Dropped {len(flows)} flows to switch {dpid}.')
+        for flow in flows:
+            if isinstance(flow, str):
+                flow = json.loads(flow)
+            key = self._get_flow_key(flow)
+            if key is not None:
+                self.flow_cache.discard(dpid, key,
+                                        flow['actions'][0]['port'])
+                self.flow_budget.discard(dpid, key)
+
+    def _delete_flows(self, dpid, matches):
+        """Delete flows from a switch through flow_manager."""
+        flows = [{'table_id': settings.TABLE_ID, 'match': match}
+                 for match in matches]
+        if not self.flow_manager.delete_flows(dpid, flows):
+            log.warning(f'Could not delete {len(flows)} flows from switch '
+                        f'{dpid}.')
+
+    @staticmethod
+    def _create_match(dl_src, dl_dst, dl_type, dl_vlan=None):
+        """Create the match of a flow installed by this NApp.
+
+        Fields that are None, as in flows matching the destination only or
+        untagged frames, are left out.
+        """
         match = {}
-        flow['priority'] = settings.FLOW_PRIORITY
-        flow['table_id'] = settings.TABLE_ID
+        if dl_src is not None:
+            match['dl_src'] = int_to_mac(dl_src)
+        match['dl_dst'] = int_to_mac(dl_dst)
+        if dl_type is not None:
+            match['dl_type'] = dl_type
+        if dl_vlan is not None:
+            match['dl_vlan'] = dl_vlan
+        return match
+
+    def _create_flow(self, header, port):
+        """Return the JSON of a flow sending ``header`` frames to ``port``."""
+        return self.flow_templates.encode(header, port,
+                                          settings.FLOW_MATCH_DST_ONLY)
+
+    def _get_flow_vlan(self, dpid, vlan):
+        """Return the dl_vlan matched by the flows of the frames of ``vlan``.
+
+        Flows of untagged frames match no VLAN, or leave dl_vlan out if the
+        OpenFlow version of the switch cannot express it.
+        """
+        if vlan is not None:
+            return vlan
+        encoder = self.packet_out_encoders.get(dpid)
+        return encoder and UNTAGGED_VLANS.get(encoder.version)
 
-        match['dl_src'] = packet.source.value
-        match['dl_dst'] = packet.destination.value
-        match['dl_type'] = packet.ether_type.value
+    def _queue_flows(self, dpid, header, in_port, out_port):
+        """Queue the flow to the destination of a frame.
 
-        flow['match'] = match
+        The flow back to the source is also queued if
+        ``settings.FLOW_REVERSE_PATH`` is set. Flows installed recently are
+        skipped. Queued flows count against the flow budget of the switch and
+        the least recently seen flows evicted from it are installed again when
+        needed.
 
-        flow['actions'] = [{'action_type': 'output',
-                            'port': port}]
+        Returns:
+            list: Flows of batches that got full and must be sent now.
+
+        """
+        flows = [(header, out_port)]
+        if settings.FLOW_REVERSE_PATH:
+            flows.append((header._replace(source=header.destination,
+                                          destination=header.source),
+                          in_port))
+
+        full = []
+        for flow_header, port in flows:
+            full.extend(self._queue_flow(dpid, flow_header, port))
+        return full
+
+    def _queue_flow(self, dpid, header, port):
+        """Queue a flow sending the frames like ``header`` to ``port``.
+
+        Returns:
+            list: Flows of the batch, if it got full and must be sent now.
+
+        """
+        header = header._replace(vlan=self._get_flow_vlan(dpid, header.vlan))
+        if settings.FLOW_MATCH_DST_ONLY:
+            key = (None, header.destination, None, header.vlan)
+        else:
+            key = (header.source, header.destination, header.ether_type,
+                   header.vlan)
+        if not self.flow_cache.add(dpid, key, port):
+            self.flow_budget.touch(dpid, key)
+            return []
+        flow = self._create_flow(header, port)
+        full = self.flow_batcher.add(dpid, flow) or []
+        evicted = self.flow_budget.add(dpid, key, (key, port))
+        for evicted_key, evicted_port in evicted:
+            self.flow_cache.discard(dpid, evicted_key, evicted_port)
+        return full
+
+    @staticmethod
+    def _create_drop_flow(source):
+        """Create a Flow dropping the frames sent by ``source``."""
+        flow = {}
+        flow['priority'] = settings.STORM_DROP_FLOW_PRIORITY
+        flow['table_id'] = settings.TABLE_ID
+        flow['hard_timeout'] = settings.STORM_DROP_FLOW_TIMEOUT
+        flow['match'] = {'dl_src': source}
+        flow['actions'] = []
 
         return flow
 
+    def _block_source(self, dpid, source):
+        """Install a temporary flow dropping the frames from a source MAC."""
+        if not self.storm_control.block(dpid, source,
+                                        settings.STORM_DROP_FLOW_TIMEOUT):
+            return
+
+        mac = int_to_mac(source)
+        log.warning(f'Dropping frames from {mac} in switch {dpid} for '
+                    f'{settings.STORM_DROP_FLOW_TIMEOUT} seconds.')
+        batch = self.flow_batcher.add(dpid, self._create_drop_flow(mac))
+        if batch:
+            self._submit_flows(dpid, batch)
+
     @staticmethod
-    def _create_packet_out(version, packet, ports, switch):
-        """Create a PacketOut message with the appropriate version and data."""
-        if version == '0x01':
-            port = ports[0] if ports else Port10.OFPP_FLOOD
+    def _is_port_blocked(iface):
+        """Return True if frames must not be sent to an interface.
+
+        That is the case if it is down or configured as NO_FWD, whose bit is
+        the same in OpenFlow 1.0 and 1.3.
+        """
+        no_fwd = PortConfig13.OFPPC_NO_FWD
+        return not iface.is_active() or iface.config & no_fwd == no_fwd
 
-            iface = switch.get_interface_by_port_no(port)
+    def _get_out_port(self, encoder, ports, switch):
+        """Return the port to send a packet to, or None if it is blocked."""
+        return encoder.out_port(ports, self.port_state.blocked(switch))
 
-            if iface and (iface.config & PortConfig10.OFPPC_NO_FWD ==
-                          PortConfig10.OFPPC_NO_FWD):
-                return None
+    def _get_flood_ports(self, encoder, switch):
+        """Return the physical ports of a switch that are not blocked."""
+        return encoder.flood_ports(list(switch.interfaces),
+                                   self.port_state.blocked(switch))
 
-            packet_out = PacketOut10()
-            packet_out.actions.append(Output10(port=port))
+    def _get_flood_out_port(self, encoder, switch, in_port, vlan):
+        """Return where to flood a frame to an unknown destination.
 
-        else:
-            port = ports[0] if ports else Port13.OFPP_FLOOD
+        Tagged frames go to the members of their VLAN if
+        ``settings.VLAN_FLOOD_MEMBERS_ONLY`` is set, and frames are flooded
+        along the spanning tree if ``settings.FLOOD_MODE`` is 'tree'.
 
-            iface = switch.get_interface_by_port_no(port)
+        Returns:
+            The output port or ports, or None if the frame must not be
+            flooded at all.
 
-            if iface and (iface.config & PortConfig13.OFPPC_NO_FWD ==
-                          PortConfig13.OFPPC_NO_FWD):
-                return None
+        """
+        if vlan is not None and settings.VLAN_FLOOD_MEMBERS_ONLY:
+            vlan_ports = self._get_vlan_flood_ports(encoder, switch, in_port,
+                                                    vlan)
+            if vlan_ports is not None:
+                return vlan_ports or None
+        if settings.FLOOD_MODE != 'tree':
+            return self._get_out_port(encoder, [], switch)
+        return self.flood_tree.ports(
+            switch.id, in_port,
+            lambda: self._get_flood_ports(encoder, switch)) or None
+
+    def _get_vlan_flood_ports(self, encoder, switch, in_port, vlan):
+        """Return the member ports of a VLAN to flood a frame to.
+
+        Members are the ports where hosts of the VLAN were learned, the ports
+        of links to other switches and the ports in ``settings.VLAN_PORTS``.
+
+        Returns:
+            tuple: The flood ports, empty if they are all blocked, or None if
+            the VLAN has no members in the switch besides ``in_port``.
 
-            packet_out = PacketOut13()
-            packet_out.actions.append(Output13(port=port))
+        """
+        mac_table = self.mac_tables.get((switch.id, vlan))
+        members = set(mac_table.ports() if mac_table is not None else ())
+        members.update(self.flood_tree.link_ports(switch.id))
+        members.update(settings.VLAN_PORTS.get(switch.id, {}).get(vlan, ()))
+        members.discard(in_port)
+        if not members:
+            return None
+        if settings.FLOOD_MODE == 'tree':
+            members.intersection_update(self.flood_tree.ports(
+                switch.id, in_port,
+                lambda: self._get_flood_ports(encoder, switch)))
+        else:
+            members = encoder.flood_ports(members,
+                                          self.port_state.blocked(switch))
+        return tuple(sorted(members))
 
-        packet_out.buffer_id = packet.buffer_id
-        packet_out.in_port = packet.in_port
-        packet_out.data = packet.data
+    def _send_packet_out(self, connection, packet_out):
+        """Send a PacketOut message to a switch."""
+        event_out = KytosEvent(name=('kytos/of_l2ls.messages.out.'
+                                     'ofpt_packet_out'),
+                               content={'destination': connection,
+                                        'message': packet_out})
 
-        return packet_out
+        self.controller.buffers.msg_out.put(event_out)
 
     @listen_to('kytos/of_core.v0x0[14].messages.in.ofpt_packet_in')
+    def dispatch_packet_in(self, event):
+        """Queue a PacketIn Event to the worker of its switch.
+
+        PacketIns are handled right away if ``settings.PACKET_IN_WORKERS`` is
+        0.
+        """
+        if self.packet_in_dispatcher is None:
+            self.handle_packet_in(event)
+            return
+        dpid = event.source.switch.id
+        if not self.packet_in_dispatcher.dispatch(dpid, event):
+            self.metrics.count(dpid, 'queue_full')
+
+    def _learn(self, dpid, header, in_port):
+        """Learn the port of the source of a frame and look its destination up.
+
+        Nothing is learned for frames of VLANs above the limit of the switch.
+
+        Returns:
+            tuple: The previous port of the source, if it moved, and the port
+            of the destination, if known.
+
+        """
+        mac_table = self._get_mac_table(dpid, header.vlan)
+        if mac_table is None:
+            self.metrics.count(dpid, 'vlan_limit')
+            return None, None
+        return (mac_table.learn(header.source, in_port),
+                mac_table.lookup(header.destination))
+
+    @staticmethod
+    def _parse_header(data, encoder):
+        """Return the Ethernet header of a frame, or None if not supported.
+
+        The flows of switches that cannot match untagged frames only would
+        also forward the frames of every VLAN, so VLANs are not learned there
+        and their tagged frames are handled as untagged ones.
+        """
+        if encoder is None:
+            return None
+        header = parse_ethernet_header(data)
+        if (header is not None and header.vlan is not None and
+                encoder.version not in UNTAGGED_VLANS):
+            return header._replace(vlan=None)
+        return header
+
     def handle_packet_in(self, event):
         """Handle PacketIn Event.
 
@@ -127,46 +708,261 @@ class Main(KytosNApp):
         """
         log.debug("PacketIn Received")
 
+        start = monotonic()
         packet_in = event.content['message']
+        data = packet_in.data.value
+        switch = event.source.switch
+        self.metrics.count(switch.id, 'packet_in')
 
-        ethernet = Ethernet()
-        ethernet.unpack(packet_in.data.value)
-
-        # Ignore LLDP packets or packets not generated by table-miss flows
-        if (ethernet.destination in settings.LLDP_MACS or
+        # Ignore LLDP and control frames or packets not generated by
+        # table-miss flows
+        if (self.frame_filter.ignores(data) or
                 packet_in.reason != PacketInReason.OFPR_NO_MATCH):
+            self.metrics.count(switch.id, 'ignored')
             return
 
-        switch = event.source.switch
-        version = switch.ofp_version
+        encoder = self._get_encoder(switch)
+        header = self._parse_header(data, encoder)
+        if header is None:
+            self.metrics.count(switch.id, 'ignored')
+            return
+
+        parsed = monotonic()
+        self.metrics.observe('parse', parsed - start)
+
+        # Drop PacketIns above the rate limits of the source or the switch
+        if not self.storm_control.allow_source(switch.id, header.source):
+            self.metrics.count(switch.id, 'storm_dropped')
+            if settings.STORM_DROP_FLOW:
+                self._block_source(switch.id, header.source)
+            return
+        if not self.storm_control.allow_switch(switch.id):
+            self.metrics.count(switch.id, 'storm_dropped')
+            return
 
         # Learn the port where the sender is connected
         in_port = getattr(packet_in.in_port, 'value', packet_in.in_port)
 
-        switch.update_mac_table(ethernet.source, in_port)
+        old_port, port = self._learn(switch.id, header, in_port)
+        ports = [port] if port is not None else []
+        learned = monotonic()
+        self.metrics.observe('learn', learned - parsed)
 
-        ports = switch.where_is_mac(ethernet.destination)
+        # Point the flows to a sender that moved to its new port
+        batch = []
+        if old_port is not None:
+            self.metrics.count(switch.id, 'host_moved')
+            batch = self._move_flows(switch.id, header, old_port, in_port)
 
-        # Add a flow to the switch if the destination is known
+        # Queue flows to the switch if the destination is known
         if ports:
-            flow = self._create_flow(ethernet, ports[0])
-            destination = switch.id
-            endpoint = f'{settings.FLOW_MANAGER_URL}/flows/{destination}'
-            data = {'flows': [flow]}
-            requests.post(endpoint, json=data)
+            batch.extend(self._queue_flows(switch.id, header, in_port,
+                                           ports[0]))
+        queued = monotonic()
+        self.metrics.observe('flows', queued - learned)
 
         # Send the packet to correct destination or flood it
-        packet_out = self._create_packet_out(version, packet_in, ports, switch)
+        out_port = (self._get_out_port(encoder, ports, switch) if ports else
+                    self._get_flood_out_port(encoder, switch, in_port,
+                                             header.vlan))
+
+        if out_port is not None:
+            packet_out = self.packet_out_templates.create(encoder, out_port,
+                                                          packet_in)
+            self._send_packet_out(event.source, packet_out)
+            self.metrics.count(switch.id, 'unicast' if ports else 'flood')
+        else:
+            self.metrics.count(switch.id, 'no_fwd')
+        sent = monotonic()
+        self.metrics.observe('packet_out', sent - queued)
 
-        if packet_out is None:
-            return
+        # A full batch is sent by another thread, after the PacketOut is on
+        # its way, so that PacketIns never wait for flow_manager
+        if batch:
+            self._submit_flows(switch.id, batch)
+        self.metrics.observe('packet_in', monotonic() - start)
 
-        event_out = KytosEvent(name=('kytos/of_l2ls.messages.out.'
-                                     'ofpt_packet_out'),
-                               content={'destination': event.source,
-                                        'message': packet_out})
+    @rest('v1/metrics')
+    def get_metrics(self):
+        """Return the PacketIn counters per switch and stage latencies."""
+        return jsonify(self.metrics.as_dict())
 
-        self.controller.buffers.msg_out.put(event_out)
+    @staticmethod
+    def _get_int_arg(name, default=None):
+        """Return a non-negative integer query argument."""
+        value = request.args.get(name)
+        if value is None:
+            return default
+        try:
+            value = int(value)
+        except ValueError:
+            raise BadRequest(f'{name} must be an integer.') from None
+        if value < 0:
+            raise BadRequest(f'{name} must not be negative.')
+        return value
+
+    @staticmethod
+    def _parse_mac(mac, min_octets, max_octets):
+        """Convert a MAC address or prefix from a request to an integer."""
+        octets = mac.split(':') if isinstance(mac, str) else []
+        if (not min_octets <= len(octets) <= max_octets or
+                any(len(octet) != 2 or not set(octet) <= HEX_DIGITS
+                    for octet in octets)):
+            raise BadRequest(f'Invalid MAC address {mac}.')
+        return mac_to_int(mac)
+
+    @staticmethod
+    def _get_mac_entries():
+        """Return the entries of a bulk request to the MAC tables.
+
+        Returns:
+            list: ``(dpid, vlan, mac, port)`` tuples, with ``mac`` as an
+            integer and None for the fields that are not given.
+
+        """
+        content = request.get_json(silent=True)
+        if not isinstance(content, dict) or not isinstance(
+                content.get('entries'), list):
+            raise BadRequest('The body must have a list of entries.')
+
+        entries = []
+        for entry in content['entries']:
+            if not isinstance(entry, dict) or 'dpid' not in entry:
+                raise BadRequest(f'Invalid entry {entry}: dpid is missing.')
+            if not isinstance(entry['dpid'], str):
+                raise BadRequest(f'Invalid dpid {entry["dpid"]}.')
+            vlan, mac, port = (entry.get('vlan'), entry.get('mac'),
+                               entry.get('port'))
+            if vlan is not None and (not isinstance(vlan, int) or
+                                     isinstance(vlan, bool) or
+                                     not 1 <= vlan <= 4095):
+                raise BadRequest(f'Invalid VLAN {vlan}.')
+            if mac is not None:
+                mac = Main._parse_mac(mac, 6, 6)
+            if port is not None and (not isinstance(port, int) or
+                                     isinstance(port, bool)):
+                raise BadRequest(f'Invalid port {port}.')
+            entries.append((entry['dpid'], vlan, mac, port))
+        return entries
+
+    def _iter_mac_entries(self, dpid=None, port=None, mac_prefix=None,
+                          vlan=None):
+        """Yield the learned MAC addresses that match the filters.
+
+        Entries are sorted by switch and VLAN, untagged ones first.
+        """
+        shift = prefix = None
+        if mac_prefix is not None:
+            shift = 48 - 8 * len(mac_prefix.split(':'))
+            prefix = mac_to_int(mac_prefix)
+
+        tables = sorted(
+            ((key, mac_table) for key, mac_table
+             in list(self.mac_tables.items())
+             if (dpid is None or key[0] == dpid) and
+             (vlan is None or key[1] == vlan)),
+            key=lambda item: (item[0][0], -1 if item[0][1] is None
+                              else item[0][1]))
+
+        for (table_dpid, table_vlan), mac_table in tables:
+            for mac, mac_port, age in mac_table.entries():
+                if port is not None and mac_port != port:
+                    continue
+                if mac_prefix is not None and mac >> shift != prefix:
+                    continue
+                yield {'dpid': table_dpid, 'vlan': table_vlan,
+                       'mac': int_to_mac(mac), 'port': mac_port,
+                       'age': round(age, 3)}
+
+    @staticmethod
+    def _stream_json_list(items):
+        """Yield the chunks of a JSON list, one for each item."""
+        separator = '['
+        for item in items:
+            yield separator + json.dumps(item)
+            separator = ','
+        yield '[]' if separator == '[' else ']'
+
+    @rest('v1/mac_tables', methods=['GET'])
+    def list_mac_entries(self):
+        """Stream the learned MAC addresses.
+
+        The entries can be filtered by the ``dpid``, ``vlan``, ``port`` and
+        ``mac_prefix`` query arguments and paginated by ``offset`` and
+        ``limit``.
+        """
+        vlan = self._get_int_arg('vlan')
+        port = self._get_int_arg('port')
+        offset = self._get_int_arg('offset', 0)
+        limit = self._get_int_arg('limit')
+        mac_prefix = request.args.get('mac_prefix')
+        if mac_prefix is not None:
+            self._parse_mac(mac_prefix, 1, 6)
+
+        entries = self._iter_mac_entries(request.args.get('dpid'), port,
+                                         mac_prefix, vlan)
+        stop = None if limit is None else offset + limit
+        return Response(self._stream_json_list(islice(entries, offset, stop)),
+                        mimetype='application/json')
+
+    @rest('v1/mac_tables', methods=['POST'])
+    def preload_mac_entries(self):
+        """Learn MAC addresses in bulk, as if frames from them were seen.
+
+        Each entry needs the ``dpid``, ``mac`` and ``port``, and the ``vlan``
+        for tagged hosts. Preloaded entries age like learned ones.
+        """
+        entries = self._get_mac_entries()
+        for dpid, _, mac, port in entries:
+            if mac is None or port is None:
+                raise BadRequest(f'Entry of switch {dpid} needs the mac and '
+                                 f'the port.')
+
+        learned = 0
+        for dpid, vlan, mac, port in entries:
+            mac_table = self._get_mac_table(dpid, vlan)
+            if mac_table is not None:
+                mac_table.learn(mac, port)
+                learned += 1
+        return jsonify({'learned': learned}), 201
+
+    @rest('v1/mac_tables', methods=['DELETE'])
+    def delete_mac_entries(self):
+        """Forget MAC addresses in bulk.
+
+        Each entry needs the ``dpid`` and forgets the given ``mac``, the MAC
+        addresses learned on the given ``port`` or, with neither, every MAC
+        address of the switch. With a ``vlan``, only the MAC addresses of that
+        VLAN are forgotten. The flows already installed are kept.
+        """
+        deleted = 0
+        for dpid, vlan, mac, port in self._get_mac_entries():
+            if vlan is None:
+                mac_tables = self._get_switch_mac_tables(dpid)
+            else:
+                mac_tables = [(vlan, self.mac_tables.get((dpid, vlan)))]
+            for _, mac_table in mac_tables:
+                if mac_table is None:
+                    continue
+                if mac is not None:
+                    if mac_table.lookup(mac) is not None:
+                        deleted += 1
+                    mac_table.remove(mac)
+                elif port is not None:
+                    deleted += len(mac_table.remove_port(port))
+                else:
+                    deleted += len(mac_table)
+                    mac_table.clear()
+        return jsonify({'deleted': deleted})
 
     def shutdown(self):
-        """Too simple to have a shutdown procedure."""
+        """Send the flows that are still waiting in the batches."""
+        if self.packet_in_dispatcher is not None:
+            self.packet_in_dispatcher.stop()
+        self.flow_executor.shutdown()
+        self.table_miss_executor.shutdown()
+        if self.mac_snapshot is not None:
+            self.mac_snapshot.compact(self.mac_tables)
+        for dpid, flows in self.flow_batcher.pop_all():
+            self.flow_manager.post_flows(dpid, flows)
+        self.flow_manager.close()
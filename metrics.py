@@ -0,0 +1,72 @@
+"""Counters and latency histograms of the PacketIn handling."""
+from bisect import bisect_left
+from collections import Counter
+
+
+class Histogram:
+    """Count observed values in fixed buckets.
+
+    ``buckets`` are the sorted upper bounds of the buckets. Values above the
+    last bound are counted in an extra overflow bucket.
+    """
+
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Count a value in its bucket."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def as_dict(self):
+        """Return the histogram as a JSON serializable dict."""
+        bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+        return {'buckets': dict(zip(bounds, self.counts)),
+                'count': self.count, 'sum': self.total}
+
+
+class Metrics:
+    """Counters per switch and latency histograms per handling stage.
+
+    Updates take no lock, so concurrent updates may rarely be lost, which is
+    an acceptable trade-off for keeping them off the hot path. When not
+    ``enabled``, updates do nothing.
+    """
+
+    def __init__(self, buckets, enabled=True):
+        self.buckets = buckets
+        self.enabled = enabled
+        self._counters = {}
+        self._histograms = {}
+
+    def count(self, dpid, name, value=1):
+        """Add ``value`` to the counter ``name`` of a switch."""
+        if not self.enabled:
+            return
+        counters = self._counters.get(dpid)
+        if counters is None:
+            counters = self._counters.setdefault(dpid, Counter())
+        counters[name] += value
+
+    def observe(self, stage, seconds):
+        """Record the time spent in a stage."""
+        if not self.enabled:
+            return
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            histogram = self._histograms.setdefault(stage,
+                                                    Histogram(self.buckets))
+        histogram.observe(seconds)
+
+    def as_dict(self):
+        """Return the metrics as a JSON serializable dict."""
+        return {'counters': {dpid: dict(counters) for dpid, counters
+                             in list(self._counters.items())},
+                'latency': {stage: histogram.as_dict() for stage, histogram
+                            in list(self._histograms.items())}}
@@ -0,0 +1,97 @@
+"""Construction of the PacketOuts sent by this NApp."""
+from itertools import count
+from random import randint
+
+from pyof.foundation.constants import UBINT32_MAX_VALUE as MAXID
+from pyof.v0x01.common.action import ActionOutput as Output10
+from pyof.v0x01.common.phy_port import Port as Port10
+from pyof.v0x01.controller2switch.packet_out import PacketOut as PacketOut10
+from pyof.v0x04.common.action import ActionOutput as Output13
+from pyof.v0x04.common.port import PortNo as Port13
+from pyof.v0x04.controller2switch.packet_out import PacketOut as PacketOut13
+
+# OFP_NO_BUFFER has the same value in OpenFlow 1.0 and 1.3
+NO_BUFFER = 0xffffffff
+
+
+class PacketOutEncoder:
+    """PacketOut construction for an OpenFlow version.
+
+    The port constants of the version are read once, so building and
+    addressing PacketOuts does not depend on the version anymore. Another
+    OpenFlow version is supported by adding its encoder to ``ENCODERS``.
+    """
+
+    def __init__(self, version, packet_out_class, output_class, port_class):
+        self.version = version
+        self.flood = int(port_class.OFPP_FLOOD)
+        self.max_port = int(port_class.OFPP_MAX)
+        self._packet_out_class = packet_out_class
+        self._output_class = output_class
+
+    def build(self, port):
+        """Create a PacketOut with output actions.
+
+        ``port`` is a port number or a tuple of them, to output to each.
+        """
+        ports = port if isinstance(port, tuple) else (port,)
+        packet_out = self._packet_out_class()
+        for out_port in ports:
+            packet_out.actions.append(self._output_class(port=out_port))
+        return packet_out
+
+    def out_port(self, ports, blocked):
+        """Return the port to send a packet to, or None if it is blocked.
+
+        That is the first of ``ports`` or, if there are none, flood.
+        """
+        port = ports[0] if ports else self.flood
+        if port in blocked:
+            return None
+        return port
+
+    def flood_ports(self, ports, blocked):
+        """Return the physical ports out of ``ports`` that are not blocked."""
+        return [port for port in ports
+                if port <= self.max_port and port not in blocked]
+
+
+ENCODERS = {
+    0x01: PacketOutEncoder(0x01, PacketOut10, Output10, Port10),
+    0x04: PacketOutEncoder(0x04, PacketOut13, Output13, Port13),
+}
+
+
+class PacketOutTemplates:
+    """Prebuilt PacketOut actions, one list for each (encoder, out_port).
+
+    ``encoder.build(port)`` is called the first time a pair is used and the
+    action list of the resulting message is shared by the PacketOuts of every
+    packet sent to that port. Each packet still gets its own PacketOut, as
+    other NApps listening to the outgoing messages expect, but only its
+    fields are set.
+
+    With ``use_buffers``, packets buffered by the switch are sent back by
+    buffer_id only, without echoing the frame.
+    """
+
+    def __init__(self, use_buffers=False):
+        self.use_buffers = use_buffers
+        self._templates = {}
+        self._xids = count(randint(0, MAXID))
+
+    def create(self, encoder, port, packet):
+        """Return a PacketOut sending ``packet`` to ``port``."""
+        key = (encoder.version, port)
+        template = self._templates.get(key)
+        if template is None:
+            template = self._templates.setdefault(key, encoder.build(port))
+
+        buffer_id = getattr(packet.buffer_id, 'value', packet.buffer_id)
+        data = packet.data
+        if self.use_buffers and buffer_id != NO_BUFFER:
+            data = b''
+
+        return type(template)(xid=next(self._xids) % (MAXID + 1),
+                              buffer_id=buffer_id, in_port=packet.in_port,
+                              actions=template.actions, data=data)
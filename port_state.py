@@ -0,0 +1,45 @@
+"""Ports of each switch that frames must not be sent to."""
+from threading import Lock
+
+
+class PortState:
+    """Keep the set of blocked ports, NO_FWD or down, of each switch.
+
+    The set of a switch is built from its interfaces, with
+    ``is_blocked(interface)``, the first time it is needed and is then kept up
+    to date by :meth:`update`, so checking a port is a set membership test.
+    """
+
+    def __init__(self, is_blocked):
+        self._is_blocked = is_blocked
+        self._blocked = {}
+        self._lock = Lock()
+
+    def blocked(self, switch):
+        """Return the frozenset of blocked ports of a switch."""
+        ports = self._blocked.get(switch.id)
+        if ports is None:
+            with self._lock:
+                ports = self._blocked.get(switch.id)
+                if ports is None:
+                    ports = frozenset(
+                        port for port, iface in list(switch.interfaces.items())
+                        if self._is_blocked(iface))
+                    self._blocked[switch.id] = ports
+        return ports
+
+    def update(self, dpid, port, blocked):
+        """Mark a port of a switch as blocked or not."""
+        with self._lock:
+            ports = self._blocked.get(dpid)
+            if ports is None or (port in ports) == blocked:
+                return
+            if blocked:
+                self._blocked[dpid] = ports | {port}
+            else:
+                self._blocked[dpid] = ports - {port}
+
+    def remove_switch(self, dpid):
+        """Forget the blocked ports of a switch."""
+        with self._lock:
+            self._blocked.pop(dpid, None)
@@ -3,9 +3,145 @@
 LLDP_MACS = ['01:80:c2:00:00:0e', '01:80:c2:00:00:03',
              '01:80:c2:00:00:00']
 
+# Frames to these destination MAC prefixes are ignored. The default covers
+# the reserved 01:80:c2:00:00:xx range (STP, LACP, LLDP, GARP). Add '33:33' to
+# also ignore IPv6 multicast.
+IGNORED_MAC_PREFIXES = ['01:80:c2:00:00']
+# Frames with these EtherTypes are ignored (0x88cc is LLDP)
+IGNORED_ETH_TYPES = [0x88cc]
+
 # Flow priority for flows installed by this NApp
 
 # flow_priority = 10
 FLOW_PRIORITY = 10
 TABLE_ID = 0
+# Seconds after which the switch removes an idle flow, or any flow for the
+# hard timeout. 0 means the flow never times out.
+FLOW_IDLE_TIMEOUT = 300
+FLOW_HARD_TIMEOUT = 0
+# At most FLOW_BUDGET flows are kept installed in each switch. Once there are
+# more than FLOW_BUDGET_HIGH times the budget, the least recently seen flows
+# are deleted until FLOW_BUDGET_LOW times the budget remain. A budget of 0
+# disables it. Flows that timed out in the switch stop counting once of_core
+# reports the flow stats of the switch without them, unless they were queued
+# less than FLOW_BUDGET_RECONCILE_GRACE seconds before, as they may not be
+# installed yet.
+FLOW_BUDGET = 10000
+FLOW_BUDGET_HIGH = 0.9
+FLOW_BUDGET_LOW = 0.8
+FLOW_BUDGET_RECONCILE_GRACE = 30
+# If True, the flow from the destination back to the source is installed
+# together with the flow to the destination.
+FLOW_REVERSE_PATH = False
+# If True, flows match on dl_dst only, so each learned host needs one flow
+# per switch instead of one flow per pair of hosts.
+FLOW_MATCH_DST_ONLY = False
+
 FLOW_MANAGER_URL = 'http://localhost:8181/api/kytos/flow_manager/v2'
+# HTTP client used to talk to flow_manager: 'requests' sends each request
+# from the thread that needs it, 'aiohttp' sends them all from one asyncio
+# event loop without blocking the caller. 'aiohttp' needs the aiohttp package.
+FLOW_MANAGER_ENGINE = 'requests'
+# Seconds to wait for flow_manager: a (connect, read) tuple or a single value
+FLOW_MANAGER_TIMEOUT = (3, 10)
+# Keep-alive connections kept open to flow_manager
+FLOW_MANAGER_POOL_SIZE = 10
+# Maximum number of requests to flow_manager in flight at the same time
+FLOW_MANAGER_MAX_INFLIGHT = 8
+# With the 'aiohttp' engine, requests above FLOW_MANAGER_MAX_INFLIGHT wait in
+# the event loop, up to FLOW_MANAGER_MAX_PENDING of them.
+FLOW_MANAGER_MAX_PENDING = 1000
+# What to do with flows when flow_manager refuses more requests or fails to
+# install them, or when FLOW_MANAGER_MAX_INFLIGHT batches are already being
+# sent: 'defer' queues them again to be sent with the next batch, 'shed' drops
+# them.
+FLOW_MANAGER_OVERLOAD = 'defer'
+
+# Table-miss flows of the OF1.3 switches enabled in the first
+# TABLE_MISS_STARTUP_WINDOW seconds after the NApp starts are installed
+# together once the window is over, skipping the switches that already have
+# one in flow_manager, with up to TABLE_MISS_WORKERS requests in parallel.
+# A window of 0 installs each table-miss flow as soon as the switch is enabled.
+TABLE_MISS_STARTUP_WINDOW = 5
+TABLE_MISS_WORKERS = 8
+
+# Flows learned from PacketIns are sent to flow_manager in batches per switch.
+# A batch is sent when it has FLOW_BATCH_SIZE flows or when its oldest flow
+# has waited FLOW_BATCH_INTERVAL seconds.
+FLOW_BATCH_SIZE = 64
+FLOW_BATCH_INTERVAL = 0.05
+# Flows with the same (dl_src, dl_dst, dl_type) queued to the same switch
+# within FLOW_DEDUP_WINDOW seconds are sent only once.
+FLOW_DEDUP_WINDOW = 1
+
+# Flows installed less than FLOW_CACHE_TTL seconds ago are not sent again.
+# At most FLOW_CACHE_SIZE flows are remembered, evicting the oldest ones.
+FLOW_CACHE_TTL = 10
+FLOW_CACHE_SIZE = 100000
+
+# MAC addresses not seen for MAC_TABLE_MAX_AGE seconds are forgotten. Each
+# switch keeps a MAC table per VLAN, plus one for untagged frames, and each
+# table learns at most MAC_TABLE_MAX_ENTRIES addresses, evicting the least
+# recently seen ones. A switch keeps at most MAC_TABLE_MAX_VLANS tables of
+# VLANs, so tagged frames with random VLAN IDs cannot grow the memory without
+# bound. Frames of further VLANs are flooded without being learned until the
+# table of another VLAN is empty.
+MAC_TABLE_MAX_AGE = 300
+MAC_TABLE_MAX_ENTRIES = 10000
+MAC_TABLE_MAX_VLANS = 256
+# File where the MAC tables are saved every MAC_SNAPSHOT_INTERVAL seconds, to
+# be restored when the NApp starts again, e.g.
+# '/var/lib/kytos/of_l2ls_mac_tables.log'. None disables it. The file is an
+# append-only log, rewritten once it is over MAC_SNAPSHOT_MAX_SIZE bytes.
+MAC_SNAPSHOT_PATH = None
+MAC_SNAPSHOT_INTERVAL = 30
+MAC_SNAPSHOT_MAX_SIZE = 16 * 1024 * 1024
+
+# Storm control: token-bucket limits of the PacketIns handled per second by
+# each switch and by each source MAC in a switch, with bursts of up to the
+# given size. PacketIns above the limits are dropped and counted. A rate of 0
+# disables the limit. At most STORM_MAX_SOURCES source MACs are tracked.
+STORM_SWITCH_RATE = 1000
+STORM_SWITCH_BURST = 2000
+STORM_SOURCE_RATE = 100
+STORM_SOURCE_BURST = 200
+STORM_MAX_SOURCES = 10000
+# If True, a source MAC above its limit is blocked by a flow dropping its
+# frames, removed by the switch after STORM_DROP_FLOW_TIMEOUT seconds.
+STORM_DROP_FLOW = False
+STORM_DROP_FLOW_TIMEOUT = 30
+STORM_DROP_FLOW_PRIORITY = 1000
+
+# PacketIns are handled by PACKET_IN_WORKERS threads, each switch always by
+# the same one, so the PacketIns of a switch are handled in order. Each worker
+# queues up to PACKET_IN_QUEUE_SIZE PacketIns and drops the ones above it,
+# counted as queue_full in the metrics.
+# With 0 workers, PacketIns are handled in the thread that received them.
+PACKET_IN_WORKERS = 4
+PACKET_IN_QUEUE_SIZE = 1000
+
+# Counters per switch and latency histograms of each stage of the PacketIn
+# handling, served at /api/kytos/of_l2ls/v1/metrics. METRICS_BUCKETS are the
+# upper bounds, in seconds, of the histogram buckets.
+METRICS_ENABLED = True
+METRICS_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05,
+                   0.1, 0.5, 1)
+
+# How frames to unknown destinations are flooded: 'flood' sends them to
+# OFPP_FLOOD, 'tree' sends them only to the host ports and to the links of a
+# spanning tree of the topology, computed from kytos/topology events.
+FLOOD_MODE = 'flood'
+
+# With VLAN_FLOOD_MEMBERS_ONLY, frames of a VLAN to unknown destinations are
+# flooded only to the member ports of the VLAN in the switch: the ports where
+# hosts of the VLAN were learned, the ports of links to other switches and the
+# ports listed for the VLAN in VLAN_PORTS, as {dpid: {vlan: [ports]}}. Hosts
+# on unlisted ports get the floods of their VLAN once they sent a frame, so
+# silent hosts must be listed. Frames of a VLAN without known members in the
+# switch are flooded as untagged ones.
+VLAN_FLOOD_MEMBERS_ONLY = False
+VLAN_PORTS = {}
+
+# If True, frames buffered by the switch are released by a PacketOut with
+# their buffer_id only, instead of sending the whole frame back.
+PACKET_OUT_USE_BUFFERS = True
@@ -292,6 +292,9 @@ setup(name=f'kytos_{NAPP_NAME}',
               'yala',
               'tox',
           ],
+          'aiohttp': [
+              'aiohttp',
+          ],
       },
       cmdclass={
           'clean': Cleaner,
@@ -0,0 +1,173 @@
+"""Persistence of the MAC tables across restarts."""
+import os
+from struct import Struct
+from time import monotonic, time
+
+from kytos.core import log
+
+MAGIC = b'L2LS\x02'
+# mac, port, wall-clock time when it was seen, VLAN and length of the dpid
+RECORD = Struct('!QIdHH')
+# VLAN of the records of untagged MAC addresses
+NO_VLAN = 0xffff
+# Port of the tombstone records of removed entries, and MAC address of the
+# ones of removed tables
+REMOVED = 0xffffffff
+ALL_MACS = 1 << 48
+
+
+class MACSnapshot:
+    """Append-only log of the MAC addresses learned by each switch and VLAN.
+
+    :meth:`save` appends a record for each entry seen since the previous save,
+    and a tombstone record for each entry or table removed meanwhile, so it
+    costs as much as the entries that changed. Records have the wall-clock
+    time the entry was seen, so ages survive restarts and :meth:`load` drops
+    the entries that aged out meanwhile. Once the log is bigger than
+    ``max_size`` bytes, or a table removed more entries than it holds, the log
+    is rewritten with the current entries only.
+
+    The MAC tables must track their removals.
+    """
+
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+        self._saved = float('-inf')
+        # Tables by key as of the previous save. None rewrites the log.
+        self._tables = None
+
+    @staticmethod
+    def _pack(key, entries, now):
+        """Return the records of the ``(mac, port, seen)`` entries.
+
+        ``key`` is the ``(dpid, vlan)`` of their MAC table.
+        """
+        dpid, vlan = key
+        dpid = dpid.encode()
+        vlan = NO_VLAN if vlan is None else vlan
+        offset = time() - now
+        return b''.join(
+            RECORD.pack(mac, port, seen + offset, vlan, len(dpid)) + dpid
+            for mac, port, seen in entries)
+
+    def save(self, tables):
+        """Append the entries of ``tables`` that changed since the last save.
+
+        ``tables`` are the MAC tables by ``(dpid, vlan)``. Errors are logged,
+        so that they never stop the caller.
+        """
+        try:
+            items = list(tables.items())
+            if (self._tables is None or not os.path.exists(self.path) or
+                    os.path.getsize(self.path) > self.max_size):
+                self._compact(items)
+                return
+            now = monotonic()
+            records = [self._pack(key, [(ALL_MACS, REMOVED, now)], now)
+                       for key, table in self._tables.items()
+                       if tables.get(key) is not table]
+            for key, table in items:
+                removed = table.pop_removed()
+                if removed is None:
+                    self._compact(items)
+                    return
+                since = (self._saved if self._tables.get(key) is table
+                         else float('-inf'))
+                records.append(self._pack(
+                    key, [(mac, REMOVED, now) for mac in removed], now))
+                records.append(self._pack(key, table.seen_since(since), now))
+            self._saved = now
+            self._tables = dict(items)
+            with open(self.path, 'ab') as log_file:
+                log_file.write(b''.join(records))
+        # pylint: disable=broad-except
+        except Exception as error:
+            self._tables = None
+            log.error(f'Could not save the MAC tables to {self.path}: '
+                      f'{error}')
+
+    def compact(self, tables):
+        """Rewrite the log with the entries of ``tables`` only.
+
+        Errors are logged, so that they never stop the caller.
+        """
+        try:
+            self._compact(list(tables.items()))
+        # pylint: disable=broad-except
+        except Exception as error:
+            self._tables = None
+            log.error(f'Could not save the MAC tables to {self.path}: '
+                      f'{error}')
+
+    def _compact(self, items):
+        """Rewrite the log with the entries of the ``(key, table)`` items."""
+        now = monotonic()
+        for _, table in items:
+            table.pop_removed()
+        records = [self._pack(key, table.seen_since(now - table.max_age),
+                              now)
+                   for key, table in items]
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'wb') as log_file:
+            log_file.write(MAGIC + b''.join(records))
+        os.replace(temp_path, self.path)
+        self._saved = now
+        self._tables = dict(items)
+
+    def load(self, max_age):
+        """Return the entries of the log not older than ``max_age`` seconds.
+
+        A truncated last record, left by a crash while writing it, is
+        ignored. Tombstone records remove the entries, or the tables, logged
+        before them.
+
+        Returns:
+            dict: ``{(dpid, vlan): [(mac, port, seen), ...]}`` with ``seen``
+            as a monotonic time, least recently seen first.
+
+        """
+        try:
+            with open(self.path, 'rb') as log_file:
+                data = log_file.read()
+        except FileNotFoundError:
+            return {}
+        except OSError as error:
+            log.error(f'Could not load the MAC tables from {self.path}: '
+                      f'{error}')
+            return {}
+        if not data.startswith(MAGIC):
+            log.error(f'{self.path} is not a MAC table snapshot.')
+            return {}
+
+        latest = {}
+        offset = len(MAGIC)
+        while offset + RECORD.size <= len(data):
+            mac, port, seen, vlan, length = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            if offset + length > len(data):
+                break
+            try:
+                dpid = data[offset:offset + length].decode()
+            except UnicodeDecodeError:
+                log.error(f'Corrupted record in {self.path}, ignoring the '
+                          f'rest of it.')
+                break
+            offset += length
+            key = (dpid, None if vlan == NO_VLAN else vlan)
+            if port != REMOVED:
+                latest.setdefault(key, {})[mac] = (port, seen)
+            elif mac == ALL_MACS:
+                latest.pop(key, None)
+            elif key in latest:
+                latest[key].pop(mac, None)
+
+        wall_now, now = time(), monotonic()
+        tables = {}
+        for key, entries in latest.items():
+            for mac, (port, seen) in sorted(entries.items(),
+                                            key=lambda item: item[1][1]):
+                age = wall_now - seen
+                if 0 <= age < max_age:
+                    tables.setdefault(key, []).append((mac, port, now - age))
+        return tables
@@ -0,0 +1,98 @@
+"""Rate limiting of the PacketIns handled per switch and per source MAC."""
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+
+class TokenBucket:
+    """Allow ``rate`` events per second, with bursts of up to ``burst``."""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def consume(self, now):
+        """Take a token from the bucket, if there is one.
+
+        Returns:
+            bool: True if the event is allowed, False if it exceeds the rate.
+
+        """
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class StormControl:
+    """Token-bucket limits of PacketIns per switch and per source MAC.
+
+    A rate of 0 disables the corresponding limit. At most ``max_sources``
+    source buckets are kept, evicting the least recently used ones.
+    """
+
+    def __init__(self, switch_rate, switch_burst, source_rate, source_burst,
+                 max_sources):
+        self.switch_rate = switch_rate
+        self.switch_burst = switch_burst
+        self.source_rate = source_rate
+        self.source_burst = source_burst
+        self.max_sources = max_sources
+        self._switches = {}
+        self._sources = OrderedDict()
+        self._blocked = {}
+        self._lock = Lock()
+
+    def allow_source(self, dpid, source, now=None):
+        """Return False if ``source`` exceeded its rate in the switch."""
+        if not self.source_rate:
+            return True
+        now = monotonic() if now is None else now
+        key = (dpid, source)
+        with self._lock:
+            bucket = self._sources.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.source_rate, self.source_burst, now)
+                self._sources[key] = bucket
+                if len(self._sources) > self.max_sources:
+                    self._sources.popitem(last=False)
+            else:
+                self._sources.move_to_end(key)
+            return bucket.consume(now)
+
+    def allow_switch(self, dpid, now=None):
+        """Return False if the switch exceeded its rate."""
+        if not self.switch_rate:
+            return True
+        now = monotonic() if now is None else now
+        with self._lock:
+            bucket = self._switches.get(dpid)
+            if bucket is None:
+                bucket = TokenBucket(self.switch_rate, self.switch_burst, now)
+                self._switches[dpid] = bucket
+            return bucket.consume(now)
+
+    def block(self, dpid, source, duration, now=None):
+        """Mark ``source`` as blocked in the switch for ``duration`` seconds.
+
+        Returns:
+            bool: False if the source was already blocked, True otherwise.
+
+        """
+        now = monotonic() if now is None else now
+        key = (dpid, source)
+        with self._lock:
+            if self._blocked.get(key, now) > now:
+                return False
+            if len(self._blocked) >= self.max_sources:
+                self._blocked = {blocked: until for blocked, until
+                                 in self._blocked.items() if until > now}
+            self._blocked[key] = now + duration
+        return True
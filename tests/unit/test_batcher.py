@@ -0,0 +1,86 @@
+"""Test the flow batcher."""
+from unittest import TestCase
+
+from napps.kytos.of_l2ls.batcher import FlowBatcher
+
+
+def get_flow(src, dst='00:00:00:00:00:02', dl_type=0x800):
+    """Return a flow with the given match fields."""
+    return {'match': {'dl_src': src, 'dl_dst': dst, 'dl_type': dl_type}}
+
+
+class TestFlowBatcher(TestCase):
+    """Tests for the FlowBatcher class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.batcher = FlowBatcher(max_size=3, max_delay=1, dedup_window=5)
+
+    def test_add__full_batch(self):
+        """Test add returning the flows once the batch is full."""
+        flows = [get_flow(f'00:00:00:00:00:0{i}') for i in range(3)]
+
+        self.assertIsNone(self.batcher.add('dpid', flows[0], now=0))
+        self.assertIsNone(self.batcher.add('dpid', flows[1], now=0))
+        self.assertEqual(self.batcher.add('dpid', flows[2], now=0), flows)
+        self.assertEqual(self.batcher.pop_all(), [])
+
+    def test_add__duplicated(self):
+        """Test add dropping duplicated flows inside the window."""
+        flow = get_flow('00:00:00:00:00:01')
+
+        self.batcher.add('dpid', flow, now=0)
+        self.batcher.add('dpid', dict(flow), now=4)
+        self.batcher.add('other', dict(flow), now=4)
+
+        self.assertEqual(self.batcher.pop_all(),
+                         [('dpid', [flow]), ('other', [flow])])
+
+        self.batcher.add('dpid', flow, now=6)
+        self.assertEqual(self.batcher.pop_all(), [('dpid', [flow])])
+
+    def test_add__duplicated_json(self):
+        """Test add dropping duplicated flows encoded to JSON."""
+        flow = '{"match": {"dl_dst": "00:00:00:00:00:02"}}'
+
+        self.batcher.add('dpid', flow, now=0)
+        self.batcher.add('dpid', ''.join(flow), now=4)
+
+        self.assertEqual(self.batcher.pop_all(), [('dpid', [flow])])
+
+    def test_add__other_port(self):
+        """Test add keeping a flow to another port inside the window."""
+        flow = get_flow('00:00:00:00:00:01')
+        moved = dict(flow, actions=[{'action_type': 'output', 'port': 9}])
+
+        self.batcher.add('dpid', flow, now=0)
+        self.batcher.add('dpid', moved, now=1)
+
+        self.assertEqual(self.batcher.pop_all(), [('dpid', [flow, moved])])
+
+    def test_pop_expired(self):
+        """Test pop_expired returning only the expired batches."""
+        flow_a = get_flow('00:00:00:00:00:01')
+        flow_b = get_flow('00:00:00:00:00:02')
+        self.batcher.add('dpid_a', flow_a, now=0)
+        self.batcher.add('dpid_b', flow_b, now=0.5)
+
+        self.assertEqual(self.batcher.pop_expired(now=0.9), [])
+        self.assertEqual(self.batcher.pop_expired(now=1),
+                         [('dpid_a', [flow_a])])
+        self.assertEqual(self.batcher.pop_expired(now=10),
+                         [('dpid_b', [flow_b])])
+
+        self.batcher.add('dpid_a', flow_a, now=10)
+        self.assertEqual(self.batcher.pop_all(), [('dpid_a', [flow_a])])
+
+    def test_requeue(self):
+        """Test requeue putting flows ahead of the queued ones."""
+        flow_a = get_flow('00:00:00:00:00:01')
+        flow_b = get_flow('00:00:00:00:00:02')
+        self.batcher.add('dpid', flow_b, now=0)
+        self.batcher.requeue('dpid', [flow_a], now=0)
+        self.batcher.requeue('other', [flow_a], now=0)
+
+        self.assertEqual(self.batcher.pop_expired(now=1),
+                         [('dpid', [flow_a, flow_b]), ('other', [flow_a])])
@@ -0,0 +1,172 @@
+"""Test the installed flow cache."""
+from unittest import TestCase
+
+from napps.kytos.of_l2ls.cache import FlowBudget, FlowCache
+
+
+class TestFlowCache(TestCase):
+    """Tests for the FlowCache class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.cache = FlowCache(ttl=10, max_size=3)
+
+    def test_add(self):
+        """Test add refusing flows added less than ttl seconds ago."""
+        self.assertTrue(self.cache.add('dpid', ('a', 'b', 0x800, None), 1,
+                                       now=0))
+        self.assertFalse(self.cache.add('dpid', ('a', 'b', 0x800, None), 1,
+                                        now=9))
+        self.assertTrue(self.cache.add('dpid', ('a', 'b', 0x800, None), 2,
+                                       now=9))
+        self.assertTrue(self.cache.add('other', ('a', 'b', 0x800, None), 1,
+                                       now=9))
+        self.assertFalse(self.cache.add('dpid', ('a', 'b', 0x800, None), 2,
+                                        now=10))
+        self.assertTrue(self.cache.add('dpid', ('a', 'b', 0x800, None), 2,
+                                       now=19))
+        self.assertEqual(len(self.cache), 2)
+
+    def test_add__evict(self):
+        """Test add evicting the least recently added flows."""
+        for dst in 'bcde':
+            self.cache.add('dpid', ('a', dst, 0x800, None), 1, now=0)
+
+        self.assertEqual(len(self.cache), 3)
+        self.assertTrue(self.cache.add('dpid', ('a', 'b', 0x800, None), 1,
+                                       now=1))
+        self.assertFalse(self.cache.add('dpid', ('a', 'e', 0x800, None), 1,
+                                        now=1))
+
+    def test_invalidate_switch(self):
+        """Test invalidate_switch dropping only the flows of the switch."""
+        self.cache.add('dpid', ('a', 'b', 0x800, None), 1, now=0)
+        self.cache.add('dpid', ('a', 'c', 0x800, None), 2, now=0)
+        self.cache.add('other', ('a', 'b', 0x800, None), 1, now=0)
+
+        self.cache.invalidate_switch('dpid')
+        self.cache.invalidate_switch('unknown')
+
+        self.assertEqual(len(self.cache), 1)
+        self.assertTrue(self.cache.add('dpid', ('a', 'b', 0x800, None), 1,
+                                       now=1))
+        self.assertFalse(self.cache.add('other', ('a', 'b', 0x800, None), 1,
+                                        now=1))
+
+    def test_invalidate_port(self):
+        """Test invalidate_port dropping only the flows to the port."""
+        self.cache.add('dpid', ('a', 'b', 0x800, None), 1, now=0)
+        self.cache.add('dpid', ('a', 'c', 0x800, None), 2, now=0)
+
+        self.assertEqual(self.cache.invalidate_port('dpid', 1),
+                         {('dpid', ('a', 'b', 0x800, None), 1)})
+        self.assertEqual(self.cache.invalidate_port('unknown', 1), set())
+
+        self.assertEqual(len(self.cache), 1)
+        self.assertTrue(self.cache.add('dpid', ('a', 'b', 0x800, None), 1,
+                                       now=1))
+        self.assertFalse(self.cache.add('dpid', ('a', 'c', 0x800, None), 2,
+                                        now=1))
+
+    def test_invalidate_port__replaced(self):
+        """Test invalidate_port keeping flows moved to another port."""
+        self.cache.add('dpid', ('a', 'b', 0x800, None), 2, now=0)
+        self.cache.add('dpid', ('a', 'b', 0x800, None), 3, now=20)
+
+        self.assertEqual(self.cache.invalidate_port('dpid', 2), set())
+        self.assertEqual(self.cache.invalidate_port('dpid', 3),
+                         {('dpid', ('a', 'b', 0x800, None), 3)})
+        self.assertEqual(len(self.cache), 0)
+
+    def test_invalidate_destination(self):
+        """Test invalidate_destination dropping only the flows to a MAC."""
+        self.cache.add('dpid', ('a', 'b', 0x800, None), 1, now=0)
+        self.cache.add('dpid', ('c', 'b', 0x800, None), 2, now=0)
+        self.cache.add('dpid', ('a', 'b', 0x800, 10), 1, now=0)
+
+        self.assertEqual(
+            self.cache.invalidate_destination('dpid', 1, 'b', None),
+            [('dpid', ('a', 'b', 0x800, None), 1)])
+        self.assertEqual(
+            self.cache.invalidate_destination('dpid', 3, 'b', None), [])
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertTrue(self.cache.add('dpid', ('a', 'b', 0x800, None), 1,
+                                       now=1))
+
+    def test_discard(self):
+        """Test discard dropping a single flow."""
+        self.cache.add('dpid', ('a', 'b', 0x800, None), 1, now=0)
+        self.cache.add('dpid', ('a', 'c', 0x800, None), 1, now=0)
+
+        self.cache.discard('dpid', ('a', 'b', 0x800, None), 1)
+        self.cache.discard('dpid', ('a', 'c', 0x800, None), 2)
+        self.cache.discard('dpid', ('a', 'd', 0x800, None), 1)
+
+        self.assertEqual(len(self.cache), 1)
+        self.assertTrue(self.cache.add('dpid', ('a', 'b', 0x800, None), 1,
+                                       now=1))
+
+
+class TestFlowBudget(TestCase):
+    """Tests for the FlowBudget class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.budget = FlowBudget(size=10, high=0.5, low=0.3)
+
+    def test_add(self):
+        """Test add evicting the least recently seen flows."""
+        for key in range(5):
+            self.assertEqual(self.budget.add('dpid', key, f'flow{key}'), [])
+        self.budget.touch('dpid', 0)
+        self.budget.touch('dpid', 10)
+        self.budget.touch('other', 0)
+
+        evicted = self.budget.add('dpid', 5, 'flow5')
+
+        self.assertEqual(evicted, ['flow1', 'flow2', 'flow3'])
+        self.assertEqual(self.budget.count('dpid'), 3)
+        self.assertEqual(self.budget.count('other'), 0)
+        self.assertEqual(self.budget.pop_evicted(), [('dpid', evicted)])
+        self.assertEqual(self.budget.pop_evicted(), [])
+
+    def test_add__disabled(self):
+        """Test a budget of 0 tracking no flows."""
+        budget = FlowBudget(size=0, high=0.5, low=0.3)
+
+        self.assertEqual(budget.add('dpid', 1, 'flow'), [])
+        self.assertEqual(budget.count('dpid'), 0)
+
+    def test_discard(self):
+        """Test discard forgetting a single flow."""
+        self.budget.add('dpid', 1, 1)
+        self.budget.add('dpid', 2, 2)
+
+        self.budget.discard('dpid', 1)
+        self.budget.discard('unknown', 1)
+
+        self.assertEqual(self.budget.count('dpid'), 1)
+
+    def test_reconcile(self):
+        """Test reconcile forgetting the flows the switch no longer has."""
+        for key in range(3):
+            self.budget.add('dpid', key, f'flow{key}', now=key * 10)
+
+        self.assertEqual(self.budget.reconcile('dpid', {1}, before=15),
+                         ['flow0'])
+        self.assertEqual(self.budget.reconcile('other', set(), before=15), [])
+        self.assertEqual(self.budget.count('dpid'), 2)
+        self.assertEqual(self.budget.pop_evicted(), [])
+
+    def test_remove_switch(self):
+        """Test remove_switch forgetting the flows of a switch."""
+        for key in range(6):
+            self.budget.add('dpid', key, key)
+        self.budget.add('other', 1, 1)
+
+        self.budget.remove_switch('dpid')
+
+        self.assertEqual(self.budget.count('dpid'), 0)
+        self.assertEqual(self.budget.count('other'), 1)
+        self.assertEqual(self.budget.pop_evicted(), [])
@@ -0,0 +1,243 @@
+"""Test the flow_manager client."""
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from napps.kytos.of_l2ls.client import (AsyncFlowManagerClient,
+                                        ClientLimits, FlowManagerClient,
+                                        get_client)
+
+
+class FakeResponse:
+    """aiohttp response returning a fixed status and body."""
+
+    def __init__(self, status, body):
+        self.status = status
+        self.body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def text(self):
+        """Return the body as text."""
+        return str(self.body)
+
+    async def json(self):
+        """Return the body."""
+        return self.body
+
+
+class FakeSession:
+    """aiohttp session recording its requests."""
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.requests = []
+        self.response = FakeResponse(200, None)
+        self.closed = False
+
+    def request(self, method, url, **kwargs):
+        """Record a request and return the response."""
+        self.requests.append((method, url, kwargs))
+        return self.response
+
+    async def close(self):
+        """Close the session."""
+        self.closed = True
+
+
+def get_aiohttp_mock():
+    """Return a mock of the aiohttp module using FakeSession."""
+    aiohttp = MagicMock()
+    aiohttp.ClientSession = FakeSession
+    aiohttp.ClientError = ConnectionError
+    return aiohttp
+
+
+# pylint: disable=protected-access
+class TestFlowManagerClient(TestCase):
+    """Tests for the FlowManagerClient class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.client = FlowManagerClient('http://localhost/v2', timeout=5,
+                                        limits=ClientLimits(2, 1, 10))
+        self.client._session = MagicMock()
+
+    def test_post_flows(self):
+        """Test post_flows using the pooled session with a timeout."""
+        flows = [{'priority': 10}, '{"priority": 20}']
+
+        self.assertTrue(self.client.post_flows('dpid', flows))
+        self.client._session.request.assert_called_once_with(
+            'post', 'http://localhost/v2/flows/dpid', timeout=5,
+            data=b'{"flows": [{"priority": 10}, {"priority": 20}]}',
+            headers={'Content-Type': 'application/json'})
+
+    def test_post_flows__callback(self):
+        """Test post_flows reporting a successful request."""
+        self.client._session.request.return_value.status_code = 201
+        callback = MagicMock()
+
+        self.assertTrue(self.client.post_flows('dpid', [], callback))
+        callback.assert_called_once_with(True)
+
+    @patch('napps.kytos.of_l2ls.client.log')
+    def test_post_flows__error(self, mock_log):
+        """Test post_flows logging and reporting failed requests."""
+        self.client._session.request.side_effect = requests.ConnectionError
+        callback = MagicMock()
+
+        self.assertTrue(self.client.post_flows('dpid', [], callback))
+        self.assertEqual(mock_log.error.call_count, 1)
+        callback.assert_called_once_with(False)
+
+        self.client._session.request.side_effect = None
+        self.client._session.request.return_value.status_code = 500
+        self.assertTrue(self.client.post_flows('dpid', [], callback))
+        self.assertEqual(mock_log.error.call_count, 2)
+        self.assertEqual(callback.call_count, 2)
+        callback.assert_called_with(False)
+
+    @patch('napps.kytos.of_l2ls.client.log')
+    def test_post_flows__overloaded(self, mock_log):
+        """Test post_flows refusing requests above max_inflight."""
+        self.client._slots.acquire()
+
+        self.assertFalse(self.client.post_flows('dpid', []))
+        self.client._session.request.assert_not_called()
+        mock_log.warning.assert_called_once()
+
+        self.client._slots.release()
+        self.assertTrue(self.client.post_flows('dpid', []))
+
+    def test_delete_flows(self):
+        """Test delete_flows sending a DELETE to flow_manager."""
+        flows = [{'match': {'dl_dst': '00:00:00:00:00:01'}}]
+
+        self.assertTrue(self.client.delete_flows('dpid', flows))
+        self.client._session.request.assert_called_once_with(
+            'delete', 'http://localhost/v2/flows/dpid', timeout=5,
+            json={'flows': flows})
+
+    def test_get_flows(self):
+        """Test get_flows returning the flows listed by flow_manager."""
+        response = self.client._session.request.return_value
+        response.status_code = 200
+        response.json.return_value = {'dpid': {'flows': []}}
+
+        self.assertEqual(self.client.get_flows(), {'dpid': {'flows': []}})
+        self.client._session.request.assert_called_once_with(
+            'get', 'http://localhost/v2/flows', timeout=5)
+
+    @patch('napps.kytos.of_l2ls.client.log')
+    def test_get_flows__error(self, mock_log):
+        """Test get_flows returning None if the request failed."""
+        response = self.client._session.request.return_value
+        response.status_code = 200
+        response.json.side_effect = ValueError
+
+        self.assertIsNone(self.client.get_flows())
+
+        response.status_code = 404
+        self.assertIsNone(self.client.get_flows())
+        self.assertEqual(mock_log.error.call_count, 2)
+
+
+class TestAsyncFlowManagerClient(TestCase):
+    """Tests for the AsyncFlowManagerClient class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        patch('napps.kytos.of_l2ls.client.aiohttp', get_aiohttp_mock()).start()
+        self.addCleanup(patch.stopall)
+        self.client = AsyncFlowManagerClient('http://localhost/v2', (1, 2),
+                                             limits=ClientLimits(2, 1, 10))
+        self.session = self.client._session
+
+    def test_post_flows(self):
+        """Test post_flows sending the request from the event loop."""
+        flows = [{'priority': 10}]
+
+        callback = MagicMock()
+
+        self.assertTrue(self.client.post_flows('dpid', flows, callback))
+        self.assertTrue(self.client.delete_flows('dpid', flows))
+        self.client.close()
+
+        callback.assert_called_once_with(True)
+
+        self.assertEqual(self.session.requests, [
+            ('post', 'http://localhost/v2/flows/dpid',
+             {'data': b'{"flows": [{"priority": 10}]}',
+              'headers': {'Content-Type': 'application/json'}}),
+            ('delete', 'http://localhost/v2/flows/dpid', {'json': {'flows':
+                                                                   flows}})])
+        self.assertTrue(self.session.closed)
+
+    def test_get_flows(self):
+        """Test get_flows waiting for the flows listed by flow_manager."""
+        self.session.response = FakeResponse(200, {'dpid': {'flows': []}})
+
+        self.assertEqual(self.client.get_flows(), {'dpid': {'flows': []}})
+        self.client.close()
+
+    @patch('napps.kytos.of_l2ls.client.log')
+    def test_get_flows__error(self, mock_log):
+        """Test get_flows returning None if the request failed."""
+        self.session.response = FakeResponse(500, 'error')
+
+        self.assertIsNone(self.client.get_flows())
+        self.client.close()
+        mock_log.error.assert_called_once()
+
+    @patch('napps.kytos.of_l2ls.client.log')
+    def test_post_flows__error(self, mock_log):
+        """Test post_flows reporting failed requests to the callback."""
+        self.session.response = FakeResponse(500, 'error')
+        callback = MagicMock()
+
+        self.assertTrue(self.client.post_flows('dpid', [], callback))
+        self.client.close()
+
+        callback.assert_called_once_with(False)
+        mock_log.error.assert_called_once()
+
+    @patch('napps.kytos.of_l2ls.client.log')
+    def test_post_flows__overloaded(self, mock_log):
+        """Test post_flows refusing requests above max_pending."""
+        self.client.max_pending = 0
+
+        self.assertFalse(self.client.post_flows('dpid', []))
+        self.client.close()
+
+        self.assertEqual(self.session.requests, [])
+        mock_log.warning.assert_called_once()
+
+
+class TestGetClient(TestCase):
+    """Tests for the get_client function."""
+
+    def test_get_client(self):
+        """Test get_client returning the client of the engine."""
+        client = get_client('requests', 'url', 1, ClientLimits(1, 1, 1))
+        self.assertIsInstance(client, FlowManagerClient)
+
+        with patch('napps.kytos.of_l2ls.client.aiohttp',
+                   get_aiohttp_mock()):
+            client = get_client('aiohttp', 'url', 1, ClientLimits(1, 1, 1))
+            self.assertIsInstance(client, AsyncFlowManagerClient)
+            client.close()
+
+    @patch('napps.kytos.of_l2ls.client.log')
+    @patch('napps.kytos.of_l2ls.client.aiohttp', None)
+    def test_get_client__no_aiohttp(self, mock_log):
+        """Test get_client using requests if aiohttp is not installed."""
+        client = get_client('aiohttp', 'url', 1, ClientLimits(1, 1, 1))
+
+        self.assertIsInstance(client, FlowManagerClient)
+        mock_log.error.assert_called_once()
@@ -0,0 +1,48 @@
+"""Test the PacketIn dispatcher."""
+from threading import Event
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from napps.kytos.of_l2ls.dispatcher import PacketInDispatcher
+
+
+class TestPacketInDispatcher(TestCase):
+    """Tests for the PacketInDispatcher class."""
+
+    def test_dispatch(self):
+        """Test dispatch handling the events of a switch in order."""
+        handled = []
+        dispatcher = PacketInDispatcher(handled.append, workers=2,
+                                        queue_size=10)
+
+        for event in range(5):
+            self.assertTrue(dispatcher.dispatch('dpid', event))
+        dispatcher.stop()
+
+        self.assertEqual(handled, list(range(5)))
+
+    def test_dispatch__full(self):
+        """Test dispatch dropping events above the queue size."""
+        release = Event()
+        dispatcher = PacketInDispatcher(lambda _: release.wait(), workers=1,
+                                        queue_size=1)
+
+        dispatcher.dispatch('dpid', 1)
+        results = [dispatcher.dispatch('dpid', event) for event in (2, 3)]
+        release.set()
+        dispatcher.stop()
+
+        self.assertIn(False, results)
+
+    @patch('napps.kytos.of_l2ls.dispatcher.log')
+    def test_dispatch__error(self, mock_log):
+        """Test the workers surviving errors of the handler."""
+        handle = MagicMock(side_effect=[ValueError, None])
+        dispatcher = PacketInDispatcher(handle, workers=1, queue_size=10)
+
+        dispatcher.dispatch('dpid', MagicMock())
+        dispatcher.dispatch('dpid', MagicMock())
+        dispatcher.stop()
+
+        self.assertEqual(handle.call_count, 2)
+        mock_log.error.assert_called_once()
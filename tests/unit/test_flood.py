@@ -0,0 +1,56 @@
+"""Test the flooding over a spanning tree."""
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from napps.kytos.of_l2ls.flood import FloodTree
+
+# Triangle of switches a, b and c, plus a second link between a and b
+LINKS = [('a', 1, 'b', 1), ('b', 2, 'c', 1), ('a', 2, 'c', 2),
+         ('a', 3, 'b', 3)]
+
+
+class TestFloodTree(TestCase):
+    """Tests for the FloodTree class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.tree = FloodTree()
+        self.tree.update(LINKS)
+
+    def test_ports(self):
+        """Test ports excluding the links outside the spanning tree."""
+        self.assertEqual(self.tree.ports('a', 10, lambda: [1, 2, 3, 10]),
+                         (1, 2))
+        self.assertEqual(self.tree.ports('b', 10, lambda: [1, 2, 3, 10]),
+                         (1,))
+        self.assertEqual(self.tree.ports('c', 10, lambda: [1, 2, 10]), (2,))
+        self.assertEqual(self.tree.ports('d', 1, lambda: [1, 2]), (2,))
+
+    def test_ports__blocked_in_port(self):
+        """Test ports not flooding frames arriving on a blocked port."""
+        self.assertEqual(self.tree.ports('b', 2, lambda: [1, 2, 3, 10]), ())
+
+    def test_ports__cached(self):
+        """Test ports caching the flood ports until invalidated."""
+        get_ports = MagicMock(return_value=[1, 2, 10])
+
+        self.tree.ports('c', 10, get_ports)
+        self.tree.ports('c', 10, get_ports)
+        self.assertEqual(get_ports.call_count, 1)
+
+        self.tree.update(LINKS)
+        self.tree.ports('c', 10, get_ports)
+        self.assertEqual(get_ports.call_count, 1)
+
+        self.tree.invalidate('c')
+        self.tree.ports('c', 10, get_ports)
+        self.assertEqual(get_ports.call_count, 2)
+
+    def test_update(self):
+        """Test update unblocking ports when a tree link goes down."""
+        get_ports = MagicMock(return_value=[1, 2, 10])
+        self.assertEqual(self.tree.ports('c', 10, get_ports), (2,))
+
+        self.tree.update([LINKS[0], LINKS[1], LINKS[3]])
+
+        self.assertEqual(self.tree.ports('c', 10, get_ports), (1, 2))
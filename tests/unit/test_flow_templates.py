@@ -0,0 +1,66 @@
+"""Test the JSON encoding of flows."""
+import json
+from unittest import TestCase
+
+from napps.kytos.of_l2ls.flow_templates import FlowTemplates, encode_flows
+from napps.kytos.of_l2ls.utils import EthernetHeader
+
+
+# pylint: disable=protected-access
+class TestFlowTemplates(TestCase):
+    """Tests for the FlowTemplates class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.templates = FlowTemplates(priority=1200, table_id=0,
+                                       idle_timeout=300, hard_timeout=0)
+        self.header = EthernetHeader(2, 1, 0x800, None)
+
+    def test_encode(self):
+        """Test encode filling the template of the flow in."""
+        flow = self.templates.encode(self.header, 3)
+
+        self.assertEqual(json.loads(flow), {
+            'priority': 1200, 'table_id': 0, 'idle_timeout': 300,
+            'hard_timeout': 0,
+            'match': {'dl_src': '00:00:00:00:00:01',
+                      'dl_dst': '00:00:00:00:00:02', 'dl_type': 0x800},
+            'actions': [{'action_type': 'output', 'port': 3}]})
+
+    def test_encode__dst_only(self):
+        """Test encode leaving the source out with dst_only."""
+        flow = json.loads(self.templates.encode(self.header, 3,
+                                                dst_only=True))
+
+        self.assertEqual(flow['match'], {'dl_dst': '00:00:00:00:00:02'})
+
+    def test_encode__cached(self):
+        """Test encode building one template for each key."""
+        self.templates.encode(self.header, 3)
+        self.templates.encode(EthernetHeader(5, 4, 0x800, None), 6)
+        self.templates.encode(EthernetHeader(2, 1, 0x806, None), 3)
+
+        self.templates.encode(EthernetHeader(2, 1, 0x800, 100), 3)
+
+        self.assertEqual(len(self.templates._templates), 3)
+
+    def test_encode__vlan(self):
+        """Test encode matching the VLAN of tagged frames."""
+        flow = json.loads(self.templates.encode(
+            EthernetHeader(2, 1, 0x800, 100), 3))
+
+        self.assertEqual(flow['match'], {'dl_src': '00:00:00:00:00:01',
+                                         'dl_dst': '00:00:00:00:00:02',
+                                         'dl_type': 0x800, 'dl_vlan': 100})
+        self.assertEqual(flow['actions'][0]['port'], 3)
+
+    def test_encode_flows(self):
+        """Test encode_flows joining dicts and encoded flows."""
+        flows = [{'priority': 0},
+                 self.templates.encode(self.header, 3, dst_only=True)]
+
+        body = json.loads(encode_flows(flows))
+
+        self.assertEqual(body['flows'][0], {'priority': 0})
+        self.assertEqual(body['flows'][1]['match'],
+                         {'dl_dst': '00:00:00:00:00:02'})
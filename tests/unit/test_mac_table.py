@@ -0,0 +1,128 @@
+"""Test the MAC learning table."""
+from unittest import TestCase
+
+from napps.kytos.of_l2ls.mac_table import MACTable, int_to_mac, mac_to_int
+
+
+class TestMACTable(TestCase):
+    """Tests for the MACTable class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.table = MACTable(max_age=10, max_entries=3)
+
+    def test_mac_conversion(self):
+        """Test the conversion of MAC addresses to integers and back."""
+        self.assertEqual(mac_to_int('00:00:00:00:01:0a'), 0x10a)
+        self.assertEqual(mac_to_int('FF:FF:FF:FF:FF:FF'), 2 ** 48 - 1)
+        self.assertEqual(int_to_mac(0x10a), '00:00:00:00:01:0a')
+
+    def test_learn_and_lookup(self):
+        """Test lookup returning the last port where a MAC was seen."""
+        self.table.learn(1, 1, now=0)
+        self.table.learn(1, 2, now=5)
+
+        self.assertEqual(self.table.lookup(1, now=14), 2)
+        self.assertIsNone(self.table.lookup(1, now=15))
+        self.assertIsNone(self.table.lookup(2, now=0))
+
+    def test_learn__moved(self):
+        """Test learn returning the previous port of a MAC that moved."""
+        self.assertIsNone(self.table.learn(1, 1, now=0))
+        self.assertIsNone(self.table.learn(1, 1, now=1))
+        self.assertEqual(self.table.learn(1, 2, now=2), 1)
+        self.assertEqual(self.table.remove_port(1), set())
+
+    def test_learn__evict(self):
+        """Test learn evicting the least recently seen entry."""
+        for mac in range(3):
+            self.table.learn(mac, mac, now=0)
+        self.table.learn(0, 0, now=1)
+        self.table.learn(3, 3, now=1)
+
+        self.assertEqual(len(self.table), 3)
+        self.assertIsNone(self.table.lookup(1, now=1))
+        self.assertEqual(self.table.lookup(0, now=1), 0)
+
+    def test_remove(self):
+        """Test remove forgetting a MAC address."""
+        self.table.learn(1, 1, now=0)
+
+        self.table.remove(1)
+        self.table.remove(2)
+
+        self.assertIsNone(self.table.lookup(1, now=0))
+
+    def test_remove_port(self):
+        """Test remove_port forgetting only the MACs learned on the port."""
+        self.table.learn(1, 1, now=0)
+        self.table.learn(2, 1, now=0)
+        self.table.learn(3, 2, now=0)
+
+        self.assertEqual(self.table.remove_port(1), {1, 2})
+        self.assertEqual(self.table.remove_port(1), set())
+        self.assertEqual(len(self.table), 1)
+        self.assertEqual(self.table.lookup(3, now=0), 2)
+
+    def test_expire(self):
+        """Test expire removing only the aged entries."""
+        self.table.learn(1, 1, now=0)
+        self.table.learn(2, 2, now=5)
+        self.table.learn(1, 1, now=6)
+
+        self.assertEqual(self.table.expire(now=15), 1)
+        self.assertEqual(len(self.table), 1)
+        self.assertEqual(self.table.lookup(1, now=15), 1)
+        self.assertEqual(self.table.remove_port(2), set())
+
+    def test_pop_removed(self):
+        """Test pop_removed returning the entries removed before aging out."""
+        for mac in range(5):
+            self.table.learn(mac, 0, now=0)
+        self.assertEqual(self.table.pop_removed(), set())
+
+        table = MACTable(max_age=10, max_entries=3, track_removals=True)
+        for mac in range(5):
+            table.learn(mac, mac % 2, now=0)
+        table.remove(4)
+        table.remove(4)
+        table.expire(now=10)
+        self.assertEqual(table.pop_removed(), {0, 1, 4})
+        self.assertEqual(table.pop_removed(), set())
+
+        for mac in range(3):
+            table.learn(mac, mac % 2, now=10)
+        table.remove_port(0)
+        table.clear()
+        self.assertEqual(table.pop_removed(), {0, 1, 2})
+
+        for mac in range(8):
+            table.learn(mac, 0, now=10)
+        self.assertIsNone(table.pop_removed())
+        self.assertEqual(table.pop_removed(), set())
+
+    def test_entries(self):
+        """Test entries yielding the entries not aged out."""
+        self.table.learn(1, 1, now=0)
+        self.table.learn(2, 2, now=5)
+
+        self.assertEqual(list(self.table.entries(now=12)), [(2, 2, 7)])
+
+    def test_clear(self):
+        """Test clear forgetting every MAC address."""
+        self.table.learn(1, 1, now=0)
+
+        self.table.clear()
+
+        self.assertEqual(len(self.table), 0)
+        self.assertEqual(self.table.remove_port(1), set())
+
+    def test_seen_since(self):
+        """Test seen_since returning only the recently seen entries."""
+        self.table.learn(1, 1, now=0)
+        self.table.learn(2, 2, now=5)
+        self.table.learn(3, 3, now=6)
+        self.table.learn(2, 4, now=7)
+
+        self.assertEqual(self.table.seen_since(5), [(3, 3, 6), (2, 4, 7)])
+        self.assertEqual(self.table.seen_since(7), [])
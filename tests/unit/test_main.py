@@ -1,16 +1,37 @@
 """Test Main methods."""
+import json
+from tempfile import TemporaryDirectory
+from threading import BoundedSemaphore
 from unittest import TestCase
-from unittest.mock import MagicMock, call, patch
-
-from kytos.lib.helpers import (get_controller_mock, get_kytos_event_mock,
-                               get_switch_mock)
-from pyof.v0x01.common.phy_port import PortConfig as PortConfig10
+from unittest.mock import ANY, MagicMock, patch
+
+from kytos.lib.helpers import (get_controller_mock, get_interface_mock,
+                               get_kytos_event_mock, get_switch_mock)
+from pyof.foundation.basic_types import BinaryData
+from pyof.foundation.constants import UBINT32_MAX_VALUE
+from pyof.v0x01.common.action import ActionOutput as Output10
+from pyof.v0x01.common.phy_port import Port as Port10
+from pyof.v0x01.controller2switch.packet_out import PacketOut as PacketOut10
+from pyof.v0x04.common.action import ActionOutput as Output13
 from pyof.v0x04.common.port import PortConfig as PortConfig13
+from pyof.v0x04.common.port import PortNo as Port13
+from pyof.v0x04.controller2switch.packet_out import PacketOut as PacketOut13
+
+from napps.kytos.of_l2ls.cache import FlowBudget
+from napps.kytos.of_l2ls.flow_templates import FlowTemplates
+from napps.kytos.of_l2ls.packet_out import ENCODERS
+from napps.kytos.of_l2ls.utils import EthernetHeader
+
+
+def get_frame(dl_dst, dl_src, ether_type=0x800, payload=b'payload'):
+    """Return the bytes of an Ethernet frame."""
+    return (dl_dst.to_bytes(6, 'big') + dl_src.to_bytes(6, 'big') +
+            ether_type.to_bytes(2, 'big') + payload)
 
 
 # pylint: disable=protected-access
-class TestMain(TestCase):
-    """Tests for the Main class."""
+class MainTestCase(TestCase):
+    """Base of the tests of the Main class."""
 
     def setUp(self):
         """Execute steps before each tests."""
@@ -21,19 +42,31 @@ class TestMain(TestCase):
 
         self.napp = Main(get_controller_mock())
 
+    @staticmethod
+    def _get_packet_in_event(switch, in_port=1, frame=None):
+        """Return a PacketIn event received from the switch."""
+        message = MagicMock()
+        message.reason = 0
+        message.buffer_id = UBINT32_MAX_VALUE
+        message.in_port = in_port
+        message.data = BinaryData(frame or get_frame(2, 1))
+        return get_kytos_event_mock(name='kytos/of_core.v0x0[14].messages.in.'
+                                         'ofpt_packet_in',
+                                    content={'source': switch.connection,
+                                             'message': message})
+
+
+class TestTableMiss(MainTestCase):
+    """Tests for the TableMiss Flows."""
+
     @patch('napps.kytos.of_l2ls.main.Port13')
-    @patch('napps.kytos.of_l2ls.main.requests')
     @patch('napps.kytos.of_l2ls.main.settings')
     @patch('kytos.core.controller.Controller.get_switch_by_dpid')
     def test_install_table_miss_flow(self, *args):
         """Test _create_flow_mod method for flow 1.3 packet."""
-        (mock_get_switch_by_dpid, mock_settings, mock_requests,
-         mock_port13) = args
+        (mock_get_switch_by_dpid, mock_settings, mock_port13) = args
 
         mock_port13.OFPP_CONTROLLER = 123
-        flow_manager_url = 'http://localhost:8181/api/kytos/flow_manager/v2'
-
-        mock_settings.FLOW_MANAGER_URL = flow_manager_url
         mock_settings.TABLE_ID = 0
         expected_flow = {}
         expected_flow['priority'] = 0
@@ -44,171 +77,899 @@ class TestMain(TestCase):
         dpid = "00:00:00:00:00:00:00:01"
         switch = get_switch_mock(dpid, 0x04)
         mock_get_switch_by_dpid.return_value = switch
-
-        destination = switch.id
-        endpoint = f'{flow_manager_url}/flows/{destination}'
+        self.napp.flow_manager = MagicMock()
+        self.napp._table_miss_deadline = 0
 
         event = get_kytos_event_mock(name='kytos/topology.switch.enabled',
                                      content={'dpid': dpid})
         self.napp.install_table_miss_flow(event)
 
-        data = {'flows': [expected_flow]}
-        mock_requests.post.assert_called_with(endpoint, json=data)
+        self.napp.flow_manager.post_flows.assert_called_with(
+            switch.id, [expected_flow], ANY)
+
+    @patch('kytos.core.controller.Controller.get_switch_by_dpid')
+    def test_install_table_miss_flow__startup(self, mock_get_switch_by_dpid):
+        """Test install_table_miss_flow collecting switches at startup."""
+        switch_10 = get_switch_mock("00:00:00:00:00:00:00:01", 0x01)
+        switch_13 = get_switch_mock("00:00:00:00:00:00:00:02", 0x04)
+        self.napp.flow_manager = MagicMock()
+
+        for switch in (switch_10, switch_13):
+            mock_get_switch_by_dpid.return_value = switch
+            event = get_kytos_event_mock(name='kytos/topology.switch.enabled',
+                                         content={'dpid': switch.dpid})
+            self.napp.install_table_miss_flow(event)
+
+        self.napp.flow_manager.post_flows.assert_not_called()
+        self.assertEqual(self.napp._pending_table_miss, {switch_13.id})
+
+    def test_reconcile_table_miss_flows(self):
+        """Test _reconcile_table_miss_flows skipping installed flows."""
+        self.napp.flow_manager = MagicMock()
+        self.napp.table_miss_executor = MagicMock()
+        flow = self.napp._create_table_miss_flow()
+        self.napp.flow_manager.get_flows.return_value = {
+            'dpid1': {'flows': [dict(flow, match={}, cookie=0)]},
+            'dpid2': {'flows': [dict(flow, priority=10)]}}
+        self.napp._pending_table_miss = {'dpid1', 'dpid2', 'dpid3'}
+
+        self.napp._reconcile_table_miss_flows()
+        self.napp.table_miss_executor.submit.assert_not_called()
+
+        self.napp._table_miss_deadline = 0
+        self.napp._reconcile_table_miss_flows()
+
+        self.assertEqual(self.napp._pending_table_miss, set())
+        self.napp.flow_manager.get_flows.assert_called_once()
+        submit = self.napp.table_miss_executor.submit
+        self.assertEqual(submit.call_count, 2)
+        submit.assert_any_call(self.napp._send_flows, 'dpid2', [flow])
+        submit.assert_any_call(self.napp._send_flows, 'dpid3', [flow])
+
+    @patch('napps.kytos.of_l2ls.main.log')
+    def test_reconcile_table_miss_flows__no_flows(self, mock_log):
+        """Test _reconcile_table_miss_flows if flow_manager fails."""
+        self.napp.flow_manager = MagicMock()
+        self.napp.flow_manager.get_flows.return_value = None
+        self.napp._pending_table_miss = {'dpid'}
+        self.napp._table_miss_deadline = 0
+
+        self.napp._reconcile_table_miss_flows()
+        self.napp.table_miss_executor.shutdown()
+
+        mock_log.warning.assert_called_once()
+        self.napp.flow_manager.post_flows.assert_called_once_with(
+            'dpid', [self.napp._create_table_miss_flow()], ANY)
+
+
+class TestPacketIn(MainTestCase):
+    """Tests for the PacketIn handling."""
+
+    def test_get_encoder(self):
+        """Test _get_encoder choosing the encoder of the switch version."""
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x01)
+        switch.id = switch.dpid
+        event = get_kytos_event_mock(name='kytos/of_core.handshake.completed',
+                                     content={'switch': switch})
+
+        self.napp.handle_handshake_completed(event)
+        switch.connection.protocol.version = 0x04
+
+        self.assertIs(self.napp._get_encoder(switch), ENCODERS[0x01])
+        self.napp.handle_handshake_completed(event)
+        self.assertIs(self.napp._get_encoder(switch), ENCODERS[0x04])
+        switch.connection.protocol.version = 0x05
+        self.napp.handle_handshake_completed(event)
+        self.assertIsNone(self.napp._get_encoder(switch))
+
+    @patch('napps.kytos.of_l2ls.main.Main._send_packet_out')
+    @patch('napps.kytos.of_l2ls.main.Main._get_out_port')
+    @patch('napps.kytos.of_l2ls.main.Main._create_flow')
+    def test_handle_packet_in(self, *args):
+        """Test handle_packet_in method."""
+        (mock_create_flow, mock_get_out_port, mock_send_packet_out) = args
+
+        flow_dict = MagicMock()
+        mock_create_flow.return_value = flow_dict
+        mock_get_out_port.return_value = 2
+        self.napp.packet_out_templates = MagicMock()
+
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x04)
+        mac_table = self.napp._get_mac_table(switch.id)
+        mac_table.learn(2, 2)
+        event = self._get_packet_in_event(switch)
+        message = event.content['message']
+
+        self.napp.flow_manager = MagicMock()
+        self.napp.handle_packet_in(event)
+
+        self.assertEqual(mac_table.lookup(1), message.in_port)
+        switch.update_mac_table.assert_not_called()
+
+        (header, port), _ = mock_create_flow.call_args
+        self.assertEqual(header, EthernetHeader(2, 1, 0x800, None))
+        self.assertEqual(port, 2)
+        mock_get_out_port.assert_called_with(ENCODERS[0x04], [2], switch)
+
+        templates = self.napp.packet_out_templates
+        templates.create.assert_called_once_with(ENCODERS[0x04], 2, message)
+        mock_send_packet_out.assert_called_once_with(
+            event.source, templates.create.return_value)
+
+        self.napp.flow_manager.post_flows.assert_not_called()
+        self.assertEqual(self.napp.flow_batcher.pop_all(),
+                         [(switch.id, [flow_dict])])
+
+    @patch('kytos.core.buffers.KytosEventBuffer.put')
+    @patch('napps.kytos.of_l2ls.main.Main._create_flow')
+    def test_handle_packet_in__unknown_destination(self, *args):
+        """Test handle_packet_in flooding to an unknown destination."""
+        (mock_create_flow, mock_buffer_put) = args
+
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x04)
+        switch.interfaces = {}
+        event = self._get_packet_in_event(switch)
+        message = event.content['message']
+
+        self.napp.handle_packet_in(event)
+
+        mock_create_flow.assert_not_called()
+        self.assertEqual(mock_buffer_put.call_count, 1)
+        (event_out,), _ = mock_buffer_put.call_args
+        self.assertEqual(event_out.name,
+                         'kytos/of_l2ls.messages.out.ofpt_packet_out')
+        self.assertEqual(event_out.destination, event.source)
+
+        expected = PacketOut13(xid=0, buffer_id=message.buffer_id,
+                               in_port=message.in_port, data=message.data,
+                               actions=[Output13(port=Port13.OFPP_FLOOD)])
+        packet_out = event_out.content['message'].pack()
+        self.assertEqual(packet_out[8:], expected.pack()[8:])
+
+    @patch('napps.kytos.of_l2ls.main.Main.handle_packet_in')
+    def test_dispatch_packet_in(self, mock_handle_packet_in):
+        """Test dispatch_packet_in queueing PacketIns to the workers."""
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x04)
+        event = self._get_packet_in_event(switch)
+        self.napp.packet_in_dispatcher = MagicMock()
+
+        self.napp.dispatch_packet_in(event)
+
+        self.napp.packet_in_dispatcher.dispatch.assert_called_once_with(
+            switch.id, event)
+        mock_handle_packet_in.assert_not_called()
+        self.assertEqual(self.napp.metrics.as_dict()['counters'], {})
+
+        self.napp.packet_in_dispatcher.dispatch.return_value = False
+        self.napp.dispatch_packet_in(event)
+        self.assertEqual(self.napp.metrics.as_dict()['counters'],
+                         {switch.id: {'queue_full': 1}})
+
+        self.napp.packet_in_dispatcher = None
+        self.napp.dispatch_packet_in(event)
+        mock_handle_packet_in.assert_called_once_with(event)
+
+    @patch('kytos.core.buffers.KytosEventBuffer.put')
+    def test_handle_packet_in__metrics(self, _):
+        """Test handle_packet_in counting floods and forwards."""
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x04)
+        switch.interfaces = {}
+
+        self.napp.handle_packet_in(self._get_packet_in_event(switch))
+        self.napp.handle_packet_in(self._get_packet_in_event(
+            switch, in_port=2, frame=get_frame(1, 2)))
+
+        metrics = self.napp.metrics.as_dict()
+        self.assertEqual(metrics['counters'][switch.id],
+                         {'packet_in': 2, 'flood': 1, 'unicast': 1})
+        for stage in ('parse', 'learn', 'flows', 'packet_out', 'packet_in'):
+            self.assertEqual(metrics['latency'][stage]['count'], 2)
+
+    @patch('kytos.core.buffers.KytosEventBuffer.put')
+    def test_handle_packet_in__ignored(self, mock_buffer_put):
+        """Test handle_packet_in ignoring LLDP and malformed frames."""
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x04)
+        frames = [get_frame(0x0180c200000e, 1, 0x88cc),
+                  get_frame(0x0180c2000000, 1, 0x0026),
+                  get_frame(2, 1, 0x88cc),
+                  b'short']
+
+        for frame in frames:
+            self.napp.handle_packet_in(self._get_packet_in_event(switch,
+                                                                 frame=frame))
+
+        self.assertEqual(self.napp.mac_tables, {})
+        mock_buffer_put.assert_not_called()
+
+    @patch('kytos.core.buffers.KytosEventBuffer.put')
+    @patch('napps.kytos.of_l2ls.main.Main._create_flow')
+    def test_handle_packet_in__cached_flow(self, *args):
+        """Test handle_packet_in not queueing recently installed flows."""
+        (mock_create_flow, mock_buffer_put) = args
+
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x04)
+        switch.interfaces = {}
+        self.napp._get_mac_table(switch.id).learn(2, 2)
+        event = self._get_packet_in_event(switch)
+
+        self.napp.handle_packet_in(event)
+        self.napp.handle_packet_in(event)
+
+        self.assertEqual(mock_create_flow.call_count, 1)
+        self.assertEqual(mock_buffer_put.call_count, 2)
+
+    @patch('kytos.core.buffers.KytosEventBuffer.put')
+    def test_handle_packet_in__host_moved(self, _):
+        """Test handle_packet_in pointing the flows to a host that moved."""
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x04)
+        switch.interfaces = {}
+        mac_table = self.napp._get_mac_table(switch.id)
+        mac_table.learn(1, 1)
+        self.napp._queue_flows(switch.id, EthernetHeader(1, 3, 0x800, None),
+                               3, 1)
+        self.napp.flow_batcher.pop_all()
+        event = self._get_packet_in_event(switch, in_port=5)
+
+        self.napp.handle_packet_in(event)
+
+        self.assertEqual(mac_table.lookup(1), 5)
+        ((dpid, flows),) = self.napp.flow_batcher.pop_all()
+        self.assertEqual(dpid, switch.id)
+        flow = json.loads(flows[0])
+        self.assertEqual(flow['match']['dl_dst'], '00:00:00:00:00:01')
+        self.assertEqual(flow['actions'][0]['port'], 5)
+        flow_cache = self.napp.flow_cache
+        self.assertFalse(flow_cache.add(switch.id, (3, 1, 0x800, None), 5))
+        self.assertTrue(flow_cache.add(switch.id, (3, 1, 0x800, None), 1))
+
+    @patch('kytos.core.buffers.KytosEventBuffer.put')
+    @patch('napps.kytos.of_l2ls.main.Main._get_out_port')
+    @patch('napps.kytos.of_l2ls.main.Main._create_flow')
+    def test_handle_packet_in__full_batch(self, *args):
+        """Test handle_packet_in handing a full batch to the flow executor."""
+        (mock_create_flow, mock_get_out_port, mock_buffer_put) = args
+        self.napp.flow_executor = MagicMock()
+
+        flow_dict = {'match': {'dl_src': 'a', 'dl_dst': 'b', 'dl_type': 1}}
+        mock_create_flow.return_value = flow_dict
+        mock_get_out_port.return_value = None
+        self.napp.flow_batcher.max_size = 1
+
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x04)
+        self.napp._get_mac_table(switch.id).learn(2, 2)
+        event = self._get_packet_in_event(switch)
+
+        self.napp.handle_packet_in(event)
+
+        mock_buffer_put.assert_not_called()
+        self.napp.flow_executor.submit.assert_called_once_with(
+            self.napp._send_flows_in_slot, switch.id, [flow_dict])
+
+    @patch('kytos.core.buffers.KytosEventBuffer.put')
+    def test_send_packet_out(self, mock_buffer_put):
+        """Test _send_packet_out putting a PacketOut in the msg_out buffer."""
+        packet_out = PacketOut13(xid=1)
+        connection = MagicMock()
+
+        self.napp._send_packet_out(connection, packet_out)
+
+        (event_out,), _ = mock_buffer_put.call_args
+        self.assertEqual(event_out.name,
+                         'kytos/of_l2ls.messages.out.ofpt_packet_out')
+        self.assertEqual(event_out.destination, connection)
+        self.assertIs(event_out.content['message'], packet_out)
+
+
+class TestFlows(MainTestCase):
+    """Tests for the learned flows."""
 
     @patch('napps.kytos.of_l2ls.main.settings')
     def test_create_flow(self, mock_settings):
         """Test _create_flow method."""
+        mock_settings.FLOW_MATCH_DST_ONLY = False
+        self.napp.flow_templates = FlowTemplates(10, 0, 300, 0)
 
-        expected_flow = {}
-        match = {}
+        header = EthernetHeader(2, 1, 0x800, None)
+        flow_out = self.napp._create_flow(header, 123)
 
-        expected_flow['priority'] = 10
-        expected_flow['table_id'] = 0
+        expected_flow = {'priority': 10, 'table_id': 0, 'idle_timeout': 300,
+                         'hard_timeout': 0,
+                         'match': {'dl_src': '00:00:00:00:00:01',
+                                   'dl_dst': '00:00:00:00:00:02',
+                                   'dl_type': 0x800},
+                         'actions': [{'action_type': 'output',
+                                      'port': 123}]}
+        self.assertDictEqual(json.loads(flow_out), expected_flow)
 
-        match['dl_src'] = '00:00:00:00:00:00:00:01'
-        match['dl_dst'] = '00:00:00:00:00:00:00:02'
-        match['dl_type'] = 0x800
+    @patch('napps.kytos.of_l2ls.main.settings')
+    def test_create_flow__dst_only(self, mock_settings):
+        """Test _create_flow matching only the destination."""
+        mock_settings.FLOW_MATCH_DST_ONLY = True
 
-        expected_flow['match'] = match
-        expected_flow['actions'] = [{'action_type': 'output',
-                                     'port': 123}]
-        mock_settings.FLOW_PRIORITY = 10
-        mock_settings.TABLE_ID = 0
+        header = EthernetHeader(2, 1, 0x800, None)
+        flow_out = self.napp._create_flow(header, 123)
+
+        self.assertDictEqual(json.loads(flow_out)['match'],
+                             {'dl_dst': '00:00:00:00:00:02'})
+
+    @patch('napps.kytos.of_l2ls.main.settings')
+    def test_queue_flows__reverse_path(self, mock_settings):
+        """Test _queue_flows queueing the flows in both directions."""
+        mock_settings.FLOW_REVERSE_PATH = True
+        mock_settings.FLOW_MATCH_DST_ONLY = False
+        header = EthernetHeader(2, 1, 0x800, None)
+
+        self.assertEqual(self.napp._queue_flows('dpid', header, 1, 2), [])
+        self.napp._queue_flows('dpid', header, 1, 2)
+
+        (dpid, flows), = self.napp.flow_batcher.pop_all()
+        self.assertEqual(dpid, 'dpid')
+        flows = [json.loads(flow) for flow in flows]
+        self.assertEqual([(flow['match'], flow['actions'][0]['port'])
+                          for flow in flows],
+                         [({'dl_src': '00:00:00:00:00:01',
+                            'dl_dst': '00:00:00:00:00:02',
+                            'dl_type': 0x800}, 2),
+                          ({'dl_src': '00:00:00:00:00:02',
+                            'dl_dst': '00:00:00:00:00:01',
+                            'dl_type': 0x800}, 1)])
+
+    def test_queue_flows__budget(self):
+        """Test _queue_flows evicting flows above the flow budget."""
+        self.napp.flow_budget = FlowBudget(size=2, high=1, low=0.5)
+        headers = [EthernetHeader(dst, 1, 0x800, None) for dst in (2, 3, 4)]
+
+        for header in headers:
+            self.napp._queue_flows('dpid', header, 1, header.destination)
+
+        self.assertEqual(self.napp.flow_budget.count('dpid'), 1)
+        (dpid, evicted), = self.napp.flow_budget.pop_evicted()
+        self.assertEqual(dpid, 'dpid')
+        self.assertEqual([port for _, port in evicted], [2, 3])
+        flow_cache = self.napp.flow_cache
+        self.assertTrue(flow_cache.add('dpid', (1, 2, 0x800, None), 2))
+        self.assertFalse(flow_cache.add('dpid', (1, 4, 0x800, None), 4))
+
+    @patch('napps.kytos.of_l2ls.main.settings')
+    def test_queue_flows__dst_only(self, mock_settings):
+        """Test _queue_flows queueing one flow per destination."""
+        mock_settings.FLOW_REVERSE_PATH = False
+        mock_settings.FLOW_MATCH_DST_ONLY = True
+        self.napp.flow_batcher.max_size = 1
+
+        full = self.napp._queue_flows('dpid', EthernetHeader(2, 1, 0x800,
+                                                             None), 1, 2)
+        again = self.napp._queue_flows('dpid', EthernetHeader(2, 3, 0x806,
+                                                              None), 3, 2)
+
+        self.assertEqual([json.loads(flow)['match'] for flow in full],
+                         [{'dl_dst': '00:00:00:00:00:02'}])
+        self.assertEqual(again, [])
+
+    def test_send_flows(self):
+        """Test _send_flows posting a batch to flow_manager."""
+        self.napp.flow_manager = MagicMock()
+        flows = [{'priority': 10}, {'priority': 20}]
+
+        self.napp._send_flows('dpid', flows)
+
+        self.napp.flow_manager.post_flows.assert_called_once_with('dpid',
+                                                                  flows, ANY)
+        self.assertEqual(self.napp.flow_batcher.pop_all(), [])
+
+    @patch('napps.kytos.of_l2ls.main.log')
+    @patch('napps.kytos.of_l2ls.main.settings.FLOW_MANAGER_OVERLOAD', 'shed')
+    def test_send_flows__failed(self, mock_log):
+        """Test _send_flows forgetting the flows flow_manager failed on."""
+        self.napp.flow_manager = MagicMock()
+        self.napp.flow_manager.post_flows.side_effect = (
+            lambda dpid, flows, callback: callback(False) or True)
+        self.napp._queue_flows('dpid', EthernetHeader(2, 1, 0x800, None), 1,
+                               2)
+        ((dpid, flows),) = self.napp.flow_batcher.pop_all()
+
+        self.napp._send_flows(dpid, flows)
+
+        mock_log.warning.assert_called_once()
+        self.assertEqual(len(self.napp.flow_cache), 0)
+        self.assertEqual(self.napp.flow_budget.count('dpid'), 0)
+        counters = self.napp.metrics.as_dict()['counters']['dpid']
+        self.assertEqual(counters, {'flows_failed': 1})
 
-        packet = MagicMock()
-        packet.source.value = '00:00:00:00:00:00:00:01'
-        packet.destination.value = '00:00:00:00:00:00:00:02'
-        packet.ether_type.value = 0x800
-
-        flow_out = self.napp._create_flow(packet, 123)
-
-        self.assertDictEqual(expected_flow, flow_out)
-
-    @patch('napps.kytos.of_l2ls.main.Output10')
-    @patch('napps.kytos.of_l2ls.main.PacketOut10')
-    def test_create_packet_out_10(self, *args):
-        """Test _create_packet_out method for packet_out 1.0 packet."""
-        (mock_packet_out, mock_action) = args
-
-        packet_out = MagicMock()
-        packet_out.actions = []
-        action = MagicMock()
-        switch = MagicMock()
-
-        mock_packet_out.return_value = packet_out
-        mock_action.return_value = action
-
-        packet = MagicMock()
-        packet.buffer_id = 1
-        packet.in_port = 1
-        packet.data = '1'
-        packet_out = self.napp._create_packet_out('0x01', packet, [], switch)
-
-        self.assertEqual(packet_out.actions[0], action)
-        self.assertEqual(packet_out.buffer_id, packet.buffer_id)
-        self.assertEqual(packet_out.in_port, packet.in_port)
-        self.assertEqual(packet_out.data, packet.data)
-
-    def test_create_packet_out_10__none(self):
-        """Test _create_packet_out method for packet_out 1.0 packet when
-           interface is OFPPC_NO_FWD.
-        """
-        packet = MagicMock()
-        iface = MagicMock()
-        iface.config = PortConfig10.OFPPC_NO_FWD
-        switch = MagicMock()
-        switch.interfaces = {1: iface}
-        switch.get_interface_by_port_no.return_value = iface
-
-        packet_out = self.napp._create_packet_out('0x01', packet, [1], switch)
-
-        self.assertIsNone(packet_out)
-
-    @patch('napps.kytos.of_l2ls.main.Output13')
-    @patch('napps.kytos.of_l2ls.main.PacketOut13')
-    def test_create_packet_out_13(self, *args):
-        """Test _create_packet_out method for packet_out 1.3 packet."""
-        (mock_packet_out, mock_action) = args
-
-        packet_out = MagicMock()
-        packet_out.actions = []
-        action = MagicMock()
-        switch = MagicMock()
-
-        mock_packet_out.return_value = packet_out
-        mock_action.return_value = action
-
-        packet = MagicMock()
-        packet.buffer_id = 2
-        packet.in_port = 2
-        packet.data = '2'
-        packet_out = self.napp._create_packet_out('0x04', packet, [], switch)
-
-        self.assertEqual(packet_out.actions[0], action)
-        self.assertEqual(packet_out.buffer_id, packet.buffer_id)
-        self.assertEqual(packet_out.in_port, packet.in_port)
-        self.assertEqual(packet_out.data, packet.data)
-
-    def test_create_packet_out_13__none(self):
-        """Test _create_packet_out method for packet_out 1.3 packet when
-           interface is OFPPC_NO_FWD.
-        """
-        packet = MagicMock()
-        iface = MagicMock()
-        iface.config = PortConfig13.OFPPC_NO_FWD
-        switch = MagicMock()
-        switch.interfaces = {1: iface}
-        switch.get_interface_by_port_no.return_value = iface
-
-        packet_out = self.napp._create_packet_out('0x04', packet, [1], switch)
-
-        self.assertIsNone(packet_out)
+    @patch('napps.kytos.of_l2ls.main.settings')
+    def test_send_flows__overloaded(self, mock_settings):
+        """Test _send_flows deferring or dropping refused flows."""
+        self.napp.flow_manager = MagicMock()
+        self.napp.flow_manager.post_flows.return_value = False
+        flows = [{'priority': 10}]
+
+        mock_settings.FLOW_MANAGER_OVERLOAD = 'defer'
+        self.napp._send_flows('dpid', flows)
+        self.assertEqual(self.napp.flow_batcher.pop_all(), [('dpid', flows)])
+
+        mock_settings.FLOW_MANAGER_OVERLOAD = 'shed'
+        self.napp._send_flows('dpid', flows)
+        self.assertEqual(self.napp.flow_batcher.pop_all(), [])
+
+    @patch('napps.kytos.of_l2ls.main.settings.FLOW_MANAGER_OVERLOAD',
+           'defer')
+    def test_submit_flows__no_slot(self):
+        """Test _submit_flows requeueing batches above the in-flight cap."""
+        self.napp.flow_executor = MagicMock()
+        self.napp.flow_manager = MagicMock()
+        self.napp._flow_slots = BoundedSemaphore(1)
+        flows = [{'priority': 10}]
+
+        self.napp._submit_flows('dpid', flows)
+        self.napp._submit_flows('dpid', flows)
+
+        self.napp.flow_executor.submit.assert_called_once()
+        self.assertEqual(self.napp.flow_batcher.pop_all(), [('dpid', flows)])
+        (function, *args), _ = self.napp.flow_executor.submit.call_args
+        function(*args)
+        self.napp._submit_flows('dpid', flows)
+        self.assertEqual(self.napp.flow_executor.submit.call_count, 2)
+
+    def test_handle_flow_stats(self):
+        """Test handle_flow_stats forgetting the flows that timed out."""
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x04)
+        for destination in (2, 3):
+            self.napp._queue_flows(switch.id,
+                                   EthernetHeader(destination, 1, 0x800,
+                                                  None), 1, destination)
+        installed = MagicMock()
+        installed.as_dict.return_value = {
+            'priority': 10, 'table_id': 0,
+            'match': {'dl_src': '00:00:00:00:00:01',
+                      'dl_dst': '00:00:00:00:00:03', 'dl_type': 0x800}}
+        table_miss = MagicMock()
+        table_miss.as_dict.return_value = self.napp._create_table_miss_flow()
+        switch.flows = [installed, table_miss]
+        event = get_kytos_event_mock(name='kytos/of_core.flow_stats.received',
+                                     content={'switch': switch})
+
+        with patch('napps.kytos.of_l2ls.main.settings.'
+                   'FLOW_BUDGET_RECONCILE_GRACE', -1):
+            self.napp.handle_flow_stats(event)
+
+        self.assertEqual(self.napp.flow_budget.count(switch.id), 1)
+        self.assertEqual(len(self.napp.flow_cache), 1)
+        self.assertTrue(self.napp.flow_cache.add(switch.id,
+                                                 (1, 2, 0x800, None), 2))
+
+    def test_create_match(self):
+        """Test _create_match leaving out the fields that are None."""
+        self.assertEqual(self.napp._create_match(1, 2, 0x800),
+                         {'dl_src': '00:00:00:00:00:01',
+                          'dl_dst': '00:00:00:00:00:02', 'dl_type': 0x800})
+        self.assertEqual(self.napp._create_match(None, 2, None),
+                         {'dl_dst': '00:00:00:00:00:02'})
+
+
+class TestFlood(MainTestCase):
+    """Tests for the flooding of unknown destinations."""
 
     @patch('kytos.core.buffers.KytosEventBuffer.put')
-    @patch('napps.kytos.of_l2ls.main.Main._create_packet_out')
-    @patch('napps.kytos.of_l2ls.main.Main._create_flow')
-    @patch('napps.kytos.of_l2ls.main.KytosEvent')
-    @patch('napps.kytos.of_l2ls.main.Ethernet')
-    @patch('napps.kytos.of_l2ls.main.requests')
-    def test_handle_packet_in(self, *args):
-        """Test handle_packet_in method."""
-        (mock_requests, mock_ethernet, mock_kytos_event, mock_create_flow,
-         mock_create_packet_out, mock_buffer_put) = args
+    @patch('napps.kytos.of_l2ls.main.settings.FLOOD_MODE', 'tree')
+    def test_handle_packet_in__flood_tree(self, mock_buffer_put):
+        """Test handle_packet_in flooding over the spanning tree."""
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x04)
+        other = get_switch_mock("00:00:00:00:00:00:00:02", 0x04)
+        switch.id, other.id = switch.dpid, other.dpid
+        switch.interfaces = {}
+        for port in (1, 2, 3, 4, 5, Port13.OFPP_LOCAL):
+            switch.interfaces[port] = get_interface_mock(f'eth{port}', port,
+                                                         switch)
+            switch.interfaces[port].config = 0
+        switch.interfaces[4].is_active.return_value = False
+        links = [MagicMock(endpoint_a=get_interface_mock('eth', port, switch),
+                           endpoint_b=get_interface_mock('eth', port, other))
+                 for port in (2, 3)]
+        topology = MagicMock(links=dict(enumerate(links)))
+        self.napp.update_flood_tree(get_kytos_event_mock(
+            name='kytos/topology.updated', content={'topology': topology}))
+        event = self._get_packet_in_event(switch)
+        message = event.content['message']
 
-        ethernet = MagicMock()
-        mock_ethernet.return_value = ethernet
+        self.napp.handle_packet_in(event)
 
-        flow_dict = MagicMock()
-        mock_create_flow.return_value = flow_dict
+        (event_out,), _ = mock_buffer_put.call_args
+        expected = PacketOut13(xid=0, buffer_id=message.buffer_id,
+                               in_port=message.in_port, data=message.data,
+                               actions=[Output13(port=2), Output13(port=5)])
+        packet_out = event_out.content['message'].pack()
+        self.assertEqual(packet_out[8:], expected.pack()[8:])
 
-        packet_out = MagicMock()
-        mock_create_packet_out.return_value = packet_out
+        self.napp.handle_packet_in(self._get_packet_in_event(switch,
+                                                             in_port=3))
+        self.assertEqual(mock_buffer_put.call_count, 1)
 
-        ports = [1, 2]
+    @patch('kytos.core.buffers.KytosEventBuffer.put')
+    @patch('napps.kytos.of_l2ls.main.settings.VLAN_FLOOD_MEMBERS_ONLY', True)
+    def test_handle_packet_in__vlan_flood(self, mock_buffer_put):
+        """Test handle_packet_in flooding to the member ports of a VLAN."""
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x01)
+        switch.interfaces = {}
+        for port in range(1, 7):
+            switch.interfaces[port] = get_interface_mock(f'eth{port}', port,
+                                                         switch)
+            switch.interfaces[port].config = 0
+        switch.interfaces[5].is_active.return_value = False
+        self.napp._get_mac_table(switch.id, 100).learn(3, 3)
+        self.napp._get_mac_table(switch.id, 200).learn(4, 4)
+        frame = get_frame(2, 1, 0x8100, bytes.fromhex('00640800') + b'data')
+        event = self._get_packet_in_event(switch, frame=frame)
+        message = event.content['message']
+
+        vlan_ports = {switch.id: {100: [5, 6]}}
+        with patch('napps.kytos.of_l2ls.main.settings.VLAN_PORTS',
+                   vlan_ports):
+            self.napp.handle_packet_in(event)
+
+        (event_out,), _ = mock_buffer_put.call_args
+        expected = PacketOut10(xid=0, buffer_id=message.buffer_id,
+                               in_port=message.in_port, data=message.data,
+                               actions=[Output10(port=3), Output10(port=6)])
+        packet_out = event_out.content['message'].pack()
+        self.assertEqual(packet_out[8:], expected.pack()[8:])
+
+    @patch('kytos.core.buffers.KytosEventBuffer.put')
+    @patch('napps.kytos.of_l2ls.main.settings.VLAN_FLOOD_MEMBERS_ONLY', True)
+    def test_handle_packet_in__vlan_flood_no_members(self, mock_buffer_put):
+        """Test handle_packet_in flooding a VLAN without known members."""
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x01)
+        switch.interfaces = {}
+        frame = get_frame(2, 1, 0x8100, bytes.fromhex('00640800') + b'data')
+        event = self._get_packet_in_event(switch, frame=frame)
+        message = event.content['message']
+
+        self.napp.handle_packet_in(event)
+
+        (event_out,), _ = mock_buffer_put.call_args
+        expected = PacketOut10(xid=0, buffer_id=message.buffer_id,
+                               in_port=message.in_port, data=message.data,
+                               actions=[Output10(port=Port10.OFPP_FLOOD)])
+        packet_out = event_out.content['message'].pack()
+        self.assertEqual(packet_out[8:], expected.pack()[8:])
+
+
+class TestStormControl(MainTestCase):
+    """Tests for the storm control."""
+
+    @patch('napps.kytos.of_l2ls.main.settings')
+    @patch('kytos.core.buffers.KytosEventBuffer.put')
+    def test_handle_packet_in__storm(self, *args):
+        """Test handle_packet_in dropping PacketIns above the limits."""
+        (mock_buffer_put, mock_settings) = args
+        mock_settings.STORM_DROP_FLOW = False
+        self.napp.storm_control = MagicMock()
+        self.napp.storm_control.allow_source.return_value = True
+        self.napp.storm_control.allow_switch.return_value = False
         switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x04)
-        switch.where_is_mac.return_value = ports
-        message = MagicMock()
-        message.reason = 0
-        message.in_port = 1
-        event = get_kytos_event_mock(name='kytos/of_core.v0x0[14].messages.in.'
-                                          'ofpt_packet_in',
-                                     content={'source': switch.connection,
-                                              'message': message})
 
+        self.napp.handle_packet_in(self._get_packet_in_event(switch))
+
+        self.napp.storm_control.allow_source.assert_called_once_with(
+            switch.id, 1)
+        self.napp.storm_control.allow_switch.assert_called_once_with(
+            switch.id)
+        self.assertEqual(self.napp.mac_tables, {})
+        mock_buffer_put.assert_not_called()
+
+    @patch('napps.kytos.of_l2ls.main.Main._block_source')
+    @patch('napps.kytos.of_l2ls.main.settings')
+    @patch('kytos.core.buffers.KytosEventBuffer.put')
+    def test_handle_packet_in__storm_source(self, *args):
+        """Test handle_packet_in blocking a source above its limit."""
+        (mock_buffer_put, mock_settings, mock_block_source) = args
+        self.napp.storm_control = MagicMock()
+        self.napp.storm_control.allow_source.return_value = False
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x04)
+        event = self._get_packet_in_event(switch)
+
+        mock_settings.STORM_DROP_FLOW = False
         self.napp.handle_packet_in(event)
+        mock_block_source.assert_not_called()
 
-        switch.update_mac_table.assert_called_with(ethernet.source,
-                                                   message.in_port)
+        mock_settings.STORM_DROP_FLOW = True
+        self.napp.handle_packet_in(event)
+        mock_block_source.assert_called_once_with(switch.id, 1)
 
-        mock_create_flow.assert_called_with(ethernet, ports[0])
-        mock_create_packet_out.assert_called_with(switch.ofp_version,
-                                                  message, ports, switch)
+        self.napp.storm_control.allow_switch.assert_not_called()
+        mock_buffer_put.assert_not_called()
 
-        event_call = [call(name='kytos/of_l2ls.messages.out.ofpt_packet_out',
-                           content={'destination': event.source,
-                                    'message': packet_out})]
+    @patch('napps.kytos.of_l2ls.main.settings')
+    def test_block_source(self, mock_settings):
+        """Test _block_source queueing a drop flow only once."""
+        mock_settings.STORM_DROP_FLOW_TIMEOUT = 30
+        mock_settings.STORM_DROP_FLOW_PRIORITY = 1000
+        mock_settings.TABLE_ID = 0
 
-        mock_kytos_event.assert_has_calls(event_call)
+        self.napp._block_source('dpid', 1)
+        self.napp._block_source('dpid', 1)
 
-        self.assertEqual(mock_requests.post.call_count, 1)
-        self.assertEqual(mock_buffer_put.call_count, 1)
+        expected_flow = {'priority': 1000, 'table_id': 0, 'hard_timeout': 30,
+                         'match': {'dl_src': '00:00:00:00:00:01'},
+                         'actions': []}
+        self.assertEqual(self.napp.flow_batcher.pop_all(),
+                         [('dpid', [expected_flow])])
+
+
+class TestVLAN(MainTestCase):
+    """Tests for the MAC learning per VLAN."""
+
+    @patch('kytos.core.buffers.KytosEventBuffer.put')
+    def test_handle_packet_in__vlan(self, mock_buffer_put):
+        """Test handle_packet_in learning and forwarding within a VLAN."""
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x01)
+        switch.interfaces = {}
+        self.napp._get_mac_table(switch.id).learn(2, 2)
+        self.napp._get_mac_table(switch.id, 100).learn(2, 3)
+        frame = get_frame(2, 1, 0x8100, bytes.fromhex('00640800') + b'data')
+        event = self._get_packet_in_event(switch, frame=frame)
+
+        self.napp.handle_packet_in(event)
+
+        self.assertEqual(self.napp._get_mac_table(switch.id, 100).lookup(1),
+                         1)
+        self.assertIsNone(self.napp._get_mac_table(switch.id).lookup(1))
+        ((_, flows),) = self.napp.flow_batcher.pop_all()
+        flow = json.loads(flows[0])
+        self.assertEqual(flow['match']['dl_vlan'], 100)
+        self.assertEqual(flow['actions'][0]['port'], 3)
+        (event_out,), _ = mock_buffer_put.call_args
+        message = event.content['message']
+        expected = PacketOut10(xid=0, buffer_id=message.buffer_id,
+                               in_port=message.in_port, data=message.data,
+                               actions=[Output10(port=3)])
+        packet_out = event_out.content['message'].pack()
+        self.assertEqual(packet_out[8:], expected.pack()[8:])
+
+    def test_handle_packet_in__untagged(self):
+        """Test handle_packet_in installing flows of untagged frames only."""
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x01)
+        switch.interfaces = {}
+        self.napp._get_mac_table(switch.id).learn(2, 2)
+
+        self.napp.handle_packet_in(self._get_packet_in_event(switch))
+
+        ((_, flows),) = self.napp.flow_batcher.pop_all()
+        self.assertEqual(json.loads(flows[0])['match']['dl_vlan'], 0xffff)
+        flow_cache = self.napp.flow_cache
+        self.assertFalse(flow_cache.add(switch.id, (1, 2, 0x800, 0xffff), 2))
+
+    def test_handle_packet_in__vlan_of13(self):
+        """Test handle_packet_in not learning VLANs on OpenFlow 1.3."""
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x04)
+        switch.interfaces = {}
+        self.napp._get_mac_table(switch.id).learn(2, 2)
+        frame = get_frame(2, 1, 0x8100, bytes.fromhex('00640800') + b'data')
+
+        self.napp.handle_packet_in(self._get_packet_in_event(switch,
+                                                             frame=frame))
+
+        self.assertEqual(self.napp._get_mac_table(switch.id).lookup(1), 1)
+        self.assertNotIn((switch.id, 100), self.napp.mac_tables)
+        ((_, flows),) = self.napp.flow_batcher.pop_all()
+        self.assertNotIn('dl_vlan', json.loads(flows[0])['match'])
+
+    @patch('napps.kytos.of_l2ls.main.settings.MAC_TABLE_MAX_VLANS', 2)
+    def test_get_mac_table__max_vlans(self):
+        """Test _get_mac_table creating at most MAC_TABLE_MAX_VLANS tables."""
+        self.napp._get_mac_table('dpid')
+        self.napp._get_mac_table('dpid', 100).learn(1, 1)
+        self.napp._get_mac_table('dpid', 200)
+        self.napp._get_mac_table('other', 300)
+
+        self.napp._get_mac_table('dpid', 300).learn(1, 1)
+        self.assertNotIn(('dpid', 200), self.napp.mac_tables)
+        self.assertIsNone(self.napp._get_mac_table('dpid', 400))
+        self.assertIsNotNone(self.napp._get_mac_table('dpid', 100))
+        self.assertIsNotNone(self.napp._get_mac_table('dpid'))
+
+    @patch('napps.kytos.of_l2ls.main.settings.MAC_TABLE_MAX_VLANS', 0)
+    def test_handle_packet_in__max_vlans(self):
+        """Test handle_packet_in not learning VLANs above the limit."""
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x01)
+        switch.interfaces = {}
+        self.napp.packet_out_templates = MagicMock()
+        frame = get_frame(2, 1, 0x8100, bytes.fromhex('00640800') + b'data')
+
+        self.napp.handle_packet_in(self._get_packet_in_event(switch,
+                                                             frame=frame))
+
+        self.assertEqual(self.napp.mac_tables, {})
+        counters = self.napp.metrics.as_dict()['counters'][switch.id]
+        self.assertEqual(counters['vlan_limit'], 1)
+
+
+class TestTopology(MainTestCase):
+    """Tests for the switch, interface and link events."""
+
+    def test_handle_switch_disabled(self):
+        """Test handle_switch_disabled forgetting the switch state."""
+        self.napp.flow_cache = MagicMock()
+        self.napp.flow_budget = MagicMock()
+        self.napp._get_mac_table('dpid')
+        event = get_kytos_event_mock(name='kytos/topology.switch.disabled',
+                                     content={'dpid': 'dpid'})
+
+        self.napp.handle_switch_disabled(event)
+
+        self.assertEqual(self.napp.mac_tables, {})
+        self.napp.flow_cache.invalidate_switch.assert_called_once_with('dpid')
+        self.napp.flow_budget.remove_switch.assert_called_once_with('dpid')
+
+    def test_handle_interface_down(self):
+        """Test handle_interface_down purging the port MACs and flows."""
+        self.napp.flow_manager = MagicMock()
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x04)
+        mac_table = self.napp._get_mac_table(switch.id)
+        mac_table.learn(1, 1)
+        mac_table.learn(2, 2)
+        self.napp._queue_flows(switch.id, EthernetHeader(1, 2, 0x800, None),
+                               2, 1)
+        self.napp._queue_flows(switch.id, EthernetHeader(2, 1, 0x800, None),
+                               1, 2)
+        interface = get_interface_mock('eth1', 1, switch)
+        event = get_kytos_event_mock(
+            name='kytos/of_core.switch.interface.down',
+            content={'interface': interface})
+
+        self.napp.handle_interface_down(event)
+
+        self.assertIsNone(mac_table.lookup(1))
+        self.assertEqual(mac_table.lookup(2), 2)
+        self.assertEqual(len(self.napp.flow_cache), 1)
+        self.assertEqual(self.napp.flow_budget.count(switch.id), 1)
+        match = {'dl_src': '00:00:00:00:00:02', 'dl_dst': '00:00:00:00:00:01',
+                 'dl_type': 0x800}
+        self.napp.flow_manager.delete_flows.assert_called_once_with(
+            switch.id, [{'table_id': 0, 'match': match}])
+
+    def test_handle_interface_down__relearned(self):
+        """Test handle_interface_down keeping flows moved to another port."""
+        self.napp.flow_manager = MagicMock()
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x04)
+        header = EthernetHeader(2, 1, 0x800, None)
+        self.napp._queue_flows(switch.id, header, 1, 2)
+        self.napp._queue_flows(switch.id, header, 1, 3)
+        interface = get_interface_mock('eth2', 2, switch)
+        event = get_kytos_event_mock(
+            name='kytos/of_core.switch.interface.down',
+            content={'interface': interface})
+
+        self.napp.handle_interface_down(event)
+
+        self.napp.flow_manager.delete_flows.assert_not_called()
+        self.assertEqual(len(self.napp.flow_cache), 1)
+        self.assertEqual(self.napp.flow_budget.count(switch.id), 1)
+
+    def test_handle_interface_down__no_flows(self):
+        """Test handle_interface_down not deleting flows if there are none."""
+        self.napp.flow_manager = MagicMock()
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x04)
+        interface = get_interface_mock('eth1', 1, switch)
+        event = get_kytos_event_mock(
+            name='kytos/of_core.switch.interface.deleted',
+            content={'interface': interface})
+
+        self.napp.handle_interface_down(event)
+
+        self.napp.flow_manager.delete_flows.assert_not_called()
+
+    def test_handle_interface_up(self):
+        """Test the interface events updating the blocked ports."""
+        switch = get_switch_mock("00:00:00:00:00:00:00:01", 0x04)
+        interface = get_interface_mock('eth1', 1, switch)
+        interface.config = 0
+        switch.interfaces = {1: interface}
+        self.assertEqual(self.napp.port_state.blocked(switch), set())
+
+        self.napp.handle_interface_down(get_kytos_event_mock(
+            name='kytos/of_core.switch.interface.link_down',
+            content={'interface': interface}))
+        self.assertEqual(self.napp.port_state.blocked(switch), {1})
+
+        self.napp.handle_interface_up(get_kytos_event_mock(
+            name='kytos/of_core.switch.interface.link_up',
+            content={'interface': interface}))
+        self.assertEqual(self.napp.port_state.blocked(switch), set())
+
+        interface.config = PortConfig13.OFPPC_NO_FWD
+        self.napp.handle_interface_up(get_kytos_event_mock(
+            name='kytos/of_core.switch.interface.modified',
+            content={'interface': interface}))
+        self.assertEqual(self.napp.port_state.blocked(switch), {1})
+
+    @patch('napps.kytos.of_l2ls.main.Main._purge_interface')
+    def test_handle_link_down(self, mock_purge_interface):
+        """Test handle_link_down purging both ends of the link."""
+        link = MagicMock()
+        event = get_kytos_event_mock(name='kytos/topology.link_down',
+                                     content={'link': link})
+
+        self.napp.handle_link_down(event)
+
+        self.assertEqual(mock_purge_interface.call_count, 2)
+        mock_purge_interface.assert_any_call(link.endpoint_a)
+        mock_purge_interface.assert_any_call(link.endpoint_b)
+
+
+class TestLifecycle(MainTestCase):
+    """Tests for the periodic tasks, startup and shutdown."""
+
+    def test_execute(self):
+        """Test execute submitting only the expired batches."""
+        self.napp.flow_executor = MagicMock()
+        self.napp.flow_batcher.add('dpid', {'match': {'dl_src': 'a'}},
+                                   now=0)
+
+        self.napp.execute()
+
+        self.napp.flow_executor.submit.assert_called_once_with(
+            self.napp._send_flows_in_slot, 'dpid',
+            [{'match': {'dl_src': 'a'}}])
+
+    @patch('napps.kytos.of_l2ls.main.Main._send_flows')
+    def test_execute__expire_mac_tables(self, _):
+        """Test execute removing the aged MAC entries."""
+        mac_table = self.napp._get_mac_table('dpid')
+        mac_table.learn(1, 1, now=0)
+
+        self.napp.execute()
+
+        self.assertEqual(len(mac_table), 0)
+        self.assertIs(self.napp._get_mac_table('dpid'), mac_table)
+
+    @patch('napps.kytos.of_l2ls.main.log')
+    def test_execute__delete_evicted(self, mock_log):
+        """Test execute deleting the flows evicted from the budget."""
+        self.napp.flow_manager = MagicMock()
+        self.napp.flow_budget = FlowBudget(size=1, high=1, low=0)
+        self.napp.flow_budget.add('dpid', (None, 1, None),
+                                  ((None, 1, None), 1))
+        self.napp.flow_budget.add('dpid', (None, 2, None),
+                                  ((None, 2, None), 1))
+
+        self.napp.execute()
+
+        self.napp.flow_manager.delete_flows.assert_called_once_with(
+            'dpid', [{'table_id': 0, 'match': {'dl_dst': '00:00:00:00:00:01'}},
+                     {'table_id': 0,
+                      'match': {'dl_dst': '00:00:00:00:00:02'}}])
+        mock_log.warning.assert_not_called()
+
+        self.napp.flow_manager.delete_flows.return_value = False
+        self.napp._delete_flows('dpid', [{'dl_dst': 'a'}])
+        mock_log.warning.assert_called_once()
+
+    def test_restore_mac_tables(self):
+        """Test the MAC tables saved by an instance restored by the next."""
+        # pylint: disable=import-outside-toplevel
+        from napps.kytos.of_l2ls.main import Main
+        with TemporaryDirectory() as directory:
+            with patch.multiple('napps.kytos.of_l2ls.main.settings',
+                                MAC_SNAPSHOT_PATH=f'{directory}/macs.log',
+                                MAC_SNAPSHOT_INTERVAL=0):
+                napp = Main(get_controller_mock())
+                napp._get_mac_table('dpid').learn(1, 2)
+                napp.execute()
+
+                restored = Main(get_controller_mock())
+
+        self.assertEqual(restored.mac_tables[('dpid', None)].lookup(1), 2)
+
+    def test_shutdown(self):
+        """Test shutdown sending the pending batches."""
+        self.napp.flow_manager = MagicMock()
+        self.napp.flow_batcher.add('dpid', {'match': {'dl_src': 'a'}})
+
+        self.napp.shutdown()
+
+        self.napp.flow_manager.post_flows.assert_called_once_with(
+            'dpid', [{'match': {'dl_src': 'a'}}])
+        self.napp.flow_manager.close.assert_called_once()
+        self.assertRaises(RuntimeError, self.napp.table_miss_executor.submit,
+                          print)
+        self.assertRaises(RuntimeError, self.napp.flow_executor.submit, print)
@@ -0,0 +1,131 @@
+"""Test the REST endpoints of Main."""
+from kytos.lib.helpers import get_test_client
+
+from napps.kytos.of_l2ls.tests.unit.test_main import MainTestCase
+
+
+# pylint: disable=protected-access
+class TestREST(MainTestCase):
+    """Tests for the REST endpoints."""
+
+    def test_get_metrics(self):
+        """Test the metrics endpoint."""
+        self.napp.metrics.count('dpid', 'flood')
+        api = get_test_client(self.napp.controller, self.napp)
+
+        response = api.get('/api/kytos/of_l2ls/v1/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json,
+                         {'counters': {'dpid': {'flood': 1}}, 'latency': {}})
+
+    def test_list_mac_entries(self):
+        """Test the endpoint listing the MAC tables with filters."""
+        self.napp._get_mac_table('dpid1').learn(0x0a0000000001, 1)
+        self.napp._get_mac_table('dpid1').learn(0x0b0000000002, 2)
+        self.napp._get_mac_table('dpid2').learn(0x0a0000000003, 1)
+        api = get_test_client(self.napp.controller, self.napp)
+        url = '/api/kytos/of_l2ls/v1/mac_tables'
+
+        response = api.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(entry['dpid'], entry['mac'], entry['port'])
+                          for entry in response.json],
+                         [('dpid1', '0a:00:00:00:00:01', 1),
+                          ('dpid1', '0b:00:00:00:00:02', 2),
+                          ('dpid2', '0a:00:00:00:00:03', 1)])
+
+        macs = [entry['mac'] for entry in
+                api.get(f'{url}?mac_prefix=0a:00&port=1').json]
+        self.assertEqual(macs, ['0a:00:00:00:00:01', '0a:00:00:00:00:03'])
+        macs = [entry['mac'] for entry in api.get(f'{url}?dpid=dpid1').json]
+        self.assertEqual(macs, ['0a:00:00:00:00:01', '0b:00:00:00:00:02'])
+        macs = [entry['mac'] for entry in
+                api.get(f'{url}?offset=1&limit=1').json]
+        self.assertEqual(macs, ['0b:00:00:00:00:02'])
+        self.assertEqual(api.get(f'{url}?dpid=unknown').json, [])
+
+    def test_list_mac_entries__vlan(self):
+        """Test the endpoint listing the MAC tables of VLANs."""
+        self.napp._get_mac_table('dpid', 200).learn(3, 1)
+        self.napp._get_mac_table('dpid', 100).learn(2, 1)
+        self.napp._get_mac_table('dpid').learn(1, 1)
+        api = get_test_client(self.napp.controller, self.napp)
+        url = '/api/kytos/of_l2ls/v1/mac_tables'
+
+        self.assertEqual([(entry['vlan'], entry['mac'])
+                          for entry in api.get(url).json],
+                         [(None, '00:00:00:00:00:01'),
+                          (100, '00:00:00:00:00:02'),
+                          (200, '00:00:00:00:00:03')])
+        macs = [entry['mac'] for entry in api.get(f'{url}?vlan=100').json]
+        self.assertEqual(macs, ['00:00:00:00:00:02'])
+
+    def test_list_mac_entries__bad_request(self):
+        """Test the endpoint listing the MAC tables with invalid filters."""
+        api = get_test_client(self.napp.controller, self.napp)
+        url = '/api/kytos/of_l2ls/v1/mac_tables'
+
+        for query in ('port=a', 'limit=-1', 'mac_prefix=0x:00',
+                      'mac_prefix=00:00:00:00:00:00:00'):
+            self.assertEqual(api.get(f'{url}?{query}').status_code, 400)
+
+    def test_preload_mac_entries(self):
+        """Test the endpoint learning MAC addresses in bulk."""
+        api = get_test_client(self.napp.controller, self.napp)
+        url = '/api/kytos/of_l2ls/v1/mac_tables'
+        entries = [{'dpid': 'dpid', 'mac': '00:00:00:00:00:01', 'port': 1},
+                   {'dpid': 'dpid', 'mac': '00:00:00:00:00:02', 'port': 2},
+                   {'dpid': 'dpid', 'mac': '00:00:00:00:00:02', 'port': 3,
+                    'vlan': 100}]
+
+        response = api.post(url, json={'entries': entries})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json, {'learned': 3})
+        self.assertEqual(self.napp.mac_tables[('dpid', None)].lookup(2), 2)
+        self.assertEqual(self.napp.mac_tables[('dpid', 100)].lookup(2), 3)
+
+        for body in ({'entries': [{'dpid': 'dpid', 'mac': '00:01',
+                                   'port': 1}]},
+                     {'entries': [{'dpid': 'dpid', 'port': 1}]},
+                     {'entries': [{'mac': '00:00:00:00:00:01', 'port': 1}]},
+                     {'entries': [{'dpid': 'dpid', 'port': '1',
+                                   'mac': '00:00:00:00:00:01'}]},
+                     {'entries': [{'dpid': 'dpid', 'port': 1, 'vlan': 4096,
+                                   'mac': '00:00:00:00:00:01'}]},
+                     {'entries': [{'dpid': 1, 'port': 1,
+                                   'mac': '00:00:00:00:00:01'}]},
+                     {'entries': [{'dpid': 'dpid', 'port': True,
+                                   'mac': '00:00:00:00:00:01'}]},
+                     {}):
+            self.assertEqual(api.post(url, json=body).status_code, 400)
+        self.assertEqual(len(self.napp.mac_tables[('dpid', None)]), 2)
+
+    def test_delete_mac_entries(self):
+        """Test the endpoint forgetting MAC addresses in bulk."""
+        mac_table = self.napp._get_mac_table('dpid1')
+        for mac, port in ((1, 1), (2, 1), (3, 2), (4, 3)):
+            mac_table.learn(mac, port)
+        self.napp._get_mac_table('dpid2').learn(1, 1)
+        self.napp._get_mac_table('dpid2', 100).learn(1, 1)
+        self.napp._get_mac_table('dpid2', 200).learn(1, 1)
+        api = get_test_client(self.napp.controller, self.napp)
+        url = '/api/kytos/of_l2ls/v1/mac_tables'
+        entries = [{'dpid': 'dpid1', 'mac': '00:00:00:00:00:04'},
+                   {'dpid': 'dpid1', 'port': 1},
+                   {'dpid': 'dpid2', 'vlan': 200},
+                   {'dpid': 'dpid2', 'vlan': 300},
+                   {'dpid': 'unknown'}]
+
+        response = api.delete(url, json={'entries': entries})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, {'deleted': 4})
+        self.assertEqual(len(mac_table), 1)
+        self.assertEqual(mac_table.lookup(3), 2)
+        self.assertEqual(len(self.napp.mac_tables[('dpid2', None)]), 1)
+        self.assertEqual(len(self.napp.mac_tables[('dpid2', 200)]), 0)
+
+        response = api.delete(url, json={'entries': [{'dpid': 'dpid2'}]})
+        self.assertEqual(response.json, {'deleted': 2})
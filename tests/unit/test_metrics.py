@@ -0,0 +1,46 @@
+"""Test the PacketIn metrics."""
+from unittest import TestCase
+
+from napps.kytos.of_l2ls.metrics import Histogram, Metrics
+
+
+class TestHistogram(TestCase):
+    """Tests for the Histogram class."""
+
+    def test_observe(self):
+        """Test observe counting values in their buckets."""
+        histogram = Histogram((0.1, 1))
+
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.as_dict(),
+                         {'buckets': {'0.1': 2, '1': 1, '+Inf': 1},
+                          'count': 4, 'sum': 2.65})
+
+
+class TestMetrics(TestCase):
+    """Tests for the Metrics class."""
+
+    def test_count_and_observe(self):
+        """Test the counters per switch and the histograms per stage."""
+        metrics = Metrics((1,))
+
+        metrics.count('dpid', 'flood')
+        metrics.count('dpid', 'flood')
+        metrics.count('other', 'flows_sent', 3)
+        metrics.observe('parse', 0.5)
+
+        self.assertEqual(metrics.as_dict(), {
+            'counters': {'dpid': {'flood': 2}, 'other': {'flows_sent': 3}},
+            'latency': {'parse': {'buckets': {'1': 1, '+Inf': 0},
+                                  'count': 1, 'sum': 0.5}}})
+
+    def test_disabled(self):
+        """Test a disabled instance ignoring updates."""
+        metrics = Metrics((1,), enabled=False)
+
+        metrics.count('dpid', 'flood')
+        metrics.observe('parse', 0.5)
+
+        self.assertEqual(metrics.as_dict(), {'counters': {}, 'latency': {}})
@@ -0,0 +1,100 @@
+"""Test the PacketOut encoders and templates."""
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from pyof.foundation.basic_types import BinaryData
+from pyof.v0x01.common.phy_port import Port as Port10
+from pyof.v0x01.controller2switch.packet_out import PacketOut as PacketOut10
+from pyof.v0x04.common.action import ActionOutput
+from pyof.v0x04.common.port import PortNo as Port13
+from pyof.v0x04.controller2switch.packet_out import PacketOut
+
+from napps.kytos.of_l2ls.packet_out import (ENCODERS, NO_BUFFER,
+                                            PacketOutTemplates)
+
+
+class TestPacketOutEncoder(TestCase):
+    """Tests for the PacketOutEncoder class."""
+
+    def test_build(self):
+        """Test build creating a PacketOut of the version for each port."""
+        packet_out = ENCODERS[0x01].build((1, 2))
+
+        self.assertIsInstance(packet_out, PacketOut10)
+        self.assertEqual([action.port for action in packet_out.actions],
+                         [1, 2])
+        self.assertEqual(ENCODERS[0x04].build(3).actions,
+                         PacketOut(actions=[ActionOutput(port=3)]).actions)
+
+    def test_out_port(self):
+        """Test out_port flooding to unknown destinations of the version."""
+        self.assertEqual(ENCODERS[0x01].out_port([], set()), Port10.OFPP_FLOOD)
+        self.assertEqual(ENCODERS[0x04].out_port([], set()), Port13.OFPP_FLOOD)
+        self.assertEqual(ENCODERS[0x04].out_port([2], {1}), 2)
+        self.assertIsNone(ENCODERS[0x04].out_port([1], {1}))
+
+    def test_flood_ports(self):
+        """Test flood_ports leaving out blocked and logical ports."""
+        ports = [1, 2, 3, Port10.OFPP_LOCAL, Port13.OFPP_LOCAL]
+
+        self.assertEqual(ENCODERS[0x01].flood_ports(ports, {2}), [1, 3])
+        self.assertEqual(ENCODERS[0x04].flood_ports(ports, {2}),
+                         [1, 3, Port10.OFPP_LOCAL])
+
+
+class TestPacketOutTemplates(TestCase):
+    """Tests for the PacketOutTemplates class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.encoder = MagicMock()
+        self.encoder.version = 0x04
+        self.encoder.build.side_effect = ENCODERS[0x04].build
+        self.templates = PacketOutTemplates()
+
+    def test_create(self):
+        """Test create reusing the actions built once for each port."""
+        packet = MagicMock()
+        packet.buffer_id = 7
+        packet.in_port = 1
+        packet.data = BinaryData(b'frame')
+
+        packet_out = self.templates.create(self.encoder, 2, packet)
+        again = self.templates.create(self.encoder, 2, packet)
+        self.templates.create(self.encoder, 3, packet)
+
+        expected = PacketOut(xid=0, buffer_id=7, in_port=1, data=b'frame',
+                             actions=[ActionOutput(port=2)])
+        self.assertIsInstance(packet_out, PacketOut)
+        self.assertIsNot(packet_out, again)
+        self.assertEqual(packet_out.pack()[8:], expected.pack()[8:])
+        self.assertEqual(again.pack()[8:], expected.pack()[8:])
+        self.assertEqual(self.encoder.build.call_count, 2)
+
+    def test_create__use_buffers(self):
+        """Test create leaving out the frame of buffered packets."""
+        self.templates.use_buffers = True
+        packet = MagicMock()
+        packet.in_port = 1
+        packet.data = BinaryData(b'frame')
+
+        packet.buffer_id = 7
+        buffered = self.templates.create(self.encoder, 2, packet).pack()
+        packet.buffer_id = NO_BUFFER
+        unbuffered = self.templates.create(self.encoder, 2, packet).pack()
+
+        expected = PacketOut(xid=0, buffer_id=7, in_port=1,
+                             actions=[ActionOutput(port=2)])
+        self.assertEqual(buffered[8:], expected.pack()[8:])
+        self.assertTrue(unbuffered.endswith(b'frame'))
+
+    def test_create__xid(self):
+        """Test create giving a new xid to each message."""
+        packet = MagicMock()
+        packet.data = BinaryData(b'frame')
+        packet.buffer_id = packet.in_port = 1
+
+        first = self.templates.create(self.encoder, 2, packet)
+        second = self.templates.create(self.encoder, 2, packet)
+
+        self.assertNotEqual(first.header.xid, second.header.xid)
@@ -0,0 +1,41 @@
+"""Test the blocked port sets."""
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from napps.kytos.of_l2ls.port_state import PortState
+
+
+class TestPortState(TestCase):
+    """Tests for the PortState class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.port_state = PortState(lambda iface: iface.blocked)
+        self.switch = MagicMock(id='dpid')
+        self.switch.interfaces = {1: MagicMock(blocked=False),
+                                  2: MagicMock(blocked=True)}
+
+    def test_blocked(self):
+        """Test blocked building the set once from the interfaces."""
+        self.assertEqual(self.port_state.blocked(self.switch), {2})
+
+        self.switch.interfaces[1].blocked = True
+        self.assertEqual(self.port_state.blocked(self.switch), {2})
+
+    def test_update(self):
+        """Test update blocking and unblocking ports."""
+        self.port_state.update('dpid', 1, True)
+        self.assertEqual(self.port_state.blocked(self.switch), {2})
+
+        self.port_state.update('dpid', 1, True)
+        self.port_state.update('dpid', 2, False)
+        self.assertEqual(self.port_state.blocked(self.switch), {1})
+
+    def test_remove_switch(self):
+        """Test remove_switch building the set again when needed."""
+        self.port_state.blocked(self.switch)
+        self.switch.interfaces[1].blocked = True
+
+        self.port_state.remove_switch('dpid')
+
+        self.assertEqual(self.port_state.blocked(self.switch), {1, 2})
@@ -0,0 +1,151 @@
+"""Test the MAC table snapshots."""
+import os
+from tempfile import TemporaryDirectory
+from time import monotonic
+from unittest import TestCase
+from unittest.mock import patch
+
+from napps.kytos.of_l2ls.mac_table import MACTable
+from napps.kytos.of_l2ls.snapshot import MAGIC, RECORD, MACSnapshot
+
+
+class TestMACSnapshot(TestCase):
+    """Tests for the MACSnapshot class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'mac_tables.log')
+        self.snapshot = MACSnapshot(self.path, max_size=1024)
+        self.tables = {('dpid1', None): MACTable(300, 10, True),
+                       ('dpid2', 100): MACTable(300, 10, True)}
+
+    def load(self):
+        """Return the loaded entries as {(dpid, vlan): {mac: port}}."""
+        return {key: {mac: port for mac, port, _ in entries}
+                for key, entries in self.snapshot.load(300).items()}
+
+    def test_save_and_load(self):
+        """Test load returning the latest port of each saved entry."""
+        self.tables[('dpid1', None)].learn(1, 1)
+        self.snapshot.save(self.tables)
+        self.tables[('dpid1', None)].learn(1, 2)
+        self.tables[('dpid2', 100)].learn(3, 3)
+        self.snapshot.save(self.tables)
+
+        self.assertEqual(self.load(), {('dpid1', None): {1: 2},
+                                       ('dpid2', 100): {3: 3}})
+
+    def test_save__incremental(self):
+        """Test save appending only the entries seen since the last save."""
+        self.tables[('dpid1', None)].learn(1, 1)
+        self.tables[('dpid1', None)].learn(2, 2)
+        self.snapshot.save(self.tables)
+        size = os.path.getsize(self.path)
+
+        self.tables[('dpid1', None)].learn(2, 2)
+        self.snapshot.save(self.tables)
+
+        self.assertEqual(os.path.getsize(self.path) - size, RECORD.size + 5)
+
+    def test_save__compact(self):
+        """Test save rewriting the log once it is over max_size."""
+        self.snapshot.max_size = 0
+        self.tables[('dpid1', None)].learn(1, 1)
+        self.snapshot.save(self.tables)
+        self.tables[('dpid1', None)].learn(1, 1)
+        self.snapshot.save(self.tables)
+        self.snapshot.save(self.tables)
+
+        self.assertEqual(os.path.getsize(self.path),
+                         len(MAGIC) + RECORD.size + 5)
+
+    def test_save__removed(self):
+        """Test save appending tombstones of the removed entries and tables."""
+        table = self.tables[('dpid1', None)]
+        table.learn(1, 1)
+        table.learn(2, 2)
+        self.tables[('dpid2', 100)].learn(3, 3)
+        self.snapshot.save(self.tables)
+        size = os.path.getsize(self.path)
+
+        table.remove_port(1)
+        self.snapshot.save(self.tables)
+        self.assertEqual(os.path.getsize(self.path) - size, RECORD.size + 5)
+        self.assertEqual(self.load(), {('dpid1', None): {2: 2},
+                                       ('dpid2', 100): {3: 3}})
+
+        del self.tables[('dpid2', 100)]
+        self.snapshot.save(self.tables)
+        self.assertEqual(self.load(), {('dpid1', None): {2: 2}})
+
+    def test_save__replaced(self):
+        """Test save with a table dropped and created again meanwhile."""
+        self.tables[('dpid1', None)].learn(1, 1)
+        self.snapshot.save(self.tables)
+
+        self.tables[('dpid1', None)] = MACTable(300, 10, True)
+        self.tables[('dpid1', None)].learn(2, 2)
+        self.snapshot.save(self.tables)
+
+        self.assertEqual(self.load(), {('dpid1', None): {2: 2}})
+
+    def test_save__removed_all(self):
+        """Test save rewriting the log once too many entries were removed."""
+        table = self.tables[('dpid1', None)]
+        table.learn(1, 1)
+        self.snapshot.save(self.tables)
+
+        for mac in range(2, 22):
+            table.learn(mac, 2)
+        self.snapshot.save(self.tables)
+
+        self.assertEqual(os.path.getsize(self.path),
+                         len(MAGIC) + 10 * (RECORD.size + 5))
+        self.assertEqual(self.load(),
+                         {('dpid1', None): {mac: 2 for mac in range(12, 22)}})
+
+    @patch('napps.kytos.of_l2ls.snapshot.log')
+    def test_save__error(self, mock_log):
+        """Test save logging any error instead of raising it."""
+        self.tables[(1, None)] = MACTable(300, 10)
+        self.tables[(1, None)].learn(1, 1)
+
+        self.snapshot.save(self.tables)
+        self.snapshot.compact(self.tables)
+
+        self.assertEqual(mock_log.error.call_count, 2)
+
+    def test_load__aged(self):
+        """Test load dropping the entries that aged out."""
+        self.tables[('dpid1', None)].learn(1, 1, now=monotonic() - 400)
+        self.tables[('dpid1', None)].learn(2, 2, now=monotonic() - 100)
+        self.tables[('dpid1', None)].max_age = 1000
+        self.snapshot.compact(self.tables)
+
+        entries = self.snapshot.load(300)
+
+        ((mac, port, seen),) = entries[('dpid1', None)]
+        self.assertEqual((mac, port), (2, 2))
+        self.assertAlmostEqual(monotonic() - seen, 100, delta=1)
+
+    def test_load__truncated(self):
+        """Test load ignoring a truncated last record."""
+        self.tables[('dpid1', None)].learn(1, 1)
+        self.tables[('dpid1', None)].learn(2, 2)
+        self.snapshot.save(self.tables)
+        with open(self.path, 'r+b') as log_file:
+            log_file.truncate(os.path.getsize(self.path) - 1)
+
+        self.assertEqual(self.load(), {('dpid1', None): {1: 1}})
+
+    @patch('napps.kytos.of_l2ls.snapshot.log')
+    def test_load__invalid(self, mock_log):
+        """Test load with a missing or an invalid file."""
+        self.assertEqual(self.snapshot.load(300), {})
+
+        with open(self.path, 'wb') as log_file:
+            log_file.write(b'invalid')
+        self.assertEqual(self.snapshot.load(300), {})
+        mock_log.error.assert_called_once()
@@ -0,0 +1,61 @@
+"""Test the PacketIn storm control."""
+from unittest import TestCase
+
+from napps.kytos.of_l2ls.storm_control import StormControl, TokenBucket
+
+
+class TestTokenBucket(TestCase):
+    """Tests for the TokenBucket class."""
+
+    def test_consume(self):
+        """Test consume allowing bursts and refilling at the rate."""
+        bucket = TokenBucket(rate=2, burst=3, now=0)
+
+        self.assertEqual([bucket.consume(0) for _ in range(4)],
+                         [True, True, True, False])
+        self.assertTrue(bucket.consume(0.5))
+        self.assertFalse(bucket.consume(0.5))
+        self.assertEqual([bucket.consume(100) for _ in range(4)],
+                         [True, True, True, False])
+
+
+class TestStormControl(TestCase):
+    """Tests for the StormControl class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.storm_control = StormControl(switch_rate=1, switch_burst=2,
+                                          source_rate=1, source_burst=1,
+                                          max_sources=2)
+
+    def test_allow_switch(self):
+        """Test allow_switch limiting each switch."""
+        results = [self.storm_control.allow_switch('dpid', now=0)
+                   for _ in range(3)]
+
+        self.assertEqual(results, [True, True, False])
+        self.assertTrue(self.storm_control.allow_switch('other', now=0))
+
+    def test_allow_source(self):
+        """Test allow_source limiting each source of each switch."""
+        self.assertTrue(self.storm_control.allow_source('dpid', 1, now=0))
+        self.assertFalse(self.storm_control.allow_source('dpid', 1, now=0))
+        self.assertTrue(self.storm_control.allow_source('dpid', 2, now=0))
+        self.assertTrue(self.storm_control.allow_source('other', 1, now=0))
+        self.assertTrue(self.storm_control.allow_source('dpid', 1, now=0))
+
+    def test_allow__disabled(self):
+        """Test a rate of 0 disabling the limit."""
+        storm_control = StormControl(0, 0, 0, 0, 0)
+
+        self.assertTrue(all(storm_control.allow_switch('dpid', now=0)
+                            for _ in range(10)))
+        self.assertTrue(all(storm_control.allow_source('dpid', 1, now=0)
+                            for _ in range(10)))
+
+    def test_block(self):
+        """Test block refusing sources that are already blocked."""
+        self.assertTrue(self.storm_control.block('dpid', 1, 10, now=0))
+        self.assertFalse(self.storm_control.block('dpid', 1, 10, now=9))
+        self.assertTrue(self.storm_control.block('other', 1, 10, now=9))
+        self.assertTrue(self.storm_control.block('dpid', 1, 10, now=10))
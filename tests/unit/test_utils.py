@@ -0,0 +1,70 @@
+"""Test the PacketIn frame helpers."""
+from unittest import TestCase
+
+from napps.kytos.of_l2ls.utils import (EthernetHeader, FrameFilter,
+                                       parse_ethernet_header)
+
+DST = bytes.fromhex('000000000002')
+SRC = bytes.fromhex('000000000001')
+
+
+class TestUtils(TestCase):
+    """Tests for the utils functions."""
+
+    def test_parse_ethernet_header(self):
+        """Test parse_ethernet_header reading an untagged frame."""
+        frame = DST + SRC + bytes.fromhex('0800') + b'payload'
+
+        self.assertEqual(parse_ethernet_header(frame),
+                         EthernetHeader(2, 1, 0x800, None))
+
+    def test_parse_ethernet_header__vlan(self):
+        """Test parse_ethernet_header reading a 802.1Q tagged frame."""
+        frame = DST + SRC + bytes.fromhex('8100a0640806') + b'payload'
+
+        self.assertEqual(parse_ethernet_header(frame),
+                         EthernetHeader(2, 1, 0x806, 100))
+
+    def test_parse_ethernet_header__priority_tag(self):
+        """Test parse_ethernet_header reading priority-tagged frames."""
+        frame = DST + SRC + bytes.fromhex('8100a0000806') + b'payload'
+
+        self.assertEqual(parse_ethernet_header(frame),
+                         EthernetHeader(2, 1, 0x806, None))
+
+    def test_parse_ethernet_header__short(self):
+        """Test parse_ethernet_header refusing truncated frames."""
+        self.assertIsNone(parse_ethernet_header(DST + SRC))
+        self.assertIsNone(parse_ethernet_header(DST + SRC +
+                                                bytes.fromhex('8100a0')))
+
+
+class TestFrameFilter(TestCase):
+    """Tests for the FrameFilter class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.filter = FrameFilter(macs=['00:00:00:00:00:0a'],
+                                  mac_prefixes=['01:80:c2:00:00', '33:33'],
+                                  ether_types=[0x88cc])
+
+    def test_ignores(self):
+        """Test ignores matching MACs, MAC prefixes and EtherTypes."""
+        ignored = [bytes.fromhex('00000000000a') + SRC + b'\x08\x00',
+                   bytes.fromhex('0180c2000002') + SRC + b'\x88\x09',
+                   bytes.fromhex('333300000001') + SRC + b'\x86\xdd',
+                   DST + SRC + b'\x88\xcc',
+                   DST + SRC + bytes.fromhex('8100006488cc'),
+                   DST + SRC]
+        for frame in ignored:
+            self.assertTrue(self.filter.ignores(frame))
+
+    def test_ignores__forwarded(self):
+        """Test ignores accepting the other frames."""
+        forwarded = [DST + SRC + b'\x08\x00',
+                     bytes.fromhex('0180c2010000') + SRC + b'\x08\x00',
+                     bytes.fromhex('333400000001') + SRC + b'\x86\xdd',
+                     DST + SRC + bytes.fromhex('810000640800'),
+                     DST + SRC + bytes.fromhex('8100')]
+        for frame in forwarded:
+            self.assertFalse(self.filter.ignores(frame))
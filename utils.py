@@ -0,0 +1,81 @@
+"""Helpers to read the frames received in PacketIns."""
+from collections import namedtuple
+
+from napps.kytos.of_l2ls.mac_table import mac_to_int
+
+ETH_TYPE_LLDP = 0x88cc
+#: EtherTypes of 802.1Q and 802.1ad tags
+ETH_TYPES_VLAN = frozenset((0x8100, 0x88a8))
+
+#: MAC addresses are 48-bit integers and ``vlan`` is None for untagged and
+#: priority-tagged frames
+EthernetHeader = namedtuple('EthernetHeader',
+                            'destination source ether_type vlan')
+
+
+def parse_ethernet_header(data):
+    """Read the Ethernet header of a frame without unpacking it.
+
+    Only the first 14 bytes, plus 4 if the frame has a VLAN tag, are read
+    through a memoryview, so the frame is not copied.
+
+    Args:
+        data (bytes): Frame sent by the switch in a PacketIn.
+
+    Returns:
+        EthernetHeader: The header fields, or None if the frame is too short.
+
+    """
+    view = memoryview(data)
+    if len(view) < 14:
+        return None
+
+    ether_type = view[12] << 8 | view[13]
+    vlan = None
+    if ether_type in ETH_TYPES_VLAN:
+        if len(view) < 18:
+            return None
+        vlan = (view[14] << 8 | view[15]) & 0x0fff or None
+        ether_type = view[16] << 8 | view[17]
+
+    return EthernetHeader(int.from_bytes(view[0:6], 'big'),
+                          int.from_bytes(view[6:12], 'big'),
+                          ether_type, vlan)
+
+
+class FrameFilter:
+    """Tell which frames should be ignored, reading only their header.
+
+    A frame is ignored when its destination MAC address is one of ``macs`` or
+    starts with one of ``mac_prefixes``, or when its EtherType, after a VLAN
+    tag if there is one, is one of ``ether_types``. Truncated frames are also
+    ignored. MAC addresses and prefixes are converted to integers once, so
+    checking a frame allocates no objects.
+    """
+
+    def __init__(self, macs=(), mac_prefixes=(), ether_types=()):
+        self.macs = frozenset(mac_to_int(mac) for mac in macs)
+        self.ether_types = frozenset(ether_types)
+        prefixes = {}
+        for prefix in mac_prefixes:
+            shift = 48 - 8 * len(prefix.split(':'))
+            prefixes.setdefault(shift, set()).add(mac_to_int(prefix))
+        self.prefixes = tuple((shift, frozenset(values))
+                              for shift, values in prefixes.items())
+
+    def ignores(self, data):
+        """Return True if the frame ``data`` should be ignored."""
+        if len(data) < 14:
+            return True
+
+        destination = int.from_bytes(data[0:6], 'big')
+        if destination in self.macs:
+            return True
+        for shift, values in self.prefixes:
+            if destination >> shift in values:
+                return True
+
+        ether_type = data[12] << 8 | data[13]
+        if ether_type in ETH_TYPES_VLAN and len(data) >= 18:
+            ether_type = data[16] << 8 | data[17]
+        return ether_type in self.ether_types